@@ -0,0 +1,127 @@
+import time
+import asyncio
+import threading
+import metrics
+import botlog
+
+
+class AccountSnapshot:
+    # Account-wide positions + tickers for every configured symbol, fetched with one
+    # fetch_positions() and one fetch_tickers() per cycle and shared by all symbol threads.
+    # Readers refresh lazily: the first thread to find the snapshot older than max_age
+    # fetches, the others wait on the lock and reuse the result.
+    def __init__(self, exchange, symbols, max_age: float = 5.0):
+        self.exchange = exchange
+        self.symbols = list(symbols)
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.fetched_at = 0.0
+        self.positions = {}
+        self.positions_ok = False
+        self.tickers = {}
+        self.refreshes = 0
+
+    def invalidate(self):
+        # Call after placing an order so the next reader sees the new position
+        with self.lock:
+            self.fetched_at = 0.0
+
+    def _store(self, positions, tickers):
+        # positions is the fetch_positions result, or None if that call failed
+        by_symbol = {}
+        for p in positions or []:
+            if float(p.get('contracts', 0) or 0) > 0:
+                by_symbol[p.get('symbol')] = p
+        self.positions = by_symbol
+        self.positions_ok = positions is not None
+        self.tickers = tickers
+        self.fetched_at = time.time()
+        self.refreshes += 1
+
+    def refresh(self):
+        try:
+            positions = self.exchange.fetch_positions(self.symbols)
+        except Exception as e:
+            botlog.warning(f"fetch_positions error: {e}", stage='position')
+            metrics.error('fetch_positions', '', e)
+            positions = None
+        self._store(positions, self.exchange.fetch_tickers(self.symbols))
+
+    def ensure_fresh(self):
+        if time.time() - self.fetched_at < self.max_age:
+            return
+        with self.lock:
+            if time.time() - self.fetched_at >= self.max_age:
+                self.refresh()
+
+    def position(self, symbol: str):
+        # Same contract as get_position: the open position dict, or None when flat/unknown
+        self.ensure_fresh()
+        return self.positions.get(symbol)
+
+    def position_state(self, symbol: str):
+        # (position, positions_ok): None only means flat when positions_ok, i.e. fetch_positions
+        # succeeded; read under the lock so both come from the same refresh
+        self.ensure_fresh()
+        with self.lock:
+            return self.positions.get(symbol), self.positions_ok
+
+    def ticker(self, symbol: str):
+        self.ensure_fresh()
+        ticker = self.tickers.get(symbol)
+        if ticker is None:
+            raise KeyError(f"No ticker for {symbol} in snapshot")
+        return ticker
+
+    def last_price(self, symbol: str) -> float:
+        return float(self.ticker(symbol)['last'])
+
+
+class AsyncAccountSnapshot(AccountSnapshot):
+    # AccountSnapshot for ccxt.async_support exchanges; both calls go out concurrently
+    def __init__(self, exchange, symbols, max_age: float = 5.0):
+        super().__init__(exchange, symbols, max_age)
+        self.lock = asyncio.Lock()
+
+    async def invalidate(self):
+        async with self.lock:
+            self.fetched_at = 0.0
+
+    async def refresh(self):
+        positions, tickers = await asyncio.gather(
+            self.exchange.fetch_positions(self.symbols),
+            self.exchange.fetch_tickers(self.symbols),
+            return_exceptions=True,
+        )
+        if isinstance(tickers, BaseException):
+            raise tickers
+        if isinstance(positions, BaseException):
+            botlog.warning(f"fetch_positions error: {positions}", stage='position')
+            metrics.error('fetch_positions', '', positions)
+            positions = None
+        self._store(positions, tickers)
+
+    async def ensure_fresh(self):
+        if time.time() - self.fetched_at < self.max_age:
+            return
+        async with self.lock:
+            if time.time() - self.fetched_at >= self.max_age:
+                await self.refresh()
+
+    async def position(self, symbol: str):
+        await self.ensure_fresh()
+        return self.positions.get(symbol)
+
+    async def position_state(self, symbol: str):
+        await self.ensure_fresh()
+        return self.positions.get(symbol), self.positions_ok
+
+    async def ticker(self, symbol: str):
+        await self.ensure_fresh()
+        ticker = self.tickers.get(symbol)
+        if ticker is None:
+            raise KeyError(f"No ticker for {symbol} in snapshot")
+        return ticker
+
+    async def last_price(self, symbol: str) -> float:
+        return float((await self.ticker(symbol))['last'])
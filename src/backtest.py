@@ -0,0 +1,179 @@
+import argparse
+import numpy as np
+from run_strat1 import FAST_EMA, SLOW_EMA, TP_PCT, SL_PCT, POSITION_SIZE_USDT, LEVERAGE, get_conf
+
+# Bitget USDT-M taker fee per side, charged on entry and exit
+TAKER_FEE = get_conf('TAKER_FEE', float, 'TAKER_FEE', 0.0006)
+
+TRADE_DTYPE = np.dtype([
+    ('side', 'i1'),          # 1 long, -1 short
+    ('signal_bar', 'i8'),    # last closed bar when the cross was seen
+    ('entry_bar', 'i8'),
+    ('exit_bar', 'i8'),
+    ('entry_ts', 'i8'),
+    ('exit_ts', 'i8'),
+    ('entry_price', 'f8'),
+    ('exit_price', 'f8'),
+    ('reason', 'U3'),        # tp, sl or end
+    ('ret', 'f8'),           # net of fees, on notional
+    ('pnl_usdt', 'f8'),
+])
+
+
+def ema_array(closes, span: int):
+    # pandas' ewm(adjust=False) kernel: identical values to get_signal / EmaCrossState, computed in C
+    import pandas as pd
+    return pd.Series(closes, copy=False).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def cross_signals_from_emas(ema_fast, ema_slow, warmup: int):
+    # sig[i] = 1/-1/0: what get_signal returns when bar i is the last closed bar (bar i+1 still forming)
+    f_prev, f_last = ema_fast[:-1], ema_fast[1:]
+    s_prev, s_last = ema_slow[:-1], ema_slow[1:]
+    sig = np.zeros(len(ema_fast), dtype=np.int8)
+    sig[1:] = ((f_prev <= s_prev) & (f_last > s_last)).astype(np.int8) - ((f_prev >= s_prev) & (f_last < s_last)).astype(np.int8)
+    # get_signal needs max(FAST, SLOW) + 2 rows including the forming candle
+    sig[:warmup] = 0
+    return sig
+
+
+def cross_signals(closes, fast: int, slow: int):
+    return cross_signals_from_emas(ema_array(closes, fast), ema_array(closes, slow), max(fast, slow))
+
+
+def first_exit(high, low, start: int, entry: float, side: int, tp_pct: float, sl_pct: float, same_bar: str):
+    # First bar >= start where close_position's pnl_pct rule fires on the bar's high/low.
+    # Scans doubling windows so long trades do not materialise the whole tail.
+    n = len(high)
+    window = 256
+    pos = start
+    while pos < n:
+        end = min(n, pos + window)
+        h = high[pos:end]
+        lo = low[pos:end]
+        if side > 0:
+            tp_hit = (h - entry) / entry >= tp_pct
+            sl_hit = (lo - entry) / entry <= -sl_pct
+        else:
+            tp_hit = (entry - lo) / entry >= tp_pct
+            sl_hit = (entry - h) / entry <= -sl_pct
+        any_hit = tp_hit | sl_hit
+        if any_hit.any():
+            k = int(np.argmax(any_hit))
+            j = pos + k
+            if tp_hit[k] and sl_hit[k]:
+                return j, same_bar
+            return j, 'tp' if tp_hit[k] else 'sl'
+        pos = end
+        window *= 2
+    return n - 1, 'end'
+
+
+def run_backtest(ohlcv, fast: int = FAST_EMA, slow: int = SLOW_EMA, tp_pct: float = TP_PCT, sl_pct: float = SL_PCT,
+                 size_usdt: float = POSITION_SIZE_USDT, fee: float = TAKER_FEE, same_bar: str = 'sl', signals=None):
+    # ohlcv: dict of equal-length arrays timestamp/open/high/low/close (e.g. load_ohlcv_csv).
+    # Live semantics: cross seen on closed bars -3/-2, entry at the next bar's open only when flat,
+    # exit when pnl_pct >= tp or <= -sl, resolved intrabar from high/low (same_bar decides ties).
+    ts = ohlcv['timestamp']
+    opens, highs, lows, closes = ohlcv['open'], ohlcv['high'], ohlcv['low'], ohlcv['close']
+    n = len(closes)
+    sig = cross_signals(closes, fast, slow) if signals is None else signals
+    sig_idx = np.flatnonzero(sig[:-1])
+    rows = []
+    earliest = 0
+    while True:
+        p = np.searchsorted(sig_idx, earliest)
+        if p >= len(sig_idx):
+            break
+        i = int(sig_idx[p])
+        side = int(sig[i])
+        e = i + 1
+        entry = float(opens[e])
+        j, reason = first_exit(highs, lows, e, entry, side, tp_pct, sl_pct, same_bar)
+        o = float(opens[j])
+        if reason == 'tp':
+            level = entry * (1 + tp_pct) if side > 0 else entry * (1 - tp_pct)
+            # Gapped through the level at the open: filled at the open
+            exit_price = max(o, level) if side > 0 else min(o, level)
+        elif reason == 'sl':
+            level = entry * (1 - sl_pct) if side > 0 else entry * (1 + sl_pct)
+            exit_price = min(o, level) if side > 0 else max(o, level)
+        else:
+            exit_price = float(closes[j])
+        ret = side * (exit_price - entry) / entry - 2 * fee
+        rows.append((side, i, e, j, ts[e], ts[j], entry, exit_price, reason, ret, ret * size_usdt))
+        if reason == 'end':
+            break
+        # Flat again during bar j: the signal checked when bar j closes may enter
+        earliest = j
+    return np.array(rows, dtype=TRADE_DTYPE)
+
+
+def summarize(trades, leverage: float = LEVERAGE):
+    n = len(trades)
+    if n == 0:
+        return {'trades': 0, 'wins': 0, 'win_rate': 0.0, 'total_return': 0.0, 'return_on_margin': 0.0,
+                'pnl_usdt': 0.0, 'avg_return': 0.0, 'profit_factor': 0.0, 'max_drawdown_usdt': 0.0,
+                'tp_exits': 0, 'sl_exits': 0, 'avg_bars_held': 0.0}
+    ret = trades['ret']
+    pnl = trades['pnl_usdt']
+    equity = np.cumsum(pnl)
+    drawdown = np.maximum.accumulate(np.maximum(equity, 0.0)) - equity
+    gains = pnl[pnl > 0].sum()
+    losses = -pnl[pnl < 0].sum()
+    return {
+        'trades': n,
+        'wins': int((ret > 0).sum()),
+        'win_rate': float((ret > 0).mean()),
+        'total_return': float(ret.sum()),
+        'return_on_margin': float(ret.sum() * leverage),
+        'pnl_usdt': float(pnl.sum()),
+        'avg_return': float(ret.mean()),
+        'profit_factor': float(gains / losses) if losses > 0 else float('inf'),
+        'max_drawdown_usdt': float(drawdown.max()),
+        'tp_exits': int((trades['reason'] == 'tp').sum()),
+        'sl_exits': int((trades['reason'] == 'sl').sum()),
+        'avg_bars_held': float((trades['exit_bar'] - trades['entry_bar'] + 1).mean()),
+    }
+
+
+def load_ohlcv_csv(path: str):
+    # timestamp,open,high,low,close,volume rows (ms timestamps), optional header line
+    with open(path) as f:
+        first = f.readline()
+    skip = 0 if first[:1].isdigit() else 1
+    data = np.loadtxt(path, delimiter=',', skiprows=skip, ndmin=2)
+    return {
+        'timestamp': data[:, 0].astype(np.int64),
+        'open': data[:, 1], 'high': data[:, 2], 'low': data[:, 3], 'close': data[:, 4],
+        'volume': data[:, 5] if data.shape[1] > 5 else np.zeros(len(data)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest the EMA cross + TP/SL strategy on OHLCV history')
+    parser.add_argument('candles', help='CSV of timestamp,open,high,low,close,volume')
+    parser.add_argument('--fast', type=int, default=FAST_EMA)
+    parser.add_argument('--slow', type=int, default=SLOW_EMA)
+    parser.add_argument('--tp', type=float, default=TP_PCT)
+    parser.add_argument('--sl', type=float, default=SL_PCT)
+    parser.add_argument('--size', type=float, default=POSITION_SIZE_USDT)
+    parser.add_argument('--leverage', type=float, default=LEVERAGE)
+    parser.add_argument('--fee', type=float, default=TAKER_FEE)
+    parser.add_argument('--same-bar', choices=('sl', 'tp'), default='sl', help='exit assumed first when TP and SL hit in one bar')
+    parser.add_argument('--trades', help='write the trade list to this CSV')
+    args = parser.parse_args()
+
+    ohlcv = load_ohlcv_csv(args.candles)
+    trades = run_backtest(ohlcv, args.fast, args.slow, args.tp, args.sl, args.size, args.fee, args.same_bar)
+    stats = summarize(trades, args.leverage)
+    print(f"Backtest {args.candles}: {len(ohlcv['close'])} bars | fast={args.fast} slow={args.slow} tp={args.tp} sl={args.sl}")
+    for k, v in stats.items():
+        print(f"  {k}: {v:.6f}" if isinstance(v, float) else f"  {k}: {v}")
+    if args.trades:
+        np.savetxt(args.trades, trades, delimiter=',', fmt='%s', header=','.join(TRADE_DTYPE.names), comments='')
+        print(f"Wrote {len(trades)} trades to {args.trades}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from candle_cache import CandleRing
+from ema_state import ema_cross
+
+# Live-core benchmark: startup cost of the trading modules with and without pandas, and the
+# per-cycle cost of the signal on the pandas-free core vs the DataFrame version it replaced.
+# Also checks that both give bit-identical EMAs and signals on random candle windows.
+#   python src/bench_core.py [--runs 5] [--windows 2000]
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+
+STARTUP = (
+    "import time, resource\n"
+    "t = time.perf_counter()\n"
+    "import {modules}\n"
+    "print((time.perf_counter() - t) * 1000, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+
+
+def pandas_cross(df, fast: int, slow: int):
+    # get_signal as it was before the pandas-free core, kept here as the reference
+    df = df.copy()
+    df['ema_fast'] = df['close'].ewm(span=fast, adjust=False).mean()
+    df['ema_slow'] = df['close'].ewm(span=slow, adjust=False).mean()
+    return (df['ema_fast'].iloc[-3], df['ema_fast'].iloc[-2],
+            df['ema_slow'].iloc[-3], df['ema_slow'].iloc[-2])
+
+
+def random_rows(rng, n: int, start_ms: int = 1_700_000_000_000):
+    # A coarse tick leaves runs of equal closes, which exercise the equal-value branch of the EMA
+    close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.001, n))), 1)
+    return [[start_ms + i * 60_000, c, c, c, c, 1.0] for i, c in enumerate(close.tolist())]
+
+
+def startup(modules: str, runs: int):
+    ms, rss = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', STARTUP.format(modules=modules)], cwd=SRC,
+                             capture_output=True, text=True, check=True).stdout.split()
+        ms.append(float(out[0]))
+        rss.append(int(out[1]) / 1024)
+    return statistics.median(ms), statistics.median(rss)
+
+
+def per_call(fn, arg, n: int):
+    t = time.perf_counter()
+    for _ in range(n):
+        fn(arg)
+    elapsed = (time.perf_counter() - t) / n * 1e6
+    tracemalloc.start()
+    fn(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def check_identical(windows: int, size: int, fast: int, slow: int, seed: int) -> int:
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    for _ in range(windows):
+        rows = random_rows(rng, size)
+        ring = CandleRing(size)
+        for row in rows:
+            ring.append(row)
+        df = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        ours = ema_cross(ring.closes, fast, slow)
+        ref = tuple(float(v) for v in pandas_cross(df, fast, slow))
+        if ours != ref:
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the pandas-free live core')
+    ap.add_argument('--runs', type=int, default=5, help='interpreter starts per startup measurement')
+    ap.add_argument('--windows', type=int, default=2000, help='random windows for the identity check')
+    ap.add_argument('--size', type=int, default=200, help='candles per window (live cache size)')
+    ap.add_argument('--fast', type=int, default=21)
+    ap.add_argument('--slow', type=int, default=55)
+    ap.add_argument('--calls', type=int, default=2000)
+    args = ap.parse_args()
+
+    core_ms, core_rss = startup('run_strat1', args.runs)
+    pd_ms, pd_rss = startup('run_strat1, pandas', args.runs)
+    print(f"startup  run_strat1           {core_ms:8.1f} ms  {core_rss:7.1f} MB RSS")
+    print(f"startup  run_strat1 + pandas  {pd_ms:8.1f} ms  {pd_rss:7.1f} MB RSS")
+    print(f"saved    {pd_ms - core_ms:8.1f} ms  {pd_rss - core_rss:7.1f} MB per process")
+
+    import pandas as pd
+    rows = random_rows(np.random.default_rng(0), args.size)
+    ring = CandleRing(args.size)
+    for row in rows:
+        ring.append(row)
+    df = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    core_us, core_peak = per_call(lambda r: ema_cross(r.closes, args.fast, args.slow), ring, args.calls)
+    pd_us, pd_peak = per_call(lambda d: pandas_cross(d, args.fast, args.slow), df, args.calls)
+    print(f"signal   core    {core_us:8.1f} us/call  {core_peak / 1024:7.1f} KiB peak alloc")
+    print(f"signal   pandas  {pd_us:8.1f} us/call  {pd_peak / 1024:7.1f} KiB peak alloc")
+
+    mismatches = check_identical(args.windows, args.size, args.fast, args.slow, seed=1)
+    print(f"identity {args.windows} windows, {mismatches} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,489 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+import ccxt
+import botlog
+import main as single
+import run_strat1
+from account_snapshot import AccountSnapshot
+from candle_cache import CandleCache, CandleRing, TimeframeSet
+from candle_store import DATA_DIR
+from ema_state import EmaBank, EmaCrossState, ema_cross
+from fake_exchange import FakeExchange, synthetic_candles
+from order_pipeline import client_order_id
+from request_scheduler import RequestScheduler
+from strategies import StrategyBook
+
+# Offline benchmark suite for the strategy hot path, run against fake_exchange on synthetic
+# candles so results only depend on the code and the machine:
+#   helpers   per-call time of the trading helpers (fetch_ohlcv_df, get_signal, round_amount, ...)
+#   cycle     one bar cycle per symbol: main.py's loop body vs run_strat1's symbol-thread body
+#   memory    RSS of a main.py process (one symbol) vs RSS added per run_strat1 symbol thread
+#   capacity  symbols one process can serve within --deadline seconds of a bar close, with
+#             --latency-ms per request and Bitget's request budget (request_scheduler)
+# Results go to JSON (--out, default data/bench/<commit>.json); --compare OLD.json prints the
+# change per metric and exits 1 when one got worse by more than --tolerance.
+#   python src/bench_suite.py [--sections helpers,cycle,memory,capacity] [--compare data/bench/abc123.json]
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+SECTIONS = ('helpers', 'cycle', 'memory', 'capacity')
+# Bitget cost units per call; a single-symbol position query costs 2, all positions 4
+COSTS = {'fetch_positions': 4, 'create_order': 2}
+LANES = {'fetch_ohlcv': 'candles', 'fetch_positions': 'position', 'create_order': 'order', 'fetch_order': 'order'}
+
+
+class BenchExchange(FakeExchange):
+    # The fake behind the live client's request budget: with a scheduler set, every call first
+    # waits for its Bitget weight like ExchangeGateway.throttle, then takes the simulated latency
+    scheduler = None
+
+    def _call(self, name, impl, *args, **kwargs):
+        if self.scheduler is not None:
+            cost = COSTS.get(name, 1)
+            if name == 'fetch_positions' and args and args[0] and len(args[0]) == 1:
+                cost = 2
+            self.scheduler.acquire(cost, LANES.get(name, 'market'))
+        return super()._call(name, impl, *args, **kwargs)
+
+
+def bench_symbols(n: int):
+    return [f'B{i:03d}' for i in range(n)]
+
+
+def bar_ms(book) -> int:
+    # One step of the clock closes a bar on every timeframe either runner uses
+    timeframes = [single.TIMEFRAME] + [tf for s in book.strategies for tf in s.timeframes]
+    return max(ccxt.Exchange.parse_timeframe(tf) for tf in timeframes) * 1000
+
+
+def make_exchange(symbols, base_timeframe: str, steps: int, step_ms: int):
+    tf_ms = ccxt.Exchange.parse_timeframe(base_timeframe) * 1000
+    bars = 300 + (steps + 2) * max(1, step_ms // tf_ms)
+    candles = {s: synthetic_candles(bars, base_timeframe, start_ms=1_700_000_000_000 // tf_ms * tf_ms, seed=i)
+               for i, s in enumerate(symbols)}
+    return BenchExchange(candles, base_timeframe)
+
+
+def base_timeframe(book) -> str:
+    timeframes = [tf for s in book.strategies for tf in s.timeframes]
+    return run_strat1.BASE_TIMEFRAME or min(timeframes, key=ccxt.Exchange.parse_timeframe)
+
+
+def per_call(fn, calls: int, repeat: int) -> float:
+    # Microseconds per call in the fastest of `repeat` rounds (as timeit: slower rounds measure other load)
+    fn()
+    rounds = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        rounds.append((time.perf_counter() - t) / calls * 1e6)
+    return min(rounds)
+
+
+# ---- runner cycles ----
+
+class SingleState:
+    # main.py's per-symbol state: its candle cache and EMA cross
+    __slots__ = ('symbol', 'market', 'candles', 'ema')
+
+    def __init__(self, exchange, symbol: str):
+        self.symbol = symbol
+        self.market = exchange.market(symbol)
+        self.candles = CandleCache(exchange, symbol, single.TIMEFRAME, size=max(200, single.SLOW_EMA + 50))
+        self.ema = EmaCrossState(single.FAST_EMA, single.SLOW_EMA)
+
+
+def single_cycle(exchange, st: SingleState) -> str:
+    # main.py's loop body on a bar event, up to the entry decision
+    st.candles.refresh()
+    st.ema.sync(st.candles.timestamps, st.candles.closes)
+    signal = st.ema.signal()
+    pos = single.get_position(exchange, st.symbol)
+    price = single.get_last_price(exchange, st.symbol)
+    single.close_position(exchange, st.market, st.symbol, pos, price, single.TP_PCT, single.SL_PCT)
+    return signal
+
+
+class ThreadState:
+    # run_strat1's per-symbol state: shared-feed candles, EMA banks and strategy slots
+    __slots__ = ('symbol', 'ccxt_symbol', 'market', 'slots', 'timeframes', 'candles', 'banks', 'pairs', 'warned')
+
+    def __init__(self, exchange, symbol: str, book):
+        self.symbol = symbol
+        self.ccxt_symbol = run_strat1.symbol_to_ccxt(symbol)
+        self.market = exchange.market(self.ccxt_symbol)
+        self.slots = book.for_symbol(symbol)
+        self.timeframes = book.timeframes(symbol)
+        size = max([200] + [s.slow + 50 for s in book.strategies])
+        self.candles = TimeframeSet(exchange, self.ccxt_symbol, self.timeframes, run_strat1.BASE_TIMEFRAME, size=size)
+        self.banks = {tf: EmaBank() for tf in self.timeframes}
+        self.pairs = run_strat1.ema_pairs(self.slots, self.banks)
+        self.warned = None
+
+
+def thread_cycle(exchange, snapshot, book, st: ThreadState):
+    # run_strategy_for_symbol's loop body on a bar event, up to the entry decision
+    closed = st.candles.refresh()
+    advanced = [tf for tf in st.timeframes if st.banks[tf].sync(st.candles[tf].timestamps, st.candles[tf].closes)]
+    for slot in st.slots:
+        run_strat1.evaluate_slot(slot, st.pairs, advanced, f'Thread {st.symbol}', book)
+    pos, positions_ok = snapshot.position_state(st.ccxt_symbol)
+    side = run_strat1.side_from_position(pos)
+    price = snapshot.last_price(st.ccxt_symbol)
+    st.warned = run_strat1.sync_positions(book, st.symbol, st.slots, pos, side, exchange, st.market, st.warned, positions_ok)
+    for slot in st.slots:
+        s = slot.strategy
+        run_strat1.close_position(exchange, st.market, st.ccxt_symbol, slot.position(), price, s.tp_pct, s.sl_pct, None, s.name)
+        book.take_signal(slot)
+    return closed
+
+
+def setup_single(exchange, symbols):
+    states = [SingleState(exchange, run_strat1.symbol_to_ccxt(s)) for s in symbols]
+    for st in states:
+        single_cycle(exchange, st)
+    return states
+
+
+def setup_threads(exchange, symbols, book):
+    snapshot = AccountSnapshot(exchange, [run_strat1.symbol_to_ccxt(s) for s in symbols], max_age=run_strat1.SNAPSHOT_MAX_AGE)
+    states = [ThreadState(exchange, s, book) for s in symbols]
+    for st in states:
+        thread_cycle(exchange, snapshot, book, st)
+    return snapshot, states
+
+
+# ---- sections ----
+
+def bench_helpers(calls: int, repeat: int):
+    book = StrategyBook(run_strat1.STRATEGIES, symbols=['SOL'])
+    base = base_timeframe(book)
+    tf_ms = ccxt.Exchange.parse_timeframe(base) * 1000
+    ex = make_exchange(['SOL'], base, calls * repeat + 10, tf_ms)
+    symbol = 'SOL/USDT:USDT'
+    market = ex.market(symbol)
+    df = single.fetch_ohlcv_df(ex, symbol, single.TIMEFRAME, 200)
+    cache = CandleCache(ex, symbol, base, size=200)
+    cache.refresh()
+    ring = CandleRing(200)
+    rows = iter(ex.fetch_ohlcv(symbol, base, limit=1000) * (calls * repeat // 300 + 2))
+    ema = EmaCrossState(single.FAST_EMA, single.SLOW_EMA)
+    ts = [0]
+
+    def next_bar():
+        # A new closed bar per call, as on a bar event
+        row = next(rows)
+        ts[0] += tf_ms
+        ring.append([ts[0]] + row[1:])
+        return ema.sync(ring.timestamps, ring.closes)
+
+    def refresh():
+        ex.advance(tf_ms)
+        return cache.refresh()
+
+    pos = {'symbol': symbol, 'side': 'long', 'contracts': 1.0, 'entryPrice': 100.0, 'info': {}}
+    helpers = (
+        ('fetch_ohlcv_df', lambda: single.fetch_ohlcv_df(ex, symbol, single.TIMEFRAME, 200)),
+        ('get_signal_df', lambda: single.get_signal(df)),
+        ('get_signal_cache', lambda: run_strat1.get_signal(cache)),
+        ('ema_cross_200', lambda: ema_cross(cache.closes, single.FAST_EMA, single.SLOW_EMA)),
+        ('ema_state_sync', next_bar),
+        ('candle_refresh', refresh),
+        ('round_amount', lambda: run_strat1.round_amount(ex, market, 1.2345678)),
+        ('usd_to_contracts', lambda: run_strat1.usd_to_contracts(ex, market, 50.0, 101.3)),
+        ('get_position', lambda: single.get_position(ex, symbol)),
+        ('get_last_price', lambda: single.get_last_price(ex, symbol)),
+        ('check_exit', lambda: run_strat1.check_exit(pos, 100.4, 0.01, 0.005)),
+        ('client_order_id', lambda: client_order_id('default', symbol, 'entry', 1_700_000_000_000, 'long')),
+    )
+    results = {}
+    for name, fn in helpers:
+        # The pandas helpers are ~100x slower; fewer calls keep the section short
+        n = max(1, calls // 10) if name.endswith('_df') else calls
+        results[f'helpers.{name}'] = (per_call(fn, n, repeat), 'us', 'lower')
+    return results, {}
+
+
+def bench_cycle(cycles: int):
+    symbols = ['SOL']
+    book = StrategyBook(run_strat1.STRATEGIES, symbols=symbols)
+    step = bar_ms(book)
+    ex = make_exchange(symbols, base_timeframe(book), cycles, step)
+    (st_single,) = setup_single(ex, symbols)
+    snapshot, (st_thread,) = setup_threads(ex, symbols, book)
+    times = {'main': [], 'threads': []}
+    for _ in range(cycles):
+        ex.advance(step)
+        t = time.perf_counter()
+        single_cycle(ex, st_single)
+        times['main'].append(time.perf_counter() - t)
+        # The symbol threads share one positions/tickers fetch per SNAPSHOT_MAX_AGE
+        snapshot.invalidate()
+        t = time.perf_counter()
+        thread_cycle(ex, snapshot, book, st_thread)
+        times['threads'].append(time.perf_counter() - t)
+    results = {}
+    for runner, samples in times.items():
+        results[f'cycle.{runner}.p50'] = (float(np.percentile(samples, 50)) * 1e6, 'us', 'lower')
+        results[f'cycle.{runner}.p95'] = (float(np.percentile(samples, 95)) * 1e6, 'us', 'lower')
+    return results, {}
+
+
+# Memory children run as `python -c` with only their runner's imports plus the fake exchange, so the
+# RSS is that of a bot process rather than of this harness (which imports both runners and more)
+MEMORY_PRELUDE = (
+    "import os, resource, threading\n"
+    "import botlog\n"
+    "from fake_exchange import FakeExchange, synthetic_candles\n"
+    "botlog.configure(level='warning')\n"
+    "n, symbols, tf, bars = {n}, {symbols!r}, {tf!r}, {bars}\n"
+    "tf_ms = FakeExchange.parse_timeframe(tf) * 1000\n"
+    "ex = FakeExchange({{s: synthetic_candles(bars, tf, start_ms=1_700_000_000_000 // tf_ms * tf_ms, seed=i)\n"
+    "                   for i, s in enumerate(symbols)}}, tf)\n"
+)
+MEMORY_RSS = (
+    "try:\n"
+    "    with open('/proc/self/statm') as f:\n"
+    "        print(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024)\n"
+    "except OSError:\n"
+    "    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+MEMORY_CHILD = {
+    # main.py: one symbol's candle cache and EMA cross, after one loop body
+    'main': (
+        "import main\n"
+        "from candle_cache import CandleCache\n"
+        "from ema_state import EmaCrossState\n"
+        + MEMORY_PRELUDE +
+        "symbol = symbols[0] + '/USDT:USDT'\n"
+        "market = ex.market(symbol)\n"
+        "candles = CandleCache(ex, symbol, main.TIMEFRAME, size=max(200, main.SLOW_EMA + 50))\n"
+        "ema = EmaCrossState(main.FAST_EMA, main.SLOW_EMA)\n"
+        "candles.refresh()\n"
+        "ema.sync(candles.timestamps, candles.closes)\n"
+        "main.close_position(ex, market, symbol, main.get_position(ex, symbol), main.get_last_price(ex, symbol), main.TP_PCT, main.SL_PCT)\n"
+        + MEMORY_RSS
+    ),
+    # run_strat1: n symbols' shared candles, EMA banks and slots, one idle thread each
+    'threads': (
+        "import run_strat1\n"
+        "from account_snapshot import AccountSnapshot\n"
+        "from candle_cache import TimeframeSet\n"
+        "from ema_state import EmaBank\n"
+        "from strategies import StrategyBook\n"
+        + MEMORY_PRELUDE +
+        "book = StrategyBook(run_strat1.STRATEGIES, symbols=symbols[:n])\n"
+        "snapshot = AccountSnapshot(ex, [run_strat1.symbol_to_ccxt(s) for s in symbols[:n]], max_age=run_strat1.SNAPSHOT_MAX_AGE)\n"
+        "size = max([200] + [s.slow + 50 for s in book.strategies])\n"
+        "stop, states = threading.Event(), []\n"
+        "for symbol in symbols[:n]:\n"
+        "    ccxt_symbol = run_strat1.symbol_to_ccxt(symbol)\n"
+        "    timeframes = book.timeframes(symbol)\n"
+        "    candles = TimeframeSet(ex, ccxt_symbol, timeframes, run_strat1.BASE_TIMEFRAME, size=size)\n"
+        "    banks = {{t: EmaBank() for t in timeframes}}\n"
+        "    pairs = run_strat1.ema_pairs(book.for_symbol(symbol), banks)\n"
+        "    candles.refresh()\n"
+        "    for t in timeframes:\n"
+        "        banks[t].sync(candles[t].timestamps, candles[t].closes)\n"
+        "    snapshot.position_state(ccxt_symbol)\n"
+        "    states.append((candles, banks, pairs))\n"
+        "    threading.Thread(target=stop.wait, name=f'symbol-{{symbol}}', daemon=True).start()\n"
+        + MEMORY_RSS
+    ),
+}
+
+
+def child_rss(runner: str, n: int, total: int) -> int:
+    # The fake exchange always holds `total` symbols, so differences between runs are bot state only
+    book = StrategyBook(run_strat1.STRATEGIES, symbols=bench_symbols(n))
+    tf = base_timeframe(book)
+    bars = 300 + 4 * max(1, bar_ms(book) // (ccxt.Exchange.parse_timeframe(tf) * 1000))
+    code = MEMORY_CHILD[runner].format(n=n, symbols=bench_symbols(total), tf=tf, bars=bars)
+    out = subprocess.run([sys.executable, '-c', code], cwd=SRC, capture_output=True, text=True, check=True).stdout.split()
+    return int(out[-1])
+
+
+def bench_memory(symbols: int):
+    single_kb = child_rss('main', 1, 1)
+    one_kb = child_rss('threads', 1, symbols)
+    many_kb = child_rss('threads', symbols, symbols)
+    per_symbol = (many_kb - one_kb) / max(1, symbols - 1)
+    results = {
+        # main.py runs one process per symbol, so a symbol costs the whole process
+        'memory.main.per_symbol': (single_kb / 1024, 'MB', 'lower'),
+        'memory.threads.process': (one_kb / 1024, 'MB', 'lower'),
+        'memory.threads.per_symbol': (per_symbol / 1024, 'MB', 'lower'),
+    }
+    return results, {'memory.threads.rss_kb': {1: one_kb, symbols: many_kb}}
+
+
+def bar_makespan(runner: str, n: int, latency: float, rate: float, burst: float) -> float:
+    # Seconds from a bar close until all n symbols have evaluated it. Set-up (backfill) is free;
+    # the bar itself pays latency and the request budget.
+    symbols = bench_symbols(n)
+    book = StrategyBook(run_strat1.STRATEGIES, symbols=symbols)
+    step = bar_ms(book)
+    ex = make_exchange(symbols, base_timeframe(book), 1, step)
+    if runner == 'threads':
+        snapshot, states = setup_threads(ex, symbols, book)
+    else:
+        states = setup_single(ex, symbols)
+    ex.advance(step)
+    ex.latency = (latency, latency)
+    ex.scheduler = RequestScheduler(rate, burst)
+    if runner == 'main':
+        # main.py's loop body, one symbol after the other
+        t = time.perf_counter()
+        for st in states:
+            single_cycle(ex, st)
+        return time.perf_counter() - t
+    snapshot.invalidate()
+    go = threading.Event()
+    threads = []
+    for st in states:
+        def body(st=st):
+            go.wait()
+            thread_cycle(ex, snapshot, book, st)
+        threads.append(threading.Thread(target=body, daemon=True))
+    for t in threads:
+        t.start()
+    t = time.perf_counter()
+    go.set()
+    for th in threads:
+        th.join()
+    return time.perf_counter() - t
+
+
+def capacity(runner: str, latency: float, deadline: float, rate: float, burst: float, max_symbols: int):
+    # Largest n with bar_makespan <= deadline: doubling, then bisection
+    spans = {}
+
+    def fits(n):
+        spans[n] = round(bar_makespan(runner, n, latency, rate, burst), 4)
+        return spans[n] <= deadline
+
+    if not fits(1):
+        return 0, spans
+    lo, hi = 1, 2
+    while hi <= max_symbols and fits(hi):
+        lo, hi = hi, hi * 2
+    hi = min(hi, max_symbols + 1)
+    while hi - lo > 1 and hi - lo > lo // 20:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            lo = mid
+        else:
+            hi = mid
+    return lo, spans
+
+
+def bench_capacity(latency: float, deadline: float, rate: float, burst: float, max_symbols: int):
+    threads, thread_spans = capacity('threads', latency, deadline, rate, burst, max_symbols)
+    sequential, single_spans = capacity('main', latency, deadline, rate, burst, max_symbols)
+    results = {
+        'capacity.threads.symbols_per_process': (threads, 'symbols', 'higher'),
+        # main.py serves one symbol per process; this is how many its loop could take in turn
+        'capacity.main.sequential_symbols': (sequential, 'symbols', 'higher'),
+    }
+    return results, {'capacity.threads.makespan_s': thread_spans, 'capacity.main.makespan_s': single_spans}
+
+
+# ---- output ----
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SRC,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(report, old_path: str, tolerance: float) -> int:
+    # Prints old -> new per shared metric; returns how many got worse by more than tolerance
+    with open(old_path) as f:
+        old = json.load(f)
+    worse = 0
+    print(f"\ncompared with {old_path} ({old.get('commit')})")
+    for name, new in report['results'].items():
+        prev = old.get('results', {}).get(name)
+        if prev is None or not prev['value']:
+            continue
+        change = (new['value'] - prev['value']) / abs(prev['value'])
+        regressed = change > tolerance if new['better'] == 'lower' else change < -tolerance
+        worse += regressed
+        flag = '  WORSE' if regressed else ''
+        print(f"  {name:40s} {prev['value']:12.2f} -> {new['value']:12.2f} {new['unit']:8s} {change:+7.1%}{flag}")
+    return worse
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Offline benchmark suite for the strategy hot path and multi-symbol throughput')
+    ap.add_argument('--sections', default=','.join(SECTIONS), help=f"comma separated, from {', '.join(SECTIONS)}")
+    ap.add_argument('--calls', type=int, default=200, help='calls per helper timing round')
+    ap.add_argument('--repeat', type=int, default=5, help='timing rounds per helper (fastest reported)')
+    ap.add_argument('--cycles', type=int, default=300, help='bar cycles timed per runner')
+    ap.add_argument('--memory-symbols', type=int, default=50, help='symbol threads for the per-symbol memory slope')
+    ap.add_argument('--latency-ms', type=float, default=80.0, help='simulated round trip per request (capacity)')
+    ap.add_argument('--deadline', type=float, default=5.0, help='seconds after a bar close by which every symbol must have evaluated it')
+    ap.add_argument('--rate', type=float, default=20.0, help='request budget in cost units per second (Bitget: 20)')
+    ap.add_argument('--burst', type=float, default=run_strat1.REQUEST_BURST)
+    ap.add_argument('--max-symbols', type=int, default=512)
+    ap.add_argument('--out', help='JSON results file (default data/bench/<commit>.json)')
+    ap.add_argument('--compare', help='earlier JSON results to compare against')
+    ap.add_argument('--tolerance', type=float, default=0.25, help='relative change counted as a regression')
+    args = ap.parse_args()
+    # Status lines would dominate the timings (and the output)
+    botlog.configure(level='warning')
+
+    sections = [s.strip() for s in args.sections.split(',') if s.strip()]
+    results, details = {}, {}
+    for section in sections:
+        t = time.perf_counter()
+        if section == 'helpers':
+            r, d = bench_helpers(args.calls, args.repeat)
+        elif section == 'cycle':
+            r, d = bench_cycle(args.cycles)
+        elif section == 'memory':
+            r, d = bench_memory(args.memory_symbols)
+        elif section == 'capacity':
+            r, d = bench_capacity(args.latency_ms / 1000, args.deadline, args.rate, args.burst, args.max_symbols)
+        else:
+            ap.error(f"unknown section {section}")
+        for name, (value, unit, better) in r.items():
+            results[name] = {'value': round(float(value), 4), 'unit': unit, 'better': better}
+            print(f"{name:40s} {value:12.2f} {unit}")
+        details.update(d)
+        print(f"  ({section}: {time.perf_counter() - t:.1f}s)")
+
+    commit, dirty = git_commit()
+    report = {
+        'commit': commit, 'dirty': dirty,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+        'config': {'strategies': [str(s) for s in run_strat1.STRATEGIES], 'timeframe': single.TIMEFRAME},
+        'results': results,
+        'details': details,
+    }
+    out = args.out or os.path.join(DATA_DIR, 'bench', f"{commit or 'local'}{'-dirty' if dirty else ''}.json")
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}")
+    if args.compare:
+        sys.exit(1 if compare(report, args.compare, args.tolerance) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+
+# Bot logging: callers only enqueue, a background thread formats and writes, so the trading
+# loop never blocks on console or disk I/O. Arguments that are callables are evaluated only
+# when the record passes the level check (dprint('OHLCV head:', df.head) costs nothing when
+# debug is off); everything else is formatted on the writer thread.
+#   text: the same lines print() produced ('[DEBUG] ' prefix for debug)
+#   json: one object per line with ts, level, symbol, stage, msg and extra fields (order_id, ...)
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+# Records kept in memory; when full, debug/info records are dropped (counted in `dropped` and
+# reported by the writer), warning/error wait up to FULL_WAIT seconds for room
+QUEUE_SIZE = 10000
+FULL_WAIT = 1.0
+# Records written per flush
+BATCH = 256
+
+
+def _symbol_key(symbol) -> str:
+    # 'SOL', 'sol' and 'SOL/USDT:USDT' share one per-symbol level
+    return str(symbol).split('/')[0].upper()
+
+
+def _text(value) -> str:
+    return value if isinstance(value, str) else str(value)
+
+
+class BotLogger:
+    def __init__(self, level: str = 'info', symbol_levels=None, fmt: str = 'text', stream=None, path: str = None):
+        self.level = LEVELS[level]
+        self.symbol_levels = {_symbol_key(k): LEVELS[v] for k, v in (symbol_levels or {}).items()}
+        self.fmt = fmt
+        self.stream = stream
+        self.path = path
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = 0
+        # Part of `dropped` already written out as a report line
+        self.reported = 0
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def enabled(self, level: str, symbol=None) -> bool:
+        if symbol is not None and self.symbol_levels:
+            threshold = self.symbol_levels.get(_symbol_key(symbol), self.level)
+        else:
+            threshold = self.level
+        return LEVELS[level] >= threshold
+
+    def log(self, level: str, *args, symbol=None, stage=None, **fields):
+        if not self.enabled(level, symbol):
+            return
+        args = tuple(a() if callable(a) else a for a in args)
+        self._start()
+        record = (time.time(), level, args, symbol, stage, fields)
+        try:
+            if LEVELS[level] >= LEVELS['warning']:
+                self.queue.put(record, timeout=FULL_WAIT)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='botlog-writer', daemon=True)
+                self.thread.start()
+
+    def format(self, record) -> str:
+        ts, level, args, symbol, stage, fields = record
+        msg = ' '.join(_text(a) for a in args)
+        if self.fmt != 'json':
+            return f'[DEBUG] {msg}' if level == 'debug' else msg
+        out = {'ts': round(ts, 3), 'level': level, 'symbol': _symbol_key(symbol) if symbol else None, 'stage': stage, 'msg': msg}
+        out.update(fields)
+        return json.dumps(out, default=str)
+
+    def _run(self):
+        out = open(self.path, 'a', buffering=1 << 16) if self.path else None
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for record in batch:
+                try:
+                    lines.append(self.format(record))
+                except Exception as e:
+                    lines.append(f'[botlog] unformattable record: {e!r}')
+            dropped = self.dropped - self.reported
+            if dropped:
+                # Written before task_done, so flush() also waits for the report
+                self.reported += dropped
+                lines.append(self.format((time.time(), 'warning', (f'[botlog] log queue full: dropped {dropped} records',),
+                                          None, 'log', {'dropped': dropped})))
+            stream = out or self.stream or sys.stdout
+            if lines:
+                try:
+                    stream.write('\n'.join(lines) + '\n')
+                    stream.flush()
+                except (OSError, ValueError):
+                    pass
+            for _ in batch:
+                self.queue.task_done()
+
+    def flush(self):
+        # Blocks until everything queued so far is written (exit paths and tests only)
+        if self.thread is not None:
+            self.queue.join()
+
+
+_logger = BotLogger()
+atexit.register(lambda: _logger.flush())
+
+
+def configure(level: str = 'info', symbol_levels=None, fmt: str = 'text', path: str = None, stream=None):
+    # symbol_levels: {'SOL': 'debug', 'ETH': 'warning'}; symbols not listed use level
+    global _logger
+    _logger.flush()
+    _logger = BotLogger(level, symbol_levels, fmt, stream, path)
+    return _logger
+
+
+def parse_symbol_levels(text: str):
+    # "SOL=debug,ETH=warning" -> {'SOL': 'debug', 'ETH': 'warning'}
+    levels = {}
+    for part in (text or '').split(','):
+        if '=' in part:
+            symbol, level = part.split('=', 1)
+            levels[symbol.strip().upper()] = level.strip().lower()
+    return levels
+
+
+def enabled(level: str, symbol=None) -> bool:
+    return _logger.enabled(level, symbol)
+
+
+def debug(*args, **kwargs):
+    _logger.log('debug', *args, **kwargs)
+
+
+def info(*args, **kwargs):
+    _logger.log('info', *args, **kwargs)
+
+
+def warning(*args, **kwargs):
+    _logger.log('warning', *args, **kwargs)
+
+
+def error(*args, **kwargs):
+    _logger.log('error', *args, **kwargs)
+
+
+def flush():
+    _logger.flush()
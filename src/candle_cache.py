@@ -0,0 +1,379 @@
+from array import array
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+# Minimum bars a delta fetch asks for; normally only 1-2 come back
+DELTA_LIMIT = 20
+# Most bars one Bitget candle request returns; bounds the base window of a TimeframeSet
+MAX_BASE_BARS = 1000
+DAY_MS = 86_400_000
+
+
+def resample_rows(rows, tf_ms: int):
+    # Aggregate time-ordered OHLCV rows into tf_ms buckets aligned to UTC (as Bitget aligns them):
+    # first open, highest high, lowest low, last close, summed volume
+    out = []
+    for ts, o, h, l, c, v in rows:
+        bucket = int(ts) - int(ts) % tf_ms
+        if out and out[-1][0] == bucket:
+            bar = out[-1]
+            if h > bar[2]:
+                bar[2] = h
+            if l < bar[3]:
+                bar[3] = l
+            bar[4] = c
+            bar[5] += v or 0.0
+        else:
+            out.append([bucket, o, h, l, c, v or 0.0])
+    return out
+
+
+def contiguous(rows, tf_ms: int) -> bool:
+    # True when consecutive rows are exactly one bar apart (no holes, no duplicates)
+    return all(b[0] - a[0] == tf_ms for a, b in zip(rows, rows[1:]))
+
+
+def candle_closes(candles):
+    # Close column of a CandleCache/CandleRing (no copy), a list of OHLCV rows, or a DataFrame
+    closes = getattr(candles, 'closes', None)
+    if closes is not None:
+        return closes
+    if isinstance(candles, (list, tuple)):
+        return [row[4] for row in candles]
+    return candles['close'].to_numpy()
+
+
+class RingColumn:
+    # Read-only, oldest-first view of one ring buffer column (no copying)
+    __slots__ = ('ring', 'data')
+
+    def __init__(self, ring, data):
+        self.ring = ring
+        self.data = data
+
+    def __len__(self):
+        return self.ring.size
+
+    def __getitem__(self, i):
+        ring = self.ring
+        if isinstance(i, slice):
+            return [self.data[(ring.start + j) % ring.capacity] for j in range(*i.indices(ring.size))]
+        if i < 0:
+            i += ring.size
+        if i < 0 or i >= ring.size:
+            raise IndexError('ring index out of range')
+        return self.data[(ring.start + i) % ring.capacity]
+
+    def __iter__(self):
+        for j in range(self.ring.size):
+            yield self.data[(self.ring.start + j) % self.ring.capacity]
+
+
+class CandleRing:
+    # Fixed-size OHLCV ring buffer; the newest slot may hold the still-forming candle
+    __slots__ = ('capacity', 'start', 'size', 'cols', 'timestamps', 'opens', 'highs', 'lows', 'closes', 'volumes')
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        self.cols = (array('q', [0]) * capacity,) + tuple(array('d', [0.0]) * capacity for _ in range(5))
+        self.timestamps, self.opens, self.highs, self.lows, self.closes, self.volumes = (RingColumn(self, c) for c in self.cols)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def last_ts(self):
+        if self.size == 0:
+            return None
+        return self.cols[0][(self.start + self.size - 1) % self.capacity]
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    def _write(self, slot, row):
+        cols = self.cols
+        cols[0][slot] = int(row[0])
+        for k in range(1, 6):
+            v = row[k]
+            cols[k][slot] = float(v) if v is not None else 0.0
+
+    def append(self, row):
+        if self.size < self.capacity:
+            slot = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            # Full: overwrite the oldest bar
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        self._write(slot, row)
+
+    def replace_last(self, row):
+        self._write((self.start + self.size - 1) % self.capacity, row)
+
+    def row(self, i):
+        if i < 0:
+            i += self.size
+        slot = (self.start + i) % self.capacity
+        return [c[slot] for c in self.cols]
+
+    def rows(self):
+        return [self.row(i) for i in range(self.size)]
+
+
+class CandleCache:
+    # Per-symbol candle cache: one full backfill, then delta fetches with `since`
+    def __init__(self, exchange, symbol: str, timeframe: str, size: int = 200):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.tf_ms = exchange.parse_timeframe(timeframe) * 1000
+        self.ring = CandleRing(size)
+        self.backfills = 0
+        self.gaps = 0
+
+    def __len__(self):
+        return len(self.ring)
+
+    @property
+    def timestamps(self):
+        return self.ring.timestamps
+
+    @property
+    def closes(self):
+        return self.ring.closes
+
+    @property
+    def last_ts(self):
+        return self.ring.last_ts
+
+    def _fill(self, ohlcv) -> int:
+        self.ring.clear()
+        for row in ohlcv:
+            self.ring.append(row)
+        return len(ohlcv)
+
+    def _merge(self, ohlcv):
+        # Merge a delta response; returns bars changed, or None if it left a gap after the cache
+        changed = 0
+        for row in ohlcv:
+            ts = row[0]
+            last_ts = self.ring.last_ts
+            if ts < last_ts:
+                continue
+            if ts == last_ts:
+                self.ring.replace_last(row)
+            elif ts == last_ts + self.tf_ms:
+                self.ring.append(row)
+            else:
+                self.gaps += 1
+                return None
+            changed += 1
+        return changed
+
+    def push(self, ohlcv):
+        # Merge candles pushed by a streaming feed; None means a gap, so call refresh() to repair over REST
+        if len(self.ring) == 0:
+            return None
+        return self._merge(ohlcv)
+
+    def warm_start(self, rows) -> int:
+        # Seed from stored bars (candle_store.tail_rows) so startup needs only a delta fetch.
+        # Skipped when the store is further behind than the buffer holds; backfill is cheaper then.
+        # Also skipped when the window has a hole: indicators would run across missing bars, and
+        # when the store is ahead of the exchange clock (a replay on a simulated clock).
+        if not rows or not 0 <= self.bars_behind(rows[-1][0]) <= self.ring.capacity:
+            return 0
+        window = rows[-self.ring.capacity:]
+        if not contiguous(window, self.tf_ms):
+            return 0
+        self._fill(window)
+        return len(self.ring)
+
+    def bars_behind(self, ts) -> int:
+        # Against the exchange clock (wall time for ccxt, the simulated one in fake_exchange)
+        return int((self.exchange.milliseconds() - ts) // self.tf_ms)
+
+    def delta_limit(self) -> int:
+        # Enough to catch up in one request after a pause, small in the steady state
+        return min(max(DELTA_LIMIT, self.bars_behind(self.ring.last_ts) + 2), self.ring.capacity)
+
+    def backfill(self) -> int:
+        self.backfills += 1
+        return self._fill(self.exchange.fetch_ohlcv(self.symbol, timeframe=self.timeframe, limit=self.ring.capacity))
+
+    def refresh(self) -> int:
+        # Returns how many bars were appended or replaced
+        if len(self.ring) == 0:
+            return self.backfill()
+        changed = 0
+        while True:
+            since = self.ring.last_ts
+            limit = self.delta_limit()
+            # `since` = start of the cached forming candle, so it comes back too and is replaced in place
+            ohlcv = self.exchange.fetch_ohlcv(self.symbol, timeframe=self.timeframe, since=since, limit=limit)
+            merged = self._merge(ohlcv)
+            if merged is None:
+                # Missing bars between cache and response: rebuild the window
+                return changed + self.backfill()
+            changed += merged
+            if len(ohlcv) < limit or self.ring.last_ts == since:
+                return changed
+            if changed > self.ring.capacity:
+                # Fell far behind (e.g. after a long outage); a full window is cheaper
+                return changed + self.backfill()
+
+    async def backfill_async(self) -> int:
+        self.backfills += 1
+        return self._fill(await self.exchange.fetch_ohlcv(self.symbol, timeframe=self.timeframe, limit=self.ring.capacity))
+
+    async def refresh_async(self) -> int:
+        # Same as refresh() for ccxt.async_support exchanges
+        if len(self.ring) == 0:
+            return await self.backfill_async()
+        changed = 0
+        while True:
+            since = self.ring.last_ts
+            limit = self.delta_limit()
+            ohlcv = await self.exchange.fetch_ohlcv(self.symbol, timeframe=self.timeframe, since=since, limit=limit)
+            merged = self._merge(ohlcv)
+            if merged is None:
+                return changed + await self.backfill_async()
+            changed += merged
+            if len(ohlcv) < limit or self.ring.last_ts == since:
+                return changed
+            if changed > self.ring.capacity:
+                return changed + await self.backfill_async()
+
+    def to_df(self):
+        # DataFrame in the same shape fetch_ohlcv_df returns, for analytics/debugging
+        import pandas as pd
+        df = pd.DataFrame(self.ring.rows(), columns=list(COLUMNS))
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+        return df
+
+
+class ResampledCandles(CandleCache):
+    # A coarser timeframe built from a finer CandleCache, with no requests of its own once seeded.
+    # The still-forming bar is re-aggregated from the base bars in its bucket on every refresh, so
+    # revisions of the base's forming candle (close, volume) carry over exactly. A backfill of this
+    # timeframe only happens to seed the window or when the base no longer reaches back to it.
+    def __init__(self, base: CandleCache, timeframe: str, size: int = 200):
+        super().__init__(base.exchange, base.symbol, timeframe, size)
+        if self.tf_ms <= base.tf_ms or self.tf_ms % base.tf_ms or DAY_MS % self.tf_ms:
+            raise ValueError(f"Cannot build {timeframe} candles from {base.timeframe}")
+        self.base = base
+
+    @property
+    def ratio(self) -> int:
+        return self.tf_ms // self.base.tf_ms
+
+    def resample(self):
+        # Bars changed, or None when the base window starts after our forming bar (re-seed needed)
+        base = self.base.ring
+        if len(self.ring) == 0 or len(base) == 0:
+            return None
+        since = self.ring.last_ts
+        timestamps = base.timestamps
+        if timestamps[0] > since:
+            return None
+        i = len(base)
+        while i > 0 and timestamps[i - 1] >= since:
+            i -= 1
+        changed = 0
+        for bar in resample_rows([base.row(j) for j in range(i, len(base))], self.tf_ms):
+            if bar[0] == self.ring.last_ts:
+                self.ring.replace_last(bar)
+            else:
+                self.ring.append(bar)
+            changed += 1
+        return changed
+
+    def push(self, ohlcv):
+        # Pushes go to the base; see TimeframeSet.push
+        return self.resample()
+
+    def refresh(self) -> int:
+        changed = self.resample()
+        if changed is None:
+            changed = self.backfill() + (self.resample() or 0)
+        return changed
+
+    async def refresh_async(self) -> int:
+        changed = self.resample()
+        if changed is None:
+            changed = await self.backfill_async() + (self.resample() or 0)
+        return changed
+
+
+class TimeframeSet:
+    # Candles for several timeframes of one symbol from a single feed: only the base (finest)
+    # timeframe is fetched or streamed, the others are ResampledCandles built from it locally.
+    # refresh()/push() return the timeframes that closed a bar, i.e. the bar-close events.
+    def __init__(self, exchange, symbol: str, timeframes, base_timeframe: str = None, size: int = 200):
+        parse = exchange.parse_timeframe
+        self.base_timeframe = base_timeframe or min(timeframes, key=parse)
+        ratio = max([parse(tf) // parse(self.base_timeframe) for tf in timeframes] + [1])
+        # The base window must always cover the forming bar of the coarsest timeframe
+        base_size = max(size, ratio + 2)
+        if base_size > MAX_BASE_BARS:
+            raise ValueError(f"{max(timeframes, key=parse)} needs {base_size} {self.base_timeframe} bars; use a coarser base timeframe")
+        self.base = CandleCache(exchange, symbol, self.base_timeframe, size=base_size)
+        self.frames = {self.base_timeframe: self.base}
+        for tf in timeframes:
+            if tf not in self.frames:
+                self.frames[tf] = ResampledCandles(self.base, tf, size)
+        self.derived = [c for c in self.frames.values() if c is not self.base]
+
+    def __getitem__(self, timeframe: str) -> CandleCache:
+        return self.frames[timeframe]
+
+    def __len__(self):
+        return len(self.base)
+
+    @property
+    def warm_rows(self) -> int:
+        # Stored base bars needed to warm-start every timeframe
+        return max([self.base.ring.capacity] + [c.ring.capacity * c.ratio for c in self.derived])
+
+    def warm_start(self, rows) -> int:
+        # rows: stored base-timeframe bars (candle_store.tail_rows); returns bars seeded into the base
+        # Derived frames read further back than the base window, so the whole tail must be gap-free
+        if not contiguous(rows, self.base.tf_ms):
+            return 0
+        warmed = self.base.warm_start(rows)
+        if not warmed:
+            # Stale store: every frame backfills instead
+            return 0
+        for c in self.derived:
+            c.warm_start(resample_rows(rows, c.tf_ms))
+        return warmed
+
+    def _closed(self, before):
+        return [tf for tf, c in self.frames.items() if c.last_ts != before[tf]]
+
+    def refresh(self):
+        before = {tf: c.last_ts for tf, c in self.frames.items()}
+        self.base.refresh()
+        for c in self.derived:
+            c.refresh()
+        return self._closed(before)
+
+    async def refresh_async(self):
+        before = {tf: c.last_ts for tf, c in self.frames.items()}
+        await self.base.refresh_async()
+        for c in self.derived:
+            await c.refresh_async()
+        return self._closed(before)
+
+    def push(self, ohlcv):
+        # Streamed base klines; None means a gap somewhere, so call refresh_async() to repair
+        before = {tf: c.last_ts for tf, c in self.frames.items()}
+        if self.base.push(ohlcv) is None:
+            return None
+        for c in self.derived:
+            if c.resample() is None:
+                return None
+        return self._closed(before)
@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import numpy as np
+
+# On-disk candle layout, one directory per symbol/timeframe:
+#   <DATA_DIR>/<SYMBOL>/<TIMEFRAME>/timestamp.i64, open.f64, high.f64, low.f64, close.f64, volume.f64
+# Raw little-endian columns so readers can np.memmap them without parsing or copying.
+# Append-only: rows are sorted by timestamp, so the timestamp column doubles as the index
+# (searchsorted range reads). meta.json holds the committed row count; bytes past it are
+# an interrupted append and are ignored by readers and cut off by the next writer.
+COLUMN_TYPES = (
+    ('timestamp', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+)
+META_FILE = 'meta.json'
+
+DATA_DIR = os.getenv('DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def store_path(symbol: str, timeframe: str, root: str = None) -> str:
+    # 'SOL' and 'SOL/USDT:USDT' map to the same directory
+    name = symbol.split('/')[0].upper()
+    return os.path.join(root or DATA_DIR, name, timeframe)
+
+
+def column_file(path: str, name: str, dtype: str) -> str:
+    return os.path.join(path, f"{name}.{dtype[1:]}")
+
+
+def read_meta(path: str):
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_meta(path: str, rows: int, first_ts, last_ts):
+    # Atomic replace: a crash leaves either the old or the new row count, never a torn file
+    tmp = os.path.join(path, META_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump({'rows': int(rows), 'first_ts': first_ts, 'last_ts': last_ts}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+
+def row_count(path: str) -> int:
+    meta = read_meta(path)
+    if meta is not None:
+        return int(meta['rows'])
+    # Store written before meta.json existed: trust the shortest column
+    sizes = []
+    for name, dtype in COLUMN_TYPES:
+        f = column_file(path, name, dtype)
+        sizes.append(os.path.getsize(f) // np.dtype(dtype).itemsize if os.path.exists(f) else 0)
+    return min(sizes)
+
+
+def _as_columns(ohlcv):
+    if isinstance(ohlcv, dict):
+        return {name: np.asarray(ohlcv[name], dtype=dtype) for name, dtype in COLUMN_TYPES}
+    rows = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+    return {name: rows[:, k].astype(dtype) for k, (name, dtype) in enumerate(COLUMN_TYPES)}
+
+
+def write_columns(path: str, ohlcv):
+    # ohlcv: list of [ts, o, h, l, c, v] rows or a dict of column arrays; replaces what is there
+    os.makedirs(path, exist_ok=True)
+    cols = _as_columns(ohlcv)
+    for name, dtype in COLUMN_TYPES:
+        cols[name].tofile(column_file(path, name, dtype))
+    ts = cols['timestamp']
+    write_meta(path, len(ts), int(ts[0]) if len(ts) else None, int(ts[-1]) if len(ts) else None)
+
+
+def last_stored_ts(path: str):
+    # Timestamp of the newest stored bar, None for an empty store
+    meta = read_meta(path)
+    if meta:
+        return meta['last_ts']
+    return int(open_columns(path)['timestamp'][-1]) if row_count(path) else None
+
+
+def append_rows(path: str, ohlcv) -> int:
+    # Append bars newer than the last stored one; returns how many were written
+    os.makedirs(path, exist_ok=True)
+    cols = _as_columns(ohlcv)
+    meta = read_meta(path)
+    rows = row_count(path)
+    last_ts = last_stored_ts(path)
+    first_ts = meta['first_ts'] if meta else (int(open_columns(path)['timestamp'][0]) if rows else None)
+    if last_ts is not None:
+        keep = cols['timestamp'] > last_ts
+        cols = {k: v[keep] for k, v in cols.items()}
+    n = len(cols['timestamp'])
+    if n == 0:
+        return 0
+    for name, dtype in COLUMN_TYPES:
+        f = column_file(path, name, dtype)
+        with open(f, 'ab') as out:
+            # Drop the tail of an append that crashed before meta.json was updated
+            out.truncate(rows * np.dtype(dtype).itemsize)
+            out.seek(0, os.SEEK_END)
+            out.write(cols[name].tobytes())
+            out.flush()
+            os.fsync(out.fileno())
+    ts = cols['timestamp']
+    write_meta(path, rows + n, first_ts if first_ts is not None else int(ts[0]), int(ts[-1]))
+    return n
+
+
+def open_columns(path: str):
+    # Read-only memory maps of every column; pages are shared between processes by the OS
+    cols = {}
+    rows = row_count(path) if os.path.isdir(path) else 0
+    for name, dtype in COLUMN_TYPES:
+        f = column_file(path, name, dtype)
+        if rows == 0:
+            cols[name] = np.zeros(0, dtype=dtype)
+        else:
+            # Plain ndarray view of the map: still zero-copy, without memmap's per-slice subclass overhead
+            cols[name] = np.asarray(np.memmap(f, dtype=dtype, mode='r', shape=(rows,)))
+    return cols
+
+
+def read_range(path: str, start_ms: int = None, end_ms: int = None):
+    # Zero-copy column slices with start_ms <= timestamp < end_ms
+    cols = open_columns(path)
+    ts = cols['timestamp']
+    i = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, 'left'))
+    j = len(ts) if end_ms is None else int(np.searchsorted(ts, end_ms, 'left'))
+    return {k: v[i:j] for k, v in cols.items()}
+
+
+def tail_rows(path: str, n: int):
+    # Last n bars as [ts, o, h, l, c, v] rows (for warm-starting a CandleCache)
+    cols = open_columns(path)
+    start = max(0, len(cols['timestamp']) - n)
+    ts = cols['timestamp'][start:].tolist()
+    others = [cols[name][start:].tolist() for name, _ in COLUMN_TYPES[1:]]
+    return [[t] + [c[k] for c in others] for k, t in enumerate(ts)]
+
+
+def import_csv(symbol: str, timeframe: str, csv_path: str, root: str = None) -> int:
+    from backtest import load_ohlcv_csv
+    ohlcv = load_ohlcv_csv(csv_path)
+    return append_rows(store_path(symbol, timeframe, root), ohlcv)
+
+
+if __name__ == '__main__':
+    # python src/candle_store.py import SOL 1m candles.csv
+    if len(sys.argv) == 5 and sys.argv[1] == 'import':
+        n = import_csv(sys.argv[2], sys.argv[3], sys.argv[4])
+        print(f"Imported {n} bars into {store_path(sys.argv[2], sys.argv[3])}")
+    else:
+        print('usage: candle_store.py import SYMBOL TIMEFRAME file.csv')
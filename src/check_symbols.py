@@ -1,7 +1,13 @@
 import os
+import argparse
 import configparser
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import ccxt
 from dotenv import load_dotenv
+from market_meta import load_markets_cached
+from ema_state import ema_alpha
 
 def get_symbols_from_conf():
     load_dotenv()
@@ -20,30 +26,219 @@ def symbol_to_ccxt(symbol):
 
 def check_symbols_exist():
     exchange = ccxt.bitget({'enableRateLimit': True, 'options': {'defaultType': 'swap'}})
-    exchange.load_markets()
+    # Cached market list (data/markets_bitget.json) when fresh, so repeat runs skip the download
+    load_markets_cached(exchange)
     all_markets = exchange.markets
     symbols = get_symbols_from_conf()
+    listed = [symbol_to_ccxt(s) for s in symbols if symbol_to_ccxt(s) in all_markets and all_markets[symbol_to_ccxt(s)].get('linear')]
+    # One tickers request for every configured symbol
+    try:
+        tickers = exchange.fetch_tickers(listed) if listed else {}
+        ticker_error = None
+    except Exception as e:
+        tickers, ticker_error = {}, e
     print("Checking symbols on Bitget (USDT-margined perps):")
     for symbol in symbols:
         ccxt_symbol = symbol_to_ccxt(symbol)
-        if ccxt_symbol in all_markets and all_markets[ccxt_symbol].get('linear'):
-            # Try to fetch ticker for more market data
-            try:
-                ticker = exchange.fetch_ticker(ccxt_symbol)
-                last = ticker.get('last', 'N/A')
-                bid = ticker.get('bid', 'N/A')
-                ask = ticker.get('ask', 'N/A')
-                high = ticker.get('high', 'N/A')
-                low = ticker.get('low', 'N/A')
-                base_vol = ticker.get('baseVolume', 'N/A')
-                quote_vol = ticker.get('quoteVolume', 'N/A')
-                funding = ticker.get('info', {}).get('fundingRate', 'N/A')
-                mark = ticker.get('info', {}).get('markPrice', 'N/A')
-                print(f"  [OK] {ccxt_symbol} exists and is linear | last: {last} | bid: {bid} | ask: {ask} | high24h: {high} | low24h: {low} | baseVol24h: {base_vol} | quoteVol24h: {quote_vol} | funding: {funding} | mark: {mark}")
-            except Exception as e:
-                print(f"  [OK] {ccxt_symbol} exists and is linear | [ticker error: {e}]")
+        if ccxt_symbol in listed:
+            ticker = tickers.get(ccxt_symbol)
+            if ticker is None:
+                print(f"  [OK] {ccxt_symbol} exists and is linear | [ticker error: {ticker_error or 'not returned'}]")
+                continue
+            last = ticker.get('last', 'N/A')
+            bid = ticker.get('bid', 'N/A')
+            ask = ticker.get('ask', 'N/A')
+            high = ticker.get('high', 'N/A')
+            low = ticker.get('low', 'N/A')
+            base_vol = ticker.get('baseVolume', 'N/A')
+            quote_vol = ticker.get('quoteVolume', 'N/A')
+            funding = ticker.get('info', {}).get('fundingRate', 'N/A')
+            mark = ticker.get('info', {}).get('markPrice', 'N/A')
+            print(f"  [OK] {ccxt_symbol} exists and is linear | last: {last} | bid: {bid} | ask: {ask} | high24h: {high} | low24h: {low} | baseVol24h: {base_vol} | quoteVol24h: {quote_vol} | funding: {funding} | mark: {mark}")
         else:
             print(f"  [MISSING] {ccxt_symbol} does NOT exist as a linear USDT perp")
 
+
+# ---- Bulk scanner (--scan) ----
+# One fetch_tickers for every USDT-M linear perp, candles for the most liquid ones downloaded
+# in parallel through the shared gateway, then all metrics computed on one (symbols x bars)
+# matrix. EMA state uses the same recursion as EmaCrossState, so the signal column is what the
+# bot would see on the same candles.
+
+# True-range bars averaged for atr_pct
+ATR_BARS = 14
+
+
+def linear_perps(exchange):
+    return [m['symbol'] for m in exchange.markets.values()
+            if m.get('swap') and m.get('linear') and m.get('settle') == 'USDT' and m.get('active') is not False]
+
+
+def ticker_table(tickers, symbols):
+    # (symbol, last, spread as a fraction of mid, funding rate, 24h quote volume) per symbol with a price
+    rows = []
+    for s in symbols:
+        t = tickers.get(s)
+        if not t or not t.get('last'):
+            continue
+        bid, ask = t.get('bid'), t.get('ask')
+        spread = (ask - bid) / ((ask + bid) / 2) if bid and ask else float('nan')
+        funding = t.get('info', {}).get('fundingRate')
+        rows.append((s, float(t['last']), spread, float(funding) if funding not in (None, '') else float('nan'),
+                     float(t.get('quoteVolume') or 0.0)))
+    return rows
+
+
+def fetch_candles(exchange, symbols, timeframe: str, bars: int, workers: int):
+    def one(symbol):
+        try:
+            return symbol, exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=bars)
+        except (ccxt.NetworkError, ccxt.ExchangeError) as e:
+            print(f"  [skip] {symbol}: {type(e).__name__}: {e}")
+            return symbol, []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(one, symbols))
+
+
+def candle_matrix(candles, symbols, bars: int):
+    # (symbols x bars) float arrays for high, low, close; shorter histories are NaN-padded on the left
+    high, low, close = (np.full((len(symbols), bars), np.nan) for _ in range(3))
+    for i, s in enumerate(symbols):
+        rows = np.asarray(candles[s][-bars:], dtype=np.float64).reshape(-1, 6)
+        n = len(rows)
+        if n:
+            high[i, bars - n:], low[i, bars - n:], close[i, bars - n:] = rows[:, 2], rows[:, 3], rows[:, 4]
+    return high, low, close
+
+
+def ema_matrix(close, span: int):
+    # Row-wise IncrementalEma over the closed bars (last column is the forming candle); NaN until a row starts
+    alpha = ema_alpha(span)
+    old_wt, new_wt = 1.0 - alpha, alpha
+    out = np.full(close.shape, np.nan)
+    value = np.full(close.shape[0], np.nan)
+    for t in range(close.shape[1] - 1):
+        x = close[:, t]
+        blended = (old_wt * value + new_wt * x) / (old_wt + new_wt)
+        value = np.where(np.isnan(value), x, np.where(value != x, blended, value))
+        out[:, t] = value
+    return out
+
+
+def scan_metrics(high, low, close, fast: int, slow: int, bars_per_day: float):
+    bars = np.sum(~np.isnan(close), axis=1)
+    ef, es = ema_matrix(close, fast), ema_matrix(close, slow)
+    f_prev, f_last, s_prev, s_last = ef[:, -3], ef[:, -2], es[:, -3], es[:, -2]
+    signal = np.where((f_prev <= s_prev) & (f_last > s_last), 1, np.where((f_prev >= s_prev) & (f_last < s_last), -1, 0))
+    # get_signal needs max(FAST, SLOW) + 2 rows including the forming candle
+    ready = bars >= max(fast, slow) + 2
+    signal = np.where(ready, signal, 0)
+    # Bars since the EMAs last changed order (the current trend's age), counted back from the last closed bar
+    above = (ef[:, :-1] > es[:, :-1])
+    flips = above[:, 1:] != above[:, :-1]
+    closed = close.shape[1] - 1
+    last_flip = np.where(flips.any(axis=1), closed - 2 - np.argmax(flips[:, ::-1], axis=1), -1)
+    since_cross = np.where(last_flip >= 0, closed - 2 - last_flip, bars)
+    trend = np.where(f_last > s_last, 1, -1)
+    ema_gap = (f_last - s_last) / close[:, -2]
+    # Realised volatility of closed-bar log returns, scaled to one day
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rets = np.diff(np.log(close[:, :-1]), axis=1)
+        vol_day = np.nanstd(rets, axis=1) * np.sqrt(bars_per_day)
+        prev_close = close[:, -ATR_BARS - 2:-2]
+        tr = np.fmax(high[:, -ATR_BARS - 1:-1], prev_close) - np.fmin(low[:, -ATR_BARS - 1:-1], prev_close)
+        atr_pct = np.nanmean(tr, axis=1) / close[:, -2]
+    return {'ready': ready, 'signal': signal, 'trend': trend, 'since_cross': since_cross,
+            'ema_gap': ema_gap, 'vol_day': vol_day, 'atr_pct': atr_pct}
+
+
+def scan(exchange, timeframe: str, fast: int, slow: int, bars: int = 200, limit: int = 150, min_volume: float = 5e6,
+         max_spread_bps: float = 10.0, fee: float = 0.0006, workers: int = 8):
+    # Ranked candidates: dict rows sorted by score = atr_pct / round-trip cost (spread + 2 taker fees)
+    started = time.time()
+    symbols = linear_perps(exchange)
+    table = ticker_table(exchange.fetch_tickers(symbols), symbols)
+    liquid = [r for r in table if r[4] >= min_volume and not r[2] > max_spread_bps / 1e4]
+    liquid.sort(key=lambda r: -r[4])
+    liquid = liquid[:limit]
+    names = [r[0] for r in liquid]
+    candles = fetch_candles(exchange, names, timeframe, bars, workers)
+    high, low, close = candle_matrix(candles, names, bars)
+    m = scan_metrics(high, low, close, fast, slow, 86400 / exchange.parse_timeframe(timeframe))
+    spread = np.array([r[2] for r in liquid])
+    score = m['atr_pct'] / (np.nan_to_num(spread) + 2 * fee)
+    out = []
+    for i, (symbol, last, spr, funding, qvol) in enumerate(liquid):
+        if not m['ready'][i]:
+            continue
+        out.append({
+            'symbol': symbol, 'last': last, 'signal': ('none', 'long', 'short')[m['signal'][i]],
+            'trend': 'up' if m['trend'][i] > 0 else 'down', 'since_cross': int(m['since_cross'][i]),
+            'ema_gap_pct': m['ema_gap'][i] * 100, 'atr_pct': m['atr_pct'][i] * 100, 'vol_day_pct': m['vol_day'][i] * 100,
+            'spread_bps': spr * 1e4, 'funding_pct': funding * 100, 'quote_volume': qvol, 'score': float(score[i]),
+        })
+    out.sort(key=lambda r: -r['score'])
+    stats = {'perps': len(symbols), 'tickers': len(table), 'scanned': len(names), 'ranked': len(out),
+             'candle_requests': len(names), 'seconds': time.time() - started}
+    return out, stats
+
+
+def print_scan(rows, stats, top: int):
+    print(f"Scanned {stats['scanned']} of {stats['perps']} USDT-M perps ({stats['tickers']} tickers, "
+          f"1 tickers + {stats['candle_requests']} candle requests) in {stats['seconds']:.1f}s; {stats['ranked']} ranked")
+    print(f"{'#':>3} {'symbol':<22} {'signal':<6} {'trend':<5} {'age':>4} {'gap%':>7} {'atr%':>6} {'vol/d%':>7} "
+          f"{'spr bp':>6} {'fund%':>7} {'qvol 24h':>12} {'score':>6}")
+    for n, r in enumerate(rows[:top], 1):
+        print(f"{n:>3} {r['symbol']:<22} {r['signal']:<6} {r['trend']:<5} {r['since_cross']:>4} {r['ema_gap_pct']:>7.3f} "
+              f"{r['atr_pct']:>6.3f} {r['vol_day_pct']:>7.2f} {r['spread_bps']:>6.2f} {r['funding_pct']:>7.4f} "
+              f"{r['quote_volume']:>12,.0f} {r['score']:>6.2f}")
+
+
+def symbols_line(rows, count: int) -> str:
+    return 'SYMBOLS = ' + ','.join(r['symbol'].split('/')[0] for r in rows[:count])
+
+
+def write_symbols_conf(path: str, rows, count: int):
+    # Copy of bot.conf with SYMBOLS replaced by the top candidates; other keys kept
+    from run_strat1 import conf_path
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    if os.path.exists(conf_path):
+        config.read(conf_path)
+    if 'strategy' not in config:
+        config['strategy'] = {}
+    config['strategy']['SYMBOLS'] = symbols_line(rows, count).split(' = ', 1)[1]
+    with open(path, 'w') as f:
+        config.write(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check configured symbols, or scan every Bitget USDT-M perp (--scan)')
+    parser.add_argument('--scan', action='store_true', help='rank all linear perps instead of checking bot.conf SYMBOLS')
+    parser.add_argument('--timeframe', default=None, help='candles for the scan (default: TIMEFRAME)')
+    parser.add_argument('--bars', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=150, help='most liquid perps to download candles for')
+    parser.add_argument('--min-volume', type=float, default=5e6, help='minimum 24h quote volume (USDT)')
+    parser.add_argument('--max-spread-bps', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--top', type=int, default=30, help='rows to print')
+    parser.add_argument('--pick', type=int, default=10, help='candidates in the generated SYMBOLS line')
+    parser.add_argument('--write-conf', default=None, help='write bot.conf with SYMBOLS set to the picks')
+    args = parser.parse_args()
+    if not args.scan:
+        check_symbols_exist()
+        return
+    from run_strat1 import TIMEFRAME, FAST_EMA, SLOW_EMA, MARKETS_CACHE_TTL, make_gateway
+    from backtest import TAKER_FEE
+    exchange = make_gateway(pool_size=args.workers)
+    load_markets_cached(exchange, MARKETS_CACHE_TTL)
+    rows, stats = scan(exchange, args.timeframe or TIMEFRAME, FAST_EMA, SLOW_EMA, args.bars, args.limit,
+                       args.min_volume, args.max_spread_bps, TAKER_FEE, args.workers)
+    print_scan(rows, stats, args.top)
+    print(symbols_line(rows, args.pick))
+    if args.write_conf:
+        write_symbols_conf(args.write_conf, rows, args.pick)
+        print(f"Wrote {args.write_conf}")
+
 if __name__ == '__main__':
-    check_symbols_exist()
+    main()
@@ -0,0 +1,218 @@
+import math
+
+
+def ema_alpha(span: int) -> float:
+    # Same derivation pandas uses for ewm(span=...): com = (span - 1) / 2, alpha = 1 / (1 + com)
+    com = (span - 1) / 2.0
+    return 1.0 / (1.0 + com)
+
+
+class IncrementalEma:
+    # Recursive EMA matching pandas ewm(span=..., adjust=False).mean() bit for bit
+    __slots__ = ('span', 'old_wt', 'new_wt', 'value', 'count')
+
+    def __init__(self, span: int):
+        self.span = span
+        alpha = ema_alpha(span)
+        self.old_wt = 1.0 - alpha
+        self.new_wt = alpha
+        self.value = math.nan
+        self.count = 0
+
+    def reset(self):
+        self.value = math.nan
+        self.count = 0
+
+    def update(self, x: float) -> float:
+        if self.count == 0:
+            self.value = x
+        elif self.value != x:
+            # pandas normalises by (old_wt + new_wt) even with adjust=False; keep that for identical rounding
+            self.value = (self.old_wt * self.value + self.new_wt * x) / (self.old_wt + self.new_wt)
+        self.count += 1
+        return self.value
+
+
+def sync_closed(state, timestamps, closes) -> int:
+    # timestamps/closes are the full candle window, last entry being the still-forming candle.
+    # Only candles closed since the previous sync are fed to state.update; returns how many were added.
+    n = len(closes) - 1
+    if n <= 0:
+        return 0
+    if state.last_ts is None or timestamps[0] > state.last_ts:
+        # First call, or the window no longer overlaps what we have seen: reseed
+        state.seed(timestamps[:n], closes[:n])
+        return n
+    start = n
+    while start > 0 and timestamps[start - 1] > state.last_ts:
+        start -= 1
+    for i in range(start, n):
+        state.update(timestamps[i], float(closes[i]))
+    return n - start
+
+
+class EmaCrossState:
+    # Per-symbol fast/slow EMA crossover state, fed only with closed candles.
+    # signal() gives the same answer as get_signal(df) on the full history, in O(1).
+    __slots__ = ('fast', 'slow', 'last_ts', 'f_prev', 'f_last', 's_prev', 's_last')
+
+    def __init__(self, fast_span: int, slow_span: int):
+        self.fast = IncrementalEma(fast_span)
+        self.slow = IncrementalEma(slow_span)
+        self.last_ts = None
+        self.f_prev = self.f_last = self.s_prev = self.s_last = math.nan
+
+    @property
+    def closed_count(self) -> int:
+        return self.fast.count
+
+    @property
+    def ready(self) -> bool:
+        # get_signal needs max(FAST, SLOW) + 2 rows including the still-forming candle
+        return self.fast.count >= max(self.fast.span, self.slow.span) + 1
+
+    @property
+    def ema_fast(self) -> float:
+        return self.f_last
+
+    @property
+    def ema_slow(self) -> float:
+        return self.s_last
+
+    @property
+    def ema_diff(self) -> float:
+        return self.f_last - self.s_last
+
+    def reset(self):
+        self.fast.reset()
+        self.slow.reset()
+        self.last_ts = None
+        self.f_prev = self.f_last = self.s_prev = self.s_last = math.nan
+
+    def update(self, ts, close: float):
+        # Feed one newly closed candle
+        self.f_prev, self.s_prev = self.f_last, self.s_last
+        self.f_last = self.fast.update(close)
+        self.s_last = self.slow.update(close)
+        self.last_ts = ts
+
+    def seed(self, timestamps, closes):
+        # Rebuild from closed history (callers pass closed candles only)
+        self.reset()
+        for i in range(len(closes)):
+            self.update(timestamps[i], float(closes[i]))
+
+    def sync(self, timestamps, closes) -> int:
+        return sync_closed(self, timestamps, closes)
+
+    def signal(self) -> str:
+        if not self.ready:
+            return 'none'
+        if self.f_prev <= self.s_prev and self.f_last > self.s_last:
+            return 'long'
+        if self.f_prev >= self.s_prev and self.f_last < self.s_last:
+            return 'short'
+        return 'none'
+
+
+class EmaBank:
+    # EMAs of one candle series keyed by span, shared by every strategy reading that series:
+    # each span is updated once per closed candle however many fast/slow pairs use it.
+    __slots__ = ('emas', 'prev', 'last', 'last_ts')
+
+    def __init__(self, spans=()):
+        self.emas = {}
+        self.prev = {}
+        self.last = {}
+        self.last_ts = None
+        for span in spans:
+            self.add(span)
+
+    def add(self, span: int):
+        # Call before the first sync; a span added later starts from the next reseed
+        if span not in self.emas:
+            self.emas[span] = IncrementalEma(span)
+            self.prev[span] = self.last[span] = math.nan
+
+    @property
+    def closed_count(self) -> int:
+        return next(iter(self.emas.values())).count if self.emas else 0
+
+    def reset(self):
+        for span, ema in self.emas.items():
+            ema.reset()
+            self.prev[span] = self.last[span] = math.nan
+        self.last_ts = None
+
+    def update(self, ts, close: float):
+        prev, last = self.prev, self.last
+        for span, ema in self.emas.items():
+            prev[span] = last[span]
+            last[span] = ema.update(close)
+        self.last_ts = ts
+
+    def seed(self, timestamps, closes):
+        self.reset()
+        for i in range(len(closes)):
+            self.update(timestamps[i], float(closes[i]))
+
+    def sync(self, timestamps, closes) -> int:
+        return sync_closed(self, timestamps, closes)
+
+    def pair(self, fast_span: int, slow_span: int) -> 'EmaPair':
+        self.add(fast_span)
+        self.add(slow_span)
+        return EmaPair(self, fast_span, slow_span)
+
+
+class EmaPair:
+    # Read-only EmaCrossState view of two spans of an EmaBank (same ready / ema_diff / signal())
+    __slots__ = ('bank', 'fast', 'slow')
+
+    def __init__(self, bank: EmaBank, fast_span: int, slow_span: int):
+        self.bank = bank
+        self.fast = fast_span
+        self.slow = slow_span
+
+    @property
+    def ready(self) -> bool:
+        return self.bank.emas[self.fast].count >= max(self.fast, self.slow) + 1
+
+    @property
+    def ema_fast(self) -> float:
+        return self.bank.last[self.fast]
+
+    @property
+    def ema_slow(self) -> float:
+        return self.bank.last[self.slow]
+
+    @property
+    def ema_diff(self) -> float:
+        return self.bank.last[self.fast] - self.bank.last[self.slow]
+
+    def signal(self) -> str:
+        if not self.ready:
+            return 'none'
+        bank = self.bank
+        return cross_signal(bank.prev[self.fast], bank.last[self.fast], bank.prev[self.slow], bank.last[self.slow])
+
+
+def ema_cross(closes, fast_span: int, slow_span: int):
+    # (f_prev, f_last, s_prev, s_last) at the last two closed candles of a window whose final
+    # entry is the still-forming candle; same values as ewm(span, adjust=False).mean().iloc[-3:-1]
+    fast, slow = IncrementalEma(fast_span), IncrementalEma(slow_span)
+    f_prev = f_last = s_prev = s_last = math.nan
+    for i in range(len(closes) - 1):
+        x = float(closes[i])
+        f_prev, s_prev = f_last, s_last
+        f_last = fast.update(x)
+        s_last = slow.update(x)
+    return f_prev, f_last, s_prev, s_last
+
+
+def cross_signal(f_prev: float, f_last: float, s_prev: float, s_last: float) -> str:
+    if f_prev <= s_prev and f_last > s_last:
+        return 'long'
+    if f_prev >= s_prev and f_last < s_last:
+        return 'short'
+    return 'none'
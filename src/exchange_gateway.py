@@ -0,0 +1,89 @@
+import json
+import threading
+from urllib.parse import urlsplit
+import ccxt
+from requests import Session
+from requests.adapters import HTTPAdapter
+import botlog
+import metrics
+from request_scheduler import RequestScheduler, InflightCall, request_lane
+
+
+class ExchangeGateway(ccxt.bitget):
+    # One Bitget client shared by every symbol thread:
+    # - markets are downloaded once, whichever thread asks first
+    # - one keep-alive HTTP connection pool sized for the number of workers
+    # - one rate-limit budget; ccxt's own throttle is per instance and not thread-safe.
+    #   Requests queue by lane (orders, positions, market data, candles), identical GETs in flight
+    #   are sent once, and 429s slow the whole client down (see request_scheduler)
+    def __init__(self, config=None, pool_size: int = 10, burst: float = 5.0, rate_share: float = 1.0):
+        # rate_share: fraction of the account's rate limit this client may use (one of several processes)
+        config = dict(config or {})
+        if 'session' not in config:
+            session = Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            config['session'] = session
+        super().__init__(config)
+        self._markets_lock = threading.Lock()
+        self.scheduler = RequestScheduler(1000.0 / self.rateLimit * rate_share, burst=burst)
+        self._lane = threading.local()
+        self._inflight_lock = threading.Lock()
+        self._inflight = {}
+
+    def load_markets(self, reload=False, params={}):
+        if self.markets and not reload:
+            return self.markets
+        with self._markets_lock:
+            # Another thread may have finished loading while we waited
+            if self.markets and not reload:
+                return self.markets
+            return super().load_markets(reload, params)
+
+    def fetch(self, url, method='GET', headers=None, body=None):
+        # Raw HTTP round trip per endpoint (skipped unless metrics are started)
+        if not metrics.ENABLED:
+            return super().fetch(url, method, headers, body)
+        with metrics.timed(f'http {method} {urlsplit(url).path}'):
+            return super().fetch(url, method, headers, body)
+
+    def fetch2(self, path, api='public', method='GET', params={}, headers=None, body=None, config={}):
+        lane = request_lane(path)
+        if method != 'GET':
+            return self._send(lane, path, api, method, params, headers, body, config)
+        key = (str(api), path, json.dumps(params, sort_keys=True, default=str))
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = InflightCall()
+        if not leader:
+            # Parsers only read the raw response, so sharing it between callers is safe
+            metrics.inc('requests_coalesced_total', lane=lane)
+            return call.wait()
+        try:
+            call.result = self._send(lane, path, api, method, params, headers, body, config)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def _send(self, lane, path, api, method, params, headers, body, config):
+        self._lane.name = lane
+        try:
+            response = super().fetch2(path, api, method, params, headers, body, config)
+        except (ccxt.RateLimitExceeded, ccxt.DDoSProtection):
+            pause = self.scheduler.penalize(lane)
+            botlog.warning(f"[RATE] {method} {path} rate limited; request rate at {self.scheduler.factor:.0%}, pausing {pause:.1f}s", stage='rate_limit')
+            raise
+        self.scheduler.reward()
+        return response
+
+    def throttle(self, cost=None):
+        # Called by ccxt's fetch2 with the endpoint's weight; the lane was set by _send on this thread
+        self.scheduler.acquire(cost, getattr(self._lane, 'name', 'market'))
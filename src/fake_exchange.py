@@ -0,0 +1,555 @@
+import argparse
+import asyncio
+import random
+import threading
+import time
+from collections import Counter, deque
+import numpy as np
+import ccxt
+import botlog
+from candle_cache import resample_rows
+
+# Offline stand-in for ccxt.bitget covering the calls the bots make. Prices come from recorded
+# candles (candle_store columns or [ts, o, h, l, c, v] rows) replayed on a simulated clock;
+# orders fill against that price with a net one-way position per symbol, and preset / position
+# TP/SL trigger orders fire when the replayed high/low crosses them. Latency, random network
+# errors, scripted failures and a request-rate limit can be injected.
+
+
+def synthetic_candles(n: int, timeframe: str = '1m', start_ms: int = 0, price: float = 100.0, vol: float = 0.002, seed: int = 0):
+    # Random-walk OHLCV columns for benchmarks when no recorded data is at hand
+    rng = np.random.default_rng(seed)
+    tf_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+    closes = price * np.exp(np.cumsum(rng.normal(0, vol, n)))
+    opens = np.r_[price, closes[:-1]]
+    wick = np.abs(rng.normal(0, vol / 2, n))
+    return {
+        'timestamp': start_ms + np.arange(n, dtype=np.int64) * tf_ms,
+        'open': opens,
+        'high': np.maximum(opens, closes) * (1 + wick),
+        'low': np.minimum(opens, closes) * (1 - wick),
+        'close': closes,
+        'volume': rng.uniform(10, 1000, n),
+    }
+
+
+def _columns(data):
+    if isinstance(data, dict):
+        return {k: np.asarray(v) for k, v in data.items()}
+    rows = np.asarray(data, dtype=np.float64).reshape(-1, 6)
+    names = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+    cols = {name: rows[:, k] for k, name in enumerate(names)}
+    cols['timestamp'] = cols['timestamp'].astype(np.int64)
+    return cols
+
+
+class FakeExchange:
+    id = 'bitget'
+    precisionMode = ccxt.TICK_SIZE
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+
+    def __init__(self, candles, timeframe: str = '1m', start_ms: int = None, speed: float = None,
+                 latency=(0.0, 0.0), error_rate: float = 0.0, rate_limit_per_sec: float = None,
+                 slippage_bps: float = 0.0, spread_bps: float = 1.0, amount_step: float = 0.01,
+                 price_step: float = 0.001, min_amount: float = 0.01, seed: int = 0):
+        # candles: {ccxt symbol or base ('SOL'): columns or rows}
+        # speed: simulated ms per real ms (e.g. 8640 replays a day in 10 s); None = clock moves only via advance()
+        self.timeframe = timeframe
+        self.tf_ms = self.parse_timeframe(timeframe) * 1000
+        self.data = {}
+        for sym, d in candles.items():
+            self.data[sym if '/' in sym else f"{sym.upper()}/USDT:USDT"] = _columns(d)
+        first = min(int(c['timestamp'][0]) for c in self.data.values())
+        # Default start leaves a 300-bar history window before "now"
+        self.sim_ms = start_ms if start_ms is not None else first + 300 * self.tf_ms
+        self.speed = speed
+        self.real_start = time.perf_counter()
+        self.sim_start = self.sim_ms
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_per_sec = rate_limit_per_sec
+        self.slippage_bps = slippage_bps
+        self.spread_bps = spread_bps
+        self.amount_step = amount_step
+        self.price_step = price_step
+        self.min_amount = min_amount
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.markets = {}
+        self.calls = Counter()
+        self.errors = Counter()
+        self.scripted = {}
+        self.lost = {}
+        self.recent = deque()
+        self.positions = {}
+        self.orders = {}
+        self.client_orders = {}
+        self.triggers = {}
+        self.trigger_checked = {}
+        self.fills = []
+        self.leverage = {}
+        self.realized_pnl = 0.0
+        self.order_seq = 0
+        # Markets exist from the start, so the on-disk markets cache (market_meta) is never consulted
+        self._load_markets()
+
+    # ---- simulation control ----
+
+    def milliseconds(self) -> int:
+        if self.speed:
+            return int(self.sim_start + (time.perf_counter() - self.real_start) * 1000 * self.speed)
+        return self.sim_ms
+
+    def advance(self, ms: int):
+        with self.lock:
+            if self.speed:
+                self.sim_start += ms
+            else:
+                self.sim_ms += ms
+
+    def fail_next(self, method: str, exc: Exception, times: int = 1):
+        # Scripted failure for the next `times` calls of `method`
+        self.scripted.setdefault(method, deque()).extend([exc] * times)
+
+    def lose_next(self, method: str, exc: Exception, times: int = 1):
+        # Scripted lost response: the next `times` calls of `method` take effect, then raise `exc`
+        self.lost.setdefault(method, deque()).extend([exc] * times)
+
+    def _after(self, method: str):
+        with self.lock:
+            queue = self.lost.get(method)
+            if queue:
+                self.errors[method] += 1
+                raise queue.popleft()
+
+    def end_ms(self) -> int:
+        return max(int(c['timestamp'][-1]) for c in self.data.values()) + self.tf_ms
+
+    def set_sandbox_mode(self, enabled):
+        pass
+
+    def _before(self, method: str) -> float:
+        # Counts the call, applies injected failures and returns the latency to simulate
+        with self.lock:
+            self.calls[method] += 1
+            queue = self.scripted.get(method)
+            if queue:
+                self.errors[method] += 1
+                raise queue.popleft()
+            if self.rate_limit_per_sec:
+                now = time.perf_counter()
+                while self.recent and now - self.recent[0] > 1.0:
+                    self.recent.popleft()
+                if len(self.recent) >= self.rate_limit_per_sec:
+                    self.errors[method] += 1
+                    raise ccxt.RateLimitExceeded(f'bitget 429 Too Many Requests (simulated, {method})')
+                self.recent.append(now)
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.errors[method] += 1
+                raise ccxt.RequestTimeout(f'bitget {method} timed out (simulated)')
+            lo, hi = self.latency
+            return self.rng.uniform(lo, hi) if hi > 0 else 0.0
+
+    # ---- market data ----
+
+    def _load_markets(self, reload=False, params={}):
+        if not self.markets or reload:
+            for sym in self.data:
+                base = sym.split('/')[0]
+                self.markets[sym] = {
+                    'id': f'{base}USDT', 'symbol': sym, 'base': base, 'quote': 'USDT', 'settle': 'USDT',
+                    'type': 'swap', 'spot': False, 'margin': False, 'swap': True, 'future': False, 'option': False,
+                    'contract': True, 'linear': True, 'inverse': False,
+                    'contractSize': 1.0, 'active': True,
+                    # Bitget precision is in TICK_SIZE mode: steps, not decimal places
+                    'precision': {'amount': self.amount_step, 'price': self.price_step},
+                    'limits': {'amount': {'min': self.min_amount, 'max': None}, 'cost': {'min': 5.0}},
+                    'info': {},
+                }
+        return self.markets
+
+    def market(self, symbol: str):
+        if symbol not in self.markets:
+            raise ccxt.BadSymbol(f'bitget does not have market symbol {symbol}')
+        return self.markets[symbol]
+
+    def _bar_index(self, symbol: str, now: int) -> int:
+        ts = self.data[symbol]['timestamp']
+        return int(np.searchsorted(ts, now, 'right')) - 1
+
+    def _forming_bar(self, symbol: str, now: int):
+        # Bar containing `now`, revealed progressively: price walks open -> close over the bar
+        c = self.data[symbol]
+        i = self._bar_index(symbol, now)
+        if i < 0:
+            return None
+        o, h, lo, cl, v = float(c['open'][i]), float(c['high'][i]), float(c['low'][i]), float(c['close'][i]), float(c['volume'][i])
+        frac = min(1.0, max(0.0, (now - int(c['timestamp'][i])) / self.tf_ms))
+        price = o + (cl - o) * frac
+        if frac >= 1.0:
+            return [int(c['timestamp'][i]), o, h, lo, cl, v]
+        return [int(c['timestamp'][i]), o, max(o, price), min(o, price), price, v * frac]
+
+    def price(self, symbol: str) -> float:
+        bar = self._forming_bar(symbol, self.milliseconds())
+        if bar is None:
+            raise ccxt.ExchangeError(f'no market data for {symbol} yet')
+        return bar[4]
+
+    def _fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        if timeframe != self.timeframe:
+            return self._fetch_resampled(symbol, timeframe, since, limit)
+        self.market(symbol)
+        now = self.milliseconds()
+        c = self.data[symbol]
+        last = self._bar_index(symbol, now)
+        if last < 0:
+            return []
+        limit = limit or 100
+        if since is None:
+            start = max(0, last - limit + 1)
+        else:
+            start = int(np.searchsorted(c['timestamp'], since, 'left'))
+        end = min(last, start + limit - 1)
+        rows = [[int(c['timestamp'][i]), float(c['open'][i]), float(c['high'][i]), float(c['low'][i]),
+                 float(c['close'][i]), float(c['volume'][i])] for i in range(start, end + 1)]
+        if rows and end == last:
+            rows[-1] = self._forming_bar(symbol, now)
+        return rows
+
+    def _fetch_resampled(self, symbol, timeframe, since=None, limit=None):
+        # Coarser timeframes aggregated from the replayed candles, aligned to UTC like Bitget's
+        tf_ms = self.parse_timeframe(timeframe) * 1000
+        if tf_ms % self.tf_ms:
+            raise ccxt.NotSupported(f'fake exchange cannot build {timeframe} from {self.timeframe} candles')
+        limit = limit or 100
+        now = self.milliseconds()
+        if since is None:
+            since = now - now % tf_ms - (limit - 1) * tf_ms
+        else:
+            since -= since % tf_ms
+        rows = self._fetch_ohlcv(symbol, self.timeframe, since, limit * (tf_ms // self.tf_ms))
+        return resample_rows(rows, tf_ms)[:limit]
+
+    def _ticker(self, symbol):
+        now = self.milliseconds()
+        last = self.price(symbol)
+        half = last * self.spread_bps / 20000
+        return {
+            'symbol': symbol, 'timestamp': now, 'datetime': None, 'last': last, 'close': last,
+            'bid': last - half, 'ask': last + half, 'high': None, 'low': None,
+            'baseVolume': None, 'quoteVolume': None,
+            'info': {'fundingRate': '0.0001', 'markPrice': str(last)},
+        }
+
+    def _fetch_ticker(self, symbol, params={}):
+        self.market(symbol)
+        return self._ticker(symbol)
+
+    def _fetch_tickers(self, symbols=None, params={}):
+        return {s: self._ticker(s) for s in (symbols or list(self.data)) if s in self.data}
+
+    # ---- account ----
+
+    def _position_dict(self, symbol, pos):
+        price = self.price(symbol)
+        sign = 1 if pos['side'] == 'long' else -1
+        return {
+            'symbol': symbol, 'side': pos['side'], 'contracts': pos['contracts'], 'contractSize': 1.0,
+            'entryPrice': pos['entry'], 'markPrice': price, 'leverage': self.leverage.get(symbol),
+            'unrealizedPnl': sign * (price - pos['entry']) * pos['contracts'], 'timestamp': pos['opened'],
+            'info': {'avgPrice': str(pos['entry']), 'cTime': str(pos['opened'])},
+        }
+
+    def _fetch_positions(self, symbols=None, params={}):
+        with self.lock:
+            return [self._position_dict(s, p) for s, p in self.positions.items()
+                    if p['contracts'] > 0 and (not symbols or s in symbols)]
+
+    def _set_leverage(self, leverage, symbol=None, params={}):
+        self.market(symbol)
+        self.leverage[symbol] = leverage
+        return {'symbol': symbol, 'leverage': leverage}
+
+    def _fill(self, symbol, side, amount, fill, client_id=None, reduce_only=False):
+        # Applies a fill to the net position; caller holds the lock
+        self.order_seq += 1
+        order_id = str(1000000 + self.order_seq)
+        pos = self.positions.get(symbol, {'side': 'long', 'contracts': 0.0, 'entry': 0.0})
+        signed = pos['contracts'] if pos['side'] == 'long' else -pos['contracts']
+        delta = amount if side == 'buy' else -amount
+        if reduce_only:
+            if signed == 0 or (signed > 0) == (delta > 0):
+                raise ccxt.InvalidOrder('bitget reduce-only order would increase position (simulated)')
+            delta = max(-abs(signed), min(abs(signed), delta))
+        new = signed + delta
+        if signed != 0 and (signed > 0) != (delta > 0):
+            closed = min(abs(signed), abs(delta))
+            self.realized_pnl += (fill - pos['entry']) * closed * (1 if signed > 0 else -1)
+        if new == 0:
+            entry = 0.0
+        elif signed == 0 or (signed > 0) != (new > 0):
+            entry = fill
+        elif abs(new) > abs(signed):
+            entry = (pos['entry'] * abs(signed) + fill * abs(delta)) / abs(new)
+        else:
+            entry = pos['entry']
+        now = self.milliseconds()
+        # Open time, as Bitget's cTime: set when the position opens or flips
+        opened = now if signed == 0 or (signed > 0) != (new > 0) else pos.get('opened', now)
+        self.positions[symbol] = {'side': 'long' if new >= 0 else 'short', 'contracts': abs(round(new, 12)), 'entry': entry, 'opened': opened}
+        if round(new, 12) == 0 or (signed > 0) != (new > 0):
+            # Position TP/SL dies with the position, as on Bitget
+            self.triggers.pop(symbol, None)
+        self.orders[order_id] = {
+            'id': order_id, 'clientOrderId': client_id, 'symbol': symbol, 'type': 'market', 'side': side,
+            'amount': amount, 'filled': abs(delta), 'remaining': 0.0, 'average': fill, 'price': fill,
+            'status': 'closed', 'timestamp': now, 'fee': None, 'info': {},
+        }
+        self.fills.append({'order': order_id, 'symbol': symbol, 'side': side, 'amount': abs(delta), 'price': fill, 'timestamp': now})
+        if client_id is not None:
+            self.client_orders[client_id] = order_id
+        return order_id
+
+    def _add_trigger(self, symbol, plan_type, hold_side, trigger_price):
+        self.order_seq += 1
+        order_id = str(1000000 + self.order_seq)
+        self.triggers.setdefault(symbol, []).append({
+            'id': order_id, 'symbol': symbol, 'type': 'market', 'side': 'sell' if hold_side == 'long' else 'buy',
+            'triggerPrice': float(trigger_price), 'status': 'open', 'info': {'planType': plan_type},
+        })
+        return order_id
+
+    def _fire_triggers(self):
+        # Triggers hit by the high/low traded since the previous check fill at the trigger price;
+        # when both sides are hit in one window the stop loss is assumed first
+        now = self.milliseconds()
+        with self.lock:
+            for symbol, orders in list(self.triggers.items()):
+                since = self.trigger_checked.get(symbol, now)
+                self.trigger_checked[symbol] = now
+                if not orders:
+                    continue
+                c = self.data[symbol]
+                i0, i1 = max(0, self._bar_index(symbol, since)), self._bar_index(symbol, now)
+                if i1 < 0:
+                    continue
+                bar = self._forming_bar(symbol, now)
+                hi = max([bar[2]] + [float(x) for x in c['high'][i0:i1]])
+                lo = min([bar[3]] + [float(x) for x in c['low'][i0:i1]])
+                pos = self.positions.get(symbol)
+                if not pos or pos['contracts'] <= 0:
+                    continue
+                long = pos['side'] == 'long'
+                hits = []
+                for o in orders:
+                    t = o['triggerPrice']
+                    is_sl = o['info']['planType'] in ('loss_plan', 'pos_loss')
+                    hit = (lo <= t if long else hi >= t) if is_sl else (hi >= t if long else lo <= t)
+                    if hit:
+                        hits.append((0 if is_sl else 1, o))
+                if hits:
+                    _, o = min(hits, key=lambda h: h[0])
+                    self._fill(symbol, o['side'], pos['contracts'], o['triggerPrice'], reduce_only=True)
+
+    def _create_order(self, symbol, type, side, amount, price=None, params={}):
+        self.market(symbol)
+        if type != 'market':
+            raise ccxt.NotSupported('fake exchange fills market orders only')
+        if amount < self.min_amount:
+            raise ccxt.InvalidOrder(f'bitget amount {amount} below minimum {self.min_amount}')
+        client_id = params.get('clientOrderId')
+        if client_id is not None and client_id in self.client_orders:
+            raise ccxt.InvalidOrder(f'bitget {{"code":"40757","msg":"Duplicate clientOid"}} {client_id} (simulated)')
+        if params.get('takeProfitPrice') is not None or params.get('stopLossPrice') is not None:
+            # Position TP/SL (place-tpsl-order): rests until triggered, sized to the whole position
+            with self.lock:
+                pos = self.positions.get(symbol)
+                if not pos or pos['contracts'] <= 0:
+                    raise ccxt.InvalidOrder('bitget no position to attach TP/SL to (simulated)')
+                hold = 'long' if side == 'buy' else 'short'
+                if params.get('takeProfitPrice') is not None:
+                    order_id = self._add_trigger(symbol, 'pos_profit', hold, params['takeProfitPrice'])
+                else:
+                    order_id = self._add_trigger(symbol, 'pos_loss', hold, params['stopLossPrice'])
+            return {'id': order_id, 'clientOrderId': client_id, 'symbol': symbol, 'type': 'market', 'side': side,
+                    'amount': amount, 'price': None, 'status': None, 'info': {'orderId': order_id}}
+        last = self.price(symbol)
+        slip = last * self.slippage_bps / 10000
+        fill = last + slip if side == 'buy' else last - slip
+        with self.lock:
+            order_id = self._fill(symbol, side, amount, fill, client_id, bool(params.get('reduceOnly')))
+            # Preset TP/SL attached to the entry (presetStopSurplusPrice / presetStopLossPrice)
+            hold = 'long' if side == 'buy' else 'short'
+            if params.get('takeProfit'):
+                self._add_trigger(symbol, 'profit_plan', hold, params['takeProfit']['triggerPrice'])
+            if params.get('stopLoss'):
+                self._add_trigger(symbol, 'loss_plan', hold, params['stopLoss']['triggerPrice'])
+        # Like Bitget, the create response carries ids only; details come from fetch_order
+        return {'id': order_id, 'clientOrderId': client_id, 'symbol': symbol, 'type': 'market', 'side': side,
+                'amount': amount, 'price': None, 'average': None, 'filled': None, 'status': None, 'info': {'orderId': order_id}}
+
+    def _fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        # Only trigger orders ever rest here (market orders fill immediately)
+        with self.lock:
+            return [dict(o) for s, orders in self.triggers.items() if symbol in (None, s) for o in orders]
+
+    def _cancel_order(self, id, symbol=None, params={}):
+        with self.lock:
+            for s, orders in self.triggers.items():
+                for o in orders:
+                    if o['id'] == id:
+                        orders.remove(o)
+                        return dict(o, status='canceled')
+        raise ccxt.OrderNotFound(f'bitget order {id} not found (simulated)')
+
+    def _fetch_order(self, id, symbol=None, params={}):
+        order = self.orders.get(id)
+        if order is None:
+            raise ccxt.OrderNotFound(f'bitget order {id} not found (simulated)')
+        return dict(order)
+
+    def _fetch_order_by_client_id(self, symbol, client_id):
+        # Stands in for Bitget's order detail queried by clientOid (order_pipeline.fetch_order_by_client_id)
+        order_id = self.client_orders.get(client_id)
+        return dict(self.orders[order_id]) if order_id is not None else None
+
+    # ---- public ccxt-shaped API ----
+
+    def _call(self, name, impl, *args, **kwargs):
+        delay = self._before(name)
+        if delay:
+            time.sleep(delay)
+        self._fire_triggers()
+        result = impl(*args, **kwargs)
+        self._after(name)
+        return result
+
+    def load_markets(self, reload=False, params={}):
+        return self._call('load_markets', self._load_markets, reload, params)
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        return self._call('fetch_ohlcv', self._fetch_ohlcv, symbol, timeframe, since, limit, params)
+
+    def fetch_ticker(self, symbol, params={}):
+        return self._call('fetch_ticker', self._fetch_ticker, symbol, params)
+
+    def fetch_tickers(self, symbols=None, params={}):
+        return self._call('fetch_tickers', self._fetch_tickers, symbols, params)
+
+    def fetch_positions(self, symbols=None, params={}):
+        return self._call('fetch_positions', self._fetch_positions, symbols, params)
+
+    def set_leverage(self, leverage, symbol=None, params={}):
+        return self._call('set_leverage', self._set_leverage, leverage, symbol, params)
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        return self._call('create_order', self._create_order, symbol, type, side, amount, price, params)
+
+    def fetch_order(self, id, symbol=None, params={}):
+        return self._call('fetch_order', self._fetch_order, id, symbol, params)
+
+    def fetch_order_by_client_id(self, symbol, client_id):
+        return self._call('fetch_order', self._fetch_order_by_client_id, symbol, client_id)
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        return self._call('fetch_open_orders', self._fetch_open_orders, symbol, since, limit, params)
+
+    def cancel_order(self, id, symbol=None, params={}):
+        return self._call('cancel_order', self._cancel_order, id, symbol, params)
+
+    def close(self):
+        pass
+
+
+class AsyncFakeExchange(FakeExchange):
+    # Same simulation behind the ccxt.async_support call style (for run_async)
+    async def _acall(self, name, impl, *args, **kwargs):
+        delay = self._before(name)
+        await asyncio.sleep(delay)
+        self._fire_triggers()
+        result = impl(*args, **kwargs)
+        self._after(name)
+        return result
+
+    async def load_markets(self, reload=False, params={}):
+        return await self._acall('load_markets', self._load_markets, reload, params)
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        return await self._acall('fetch_ohlcv', self._fetch_ohlcv, symbol, timeframe, since, limit, params)
+
+    async def fetch_ticker(self, symbol, params={}):
+        return await self._acall('fetch_ticker', self._fetch_ticker, symbol, params)
+
+    async def fetch_tickers(self, symbols=None, params={}):
+        return await self._acall('fetch_tickers', self._fetch_tickers, symbols, params)
+
+    async def fetch_positions(self, symbols=None, params={}):
+        return await self._acall('fetch_positions', self._fetch_positions, symbols, params)
+
+    async def set_leverage(self, leverage, symbol=None, params={}):
+        return await self._acall('set_leverage', self._set_leverage, leverage, symbol, params)
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        return await self._acall('create_order', self._create_order, symbol, type, side, amount, price, params)
+
+    async def fetch_order(self, id, symbol=None, params={}):
+        return await self._acall('fetch_order', self._fetch_order, id, symbol, params)
+
+    async def fetch_order_by_client_id(self, symbol, client_id):
+        return await self._acall('fetch_order', self._fetch_order_by_client_id, symbol, client_id)
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        return await self._acall('fetch_open_orders', self._fetch_open_orders, symbol, since, limit, params)
+
+    async def cancel_order(self, id, symbol=None, params={}):
+        return await self._acall('cancel_order', self._cancel_order, id, symbol, params)
+
+    async def close(self):
+        pass
+
+
+def main():
+    # Replay stored (or synthetic) candles through the async runner on a sped-up clock
+    from candle_store import open_columns, store_path
+    import run_async
+    from strategies import StrategyBook
+    book = StrategyBook(run_async.STRATEGIES)
+    timeframes = [tf for strategy in book.strategies for tf in strategy.timeframes]
+    parser = argparse.ArgumentParser(description='Replay candles through the async bot against a simulated Bitget')
+    parser.add_argument('--symbols', default=','.join(book.symbols))
+    # Candles the bot fetches: BASE_TIMEFRAME, else the finest timeframe of any strategy
+    parser.add_argument('--timeframe', default=run_async.BASE_TIMEFRAME or min(timeframes, key=ccxt.Exchange.parse_timeframe))
+    parser.add_argument('--hours', type=float, default=24.0, help='simulated time to replay')
+    parser.add_argument('--seconds', type=float, default=10.0, help='wall-clock time to spend')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(',') if s.strip()]
+    tf_ms = ccxt.Exchange.parse_timeframe(args.timeframe) * 1000
+    bars = int(args.hours * 3600 * 1000 / tf_ms) + 400
+    candles = {}
+    for i, s in enumerate(symbols):
+        stored = open_columns(store_path(s, args.timeframe))
+        if len(stored['close']) >= bars:
+            candles[s] = {k: v[-bars:] for k, v in stored.items()}
+        else:
+            candles[s] = synthetic_candles(bars, args.timeframe, start_ms=1_700_000_000_000 // tf_ms * tf_ms, seed=i)
+    speed = args.hours * 3600 / args.seconds
+    exchange = AsyncFakeExchange(candles, args.timeframe, speed=speed,
+                                 latency=(0.0, args.latency_ms / 1000), error_rate=args.error_rate)
+    poll = tf_ms / 1000 / speed
+    cycles = int(args.hours * 3600 * 1000 / tf_ms)
+    started = time.perf_counter()
+    asyncio.run(run_async.run(symbols, exchange=exchange, poll_seconds=poll, cycles=cycles))
+    elapsed = time.perf_counter() - started
+    botlog.flush()
+    print(f"Replayed {args.hours}h of {args.timeframe} for {len(symbols)} symbols in {elapsed:.1f}s")
+    print(f"  requests: {dict(exchange.calls)}")
+    print(f"  errors: {dict(exchange.errors)}")
+    print(f"  fills: {len(exchange.fills)} | realized pnl (quote): {exchange.realized_pnl:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import ccxt
+from candle_store import store_path, read_meta, append_rows, row_count
+from market_meta import load_markets_cached
+from run_strat1 import SYMBOLS, TIMEFRAME, MARKETS_CACHE_TTL, make_gateway, symbol_to_ccxt, dprint
+
+# Bars per request; Bitget serves up to 200 per candles call
+PAGE_LIMIT = 200
+
+
+def download_history(exchange, symbol: str, timeframe: str, since_ms: int, root: str = None, page_limit: int = PAGE_LIMIT) -> int:
+    # Paginated `since` download of closed bars into the column store. Resumable: picks up
+    # after the last stored bar, and every page is committed before the next is requested.
+    # since_ms only seeds an empty store; an existing one always continues from its last bar
+    # so it never gets a hole (the live bot stops persisting until that gap is filled).
+    ccxt_symbol = symbol_to_ccxt(symbol) if '/' not in symbol else symbol
+    path = store_path(symbol, timeframe, root)
+    tf_ms = exchange.parse_timeframe(timeframe) * 1000
+    meta = read_meta(path)
+    if meta and meta.get('last_ts') is not None:
+        since_ms = meta['last_ts'] + tf_ms
+    written = 0
+    while True:
+        now = exchange.milliseconds()
+        if since_ms + tf_ms > now:
+            break
+        ohlcv = exchange.fetch_ohlcv(ccxt_symbol, timeframe=timeframe, since=since_ms, limit=page_limit)
+        # Only closed bars go to disk
+        ohlcv = [row for row in ohlcv if row[0] >= since_ms and row[0] + tf_ms <= now]
+        if not ohlcv:
+            # Nothing listed yet this far back: skip ahead a page
+            since_ms += page_limit * tf_ms
+            continue
+        written += append_rows(path, ohlcv)
+        since_ms = ohlcv[-1][0] + tf_ms
+        dprint(f'[history] {symbol} {timeframe}: {written} bars, up to {ohlcv[-1][0]}')
+    return written
+
+
+def download_all(exchange, symbols, timeframe: str, since_ms: int, workers: int = 4, root: str = None):
+    # Symbols download in parallel; the shared gateway keeps them inside one rate limit
+    def one(symbol):
+        started = time.time()
+        try:
+            n = download_history(exchange, symbol, timeframe, since_ms, root)
+            print(f"[history] {symbol} {timeframe}: +{n} bars ({row_count(store_path(symbol, timeframe, root))} stored) in {time.time() - started:.1f}s")
+            return symbol, n
+        except (ccxt.NetworkError, ccxt.ExchangeError) as e:
+            print(f"[history] {symbol} {timeframe}: stopped by {type(e).__name__}: {e} (rerun to resume)")
+            return symbol, None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(one, symbols))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download OHLCV history into the local candle store')
+    parser.add_argument('--symbols', default=','.join(SYMBOLS))
+    parser.add_argument('--timeframe', default=TIMEFRAME)
+    parser.add_argument('--since', default='30d', help='ISO date (2024-01-01) or lookback like 30d / 12h')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(',') if s.strip()]
+    exchange = make_gateway(pool_size=args.workers)
+    load_markets_cached(exchange, MARKETS_CACHE_TTL)
+    if args.since[-1] in 'mhdw' and args.since[:-1].isdigit():
+        since_ms = exchange.milliseconds() - exchange.parse_timeframe(args.since) * 1000
+    else:
+        since_ms = exchange.parse8601(args.since if 'T' in args.since else args.since + 'T00:00:00Z')
+    download_all(exchange, symbols, args.timeframe, since_ms, args.workers)
+
+
+if __name__ == '__main__':
+    main()
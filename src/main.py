@@ -1,12 +1,17 @@
 
 import os
 import time
-from decimal import Decimal, ROUND_DOWN
 import sys
 import configparser
 import ccxt
-import pandas as pd
 from dotenv import load_dotenv
+from ema_state import EmaCrossState, ema_cross, cross_signal
+from candle_cache import CandleCache, candle_closes
+from candle_store import store_path, tail_rows
+from scheduler import CandleScheduler
+import metrics
+import botlog
+from market_meta import market_spec, load_markets_cached
 
 # ------------------------- Config -------------------------
 
@@ -31,8 +36,8 @@ API_PASSWORD = os.getenv('BITGET_API_PASSWORD', '')
 DEBUG = os.getenv('DEBUG', 'false').lower() == 'true' or '--debug' in sys.argv or 'debug=true' in [a.lower() for a in sys.argv]
 
 def dprint(*args, **kwargs):
-    if DEBUG:
-        print('[DEBUG]', *args, **kwargs)
+    # Callable args are only evaluated when debug output is on
+    botlog.debug(*args, **kwargs)
 
 
 # Bitget USDT perpetual (linear) symbol in ccxt unified format
@@ -54,6 +59,24 @@ POSITION_SIZE_USDT = get_conf('POSITION_SIZE_USDT', float, 'POSITION_SIZE_USDT',
 TP_PCT = get_conf('TP_PCT', float, 'TP_PCT', 0.01)
 SL_PCT = get_conf('SL_PCT', float, 'SL_PCT', 0.005)
 POLL_SECONDS = get_conf('POLL_SECONDS', int, 'POLL_SECONDS', 10)
+# Seed candle buffers from the local history store (see history.py) instead of a full API backfill
+WARM_START = get_conf('WARM_START', str, 'WARM_START', 'true').lower() == 'true'
+# TP/SL check cadence between bar closes (signals are evaluated once per closed bar)
+EXIT_CHECK_SECONDS = get_conf('EXIT_CHECK_SECONDS', float, 'EXIT_CHECK_SECONDS', POLL_SECONDS)
+# How many times to re-ask for a closed bar the exchange has not published yet
+MAX_BAR_RETRIES = 3
+# Bitget market list is cached on disk (data/markets_bitget.json) for this many seconds; 0 = always download
+MARKETS_CACHE_TTL = get_conf('MARKETS_CACHE_TTL', float, 'MARKETS_CACHE_TTL', 6 * 3600)
+# Stage latency metrics: Prometheus endpoint on 127.0.0.1:METRICS_PORT and/or a console summary (0 = off)
+METRICS_PORT = get_conf('METRICS_PORT', int, 'METRICS_PORT', 0)
+METRICS_SUMMARY_SECONDS = get_conf('METRICS_SUMMARY_SECONDS', float, 'METRICS_SUMMARY_SECONDS', 0)
+# Log output (see botlog.py): text or json lines, stdout or LOG_FILE
+LOG_FORMAT = get_conf('LOG_FORMAT', str, 'LOG_FORMAT', 'text')
+LOG_FILE = get_conf('LOG_FILE', str, 'LOG_FILE', None)
+
+def setup_logging():
+    # Called from main(), never at import
+    botlog.configure('debug' if DEBUG else 'info', fmt=LOG_FORMAT, path=LOG_FILE)
 
 # ------------------------- Helpers -------------------------
 
@@ -72,20 +95,13 @@ def make_exchange():
 
 
 def round_amount(exchange: ccxt.bitget, market, amount: float) -> float:
-    # Respect amount precision and min amount
-    precision = market.get('precision', {}).get('amount')
-    min_lot = market.get('limits', {}).get('amount', {}).get('min')
-    if precision is not None:
-        q = Decimal(10) ** -precision
-        amount = float((Decimal(amount) // q) * q)
-    if min_lot and amount < min_lot:
-        amount = min_lot
-    return max(0.0, amount)
+    # Respect amount precision and min amount (Bitget reports precision as a step size)
+    return market_spec(exchange, market).round_amount(amount)
 
 
 def get_market(exchange: ccxt.bitget, symbol: str):
     dprint('Loading markets...')
-    exchange.load_markets()
+    load_markets_cached(exchange, MARKETS_CACHE_TTL)
     market = exchange.market(symbol)
     dprint('Market info:', market)
     if not market.get('linear'):
@@ -93,38 +109,33 @@ def get_market(exchange: ccxt.bitget, symbol: str):
     return market
 
 
-def fetch_ohlcv_df(exchange: ccxt.Exchange, symbol: str, timeframe: str, limit: int = 200) -> pd.DataFrame:
+def fetch_ohlcv_df(exchange: ccxt.Exchange, symbol: str, timeframe: str, limit: int = 200) -> 'pd.DataFrame':
+    # Analytics/debugging only; the trading loop works on CandleCache, so pandas is imported on demand
+    import pandas as pd
     dprint(f'Fetching OHLCV for {symbol} {timeframe}...')
     ohlcv = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
     df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
-    dprint('OHLCV head:', df.head())
+    dprint('OHLCV head:', df.head)
     return df
 
 
-def ema(series: pd.Series, length: int) -> pd.Series:
+def ema(series: 'pd.Series', length: int) -> 'pd.Series':
     return series.ewm(span=length, adjust=False).mean()
 
 
-def get_signal(df: pd.DataFrame) -> str:
-    if len(df) < max(FAST_EMA, SLOW_EMA) + 2:
+def get_signal(candles) -> str:
+    # candles: CandleCache, OHLCV rows or a DataFrame; the last entry is the still-forming candle
+    closes = candle_closes(candles)
+    if len(closes) < max(FAST_EMA, SLOW_EMA) + 2:
         dprint('Not enough data for signal')
         return 'none'
-    df = df.copy()
-    df['ema_fast'] = ema(df['close'], FAST_EMA)
-    df['ema_slow'] = ema(df['close'], SLOW_EMA)
     # Use last two closes for cross detection, avoid using the partial current candle
-    f_prev, f_last = df['ema_fast'].iloc[-3], df['ema_fast'].iloc[-2]
-    s_prev, s_last = df['ema_slow'].iloc[-3], df['ema_slow'].iloc[-2]
-    dprint(f'EMAs: f_prev={f_prev}, f_last={f_last}, s_prev={s_prev}, s_last={s_last}')
-    if f_prev <= s_prev and f_last > s_last:
-        dprint('Signal: long')
-        return 'long'
-    if f_prev >= s_prev and f_last < s_last:
-        dprint('Signal: short')
-        return 'short'
-    dprint('Signal: none')
-    return 'none'
+    f_prev, f_last, s_prev, s_last = ema_cross(closes, FAST_EMA, SLOW_EMA)
+    dprint(lambda: f'EMAs: f_prev={f_prev}, f_last={f_last}, s_prev={s_prev}, s_last={s_last}')
+    signal = cross_signal(f_prev, f_last, s_prev, s_last)
+    dprint('Signal:', signal)
+    return signal
 
 
 def get_position(exchange: ccxt.Exchange, symbol: str):
@@ -140,7 +151,8 @@ def get_position(exchange: ccxt.Exchange, symbol: str):
         dprint('No active position')
         return None
     except Exception as e:
-        print(f"fetch_positions error: {e}")
+        botlog.warning(f"fetch_positions error: {e}", symbol=symbol, stage='position')
+        metrics.error('position', symbol, e)
         return None
 
 
@@ -167,14 +179,17 @@ def get_last_price(exchange: ccxt.Exchange, symbol: str) -> float:
 
 def usd_to_contracts(exchange: ccxt.Exchange, market, quote_usdt: float, price: float) -> float:
     # For linear futures, amount is in contracts of base currency (e.g., SOL). contracts = USDT / price
-    base_amount = quote_usdt / price
-    return round_amount(exchange, market, base_amount)
+    return market_spec(exchange, market).contracts_for(quote_usdt, price)
 
 
 def market_order(exchange: ccxt.Exchange, symbol: str, side: str, amount: float):
-    print(f"Placing market {side} {amount} {symbol}")
-    dprint('Order params:', {'symbol': symbol, 'side': side, 'amount': amount})
-    return exchange.create_order(symbol, 'market', side, amount)
+    botlog.info(f"Placing market {side} {amount} {symbol}", symbol=symbol, stage='order')
+    dprint('Order params:', lambda: {'symbol': symbol, 'side': side, 'amount': amount}, symbol=symbol, stage='order')
+    with metrics.timed('order', symbol):
+        order = exchange.create_order(symbol, 'market', side, amount)
+    metrics.inc('orders_total', symbol=symbol, side=side)
+    dprint('Order result:', order, symbol=symbol, stage='order', order_id=order.get('id'))
+    return order
 
 
 def close_position(exchange: ccxt.Exchange, market, symbol: str, pos, price_now: float, tp_pct: float, sl_pct: float):
@@ -193,18 +208,21 @@ def close_position(exchange: ccxt.Exchange, market, symbol: str, pos, price_now:
         exit_side = 'sell' if side == 'long' else 'buy'
         amt = round_amount(exchange, market, contracts)
         try:
-            market_order(exchange, symbol, exit_side, amt)
-            print(f"Exited {side} position: TP={hit_tp} SL={hit_sl} pnl_pct={pnl_pct:.4f}")
+            order = market_order(exchange, symbol, exit_side, amt)
+            botlog.info(f"Exited {side} position: TP={hit_tp} SL={hit_sl} pnl_pct={pnl_pct:.4f}", symbol=symbol, stage='exit', order_id=order.get('id'))
             return True
         except Exception as e:
-            print(f"Exit order failed: {e}")
+            botlog.error(f"Exit order failed: {e}", symbol=symbol, stage='exit')
     return False
 
 
 # ------------------------- Main loop -------------------------
 
 def main():
-    print('Starting bot...')
+    setup_logging()
+    botlog.info('Starting bot...', symbol=SYMBOL)
+    if METRICS_PORT or METRICS_SUMMARY_SECONDS:
+        metrics.start(METRICS_PORT, METRICS_SUMMARY_SECONDS)
     dprint('Debug mode enabled')
     exchange = make_exchange()
     dprint('Exchange created')
@@ -213,72 +231,110 @@ def main():
     market = get_market(exchange, SYMBOL)
     dprint('Market loaded')
 
-    print(f"Running EMA cross bot on {SYMBOL} {TIMEFRAME} | fast={FAST_EMA} slow={SLOW_EMA}")
+    botlog.info(f"Running EMA cross bot on {SYMBOL} {TIMEFRAME} | fast={FAST_EMA} slow={SLOW_EMA}", symbol=SYMBOL)
 
 
     last_signal_time = None
     last_signal_type = None
+    # Seeded from the first fetch, then fed only the candles that closed since
+    ema_state = EmaCrossState(FAST_EMA, SLOW_EMA)
+    # One full backfill, then only bars since the last cached candle
+    candles = CandleCache(exchange, SYMBOL, TIMEFRAME, size=max(200, SLOW_EMA + 50))
+    if WARM_START:
+        warmed = candles.warm_start(tail_rows(store_path(SYMBOL, TIMEFRAME), candles.ring.capacity))
+        if warmed:
+            botlog.info(f"Warm start: {warmed} bars from local store", symbol=SYMBOL)
+
+    # Signal work right after each bar closes, TP/SL checks every EXIT_CHECK_SECONDS
+    sched = CandleScheduler(TIMEFRAME, EXIT_CHECK_SECONDS, jitter=0, key=SYMBOL)
+    signal = 'none'
+    signal_at = 0.0
+    bar_retries = 0
 
     while True:
+        event = sched.wait()
         try:
-            dprint('Top of main loop')
-            df = fetch_ohlcv_df(exchange, SYMBOL, TIMEFRAME, limit=max(200, SLOW_EMA + 50))
-            # Calculate EMAs for status print
-            if len(df) >= max(FAST_EMA, SLOW_EMA) + 2:
-                ema_fast = df['close'].ewm(span=FAST_EMA, adjust=False).mean().iloc[-2]
-                ema_slow = df['close'].ewm(span=SLOW_EMA, adjust=False).mean().iloc[-2]
-                ema_diff = ema_fast - ema_slow
-                # Print last signal info
-                if last_signal_time is not None:
-                    mins_ago = (time.time() - last_signal_time) / 60
-                    print(f"data pooled | EMA diff = {ema_diff:.5f} | last signal: {last_signal_type} {mins_ago:.1f} min ago")
+            dprint(lambda: f'Top of main loop ({event})')
+            if event == 'bar':
+                with metrics.timed('fetch_ohlcv', SYMBOL):
+                    changed = candles.refresh()
+                dprint(lambda: f'Candle cache: {changed} bars updated, last ts {candles.last_ts}')
+                with metrics.timed('signal', SYMBOL):
+                    added = ema_state.sync(candles.timestamps, candles.closes)
+                dprint(lambda: f'EMA state: {added} new closed candles')
+                if added == 0 and bar_retries < MAX_BAR_RETRIES:
+                    # Closed bar not published yet; look again shortly
+                    bar_retries += 1
+                    sched.retry_bar()
+                    continue
+                bar_retries = 0
+                if added == 0:
+                    # Still no new bar: treat like an exit check rather than re-acting on an old cross
+                    event = 'exit'
+            if event == 'bar':
+                # EMA diff for status print
+                if ema_state.ready:
+                    ema_diff = ema_state.ema_diff
+                    # Print last signal info
+                    if last_signal_time is not None:
+                        mins_ago = (time.time() - last_signal_time) / 60
+                        botlog.info(f"data pooled | EMA diff = {ema_diff:.5f} | last signal: {last_signal_type} {mins_ago:.1f} min ago", symbol=SYMBOL)
+                    else:
+                        botlog.info(f"data pooled | EMA diff = {ema_diff:.5f} | last signal: NOTYET", symbol=SYMBOL)
                 else:
-                    print(f"data pooled | EMA diff = {ema_diff:.5f} | last signal: NOTYET")
-            else:
-                print("data pooled | Not enough data for EMA diff yet | last signal: NOTYET")
-
-            signal = get_signal(df)
-            # Track last signal time/type
-            if signal in ("long", "short"):
-                last_signal_time = time.time()
-                last_signal_type = signal
-
-            pos = get_position(exchange, SYMBOL)
+                    botlog.info("data pooled | Not enough data for EMA diff yet | last signal: NOTYET", symbol=SYMBOL)
+
+                # A new bar supersedes a cross still pending from a failed cycle
+                signal = ema_state.signal()
+                dprint(lambda: f'Signal: {signal}')
+                # Track last signal time/type
+                if signal in ("long", "short"):
+                    last_signal_time = time.time()
+                    last_signal_type = signal
+                    signal_at = time.perf_counter()
+
+            with metrics.timed('position', SYMBOL):
+                pos = get_position(exchange, SYMBOL)
             side = side_from_position(pos)
-            price = get_last_price(exchange, SYMBOL)
+            with metrics.timed('last_price', SYMBOL):
+                price = get_last_price(exchange, SYMBOL)
 
-            dprint(f'signal={signal}, side={side}, price={price}')
+            dprint(lambda: f'signal={signal}, side={side}, price={price}')
 
             # Check TP/SL first
             closed = close_position(exchange, market, SYMBOL, pos, price, TP_PCT, SL_PCT)
+            # The bar's cross is settled from here: entered below, or ruled out by a position or this exit.
+            # Until then it stays pending, so a cycle that failed on the position or price acts on it at the retry.
+            entry_signal, signal = signal, 'none'
             if closed:
                 dprint('Position closed for TP/SL')
-                time.sleep(POLL_SECONDS)
                 continue
 
             # Entry logic only when flat
-            if side == 'flat' and signal in ('long', 'short'):
+            if side == 'flat' and entry_signal in ('long', 'short'):
                 amount = usd_to_contracts(exchange, market, POSITION_SIZE_USDT, price)
-                dprint(f'Calculated amount: {amount}')
+                dprint(lambda: f'Calculated amount: {amount}')
                 if amount <= 0:
-                    print("Amount rounded to 0; increase POSITION_SIZE_USDT")
+                    botlog.info("Amount rounded to 0; increase POSITION_SIZE_USDT", symbol=SYMBOL)
                 else:
-                    order_side = 'buy' if signal == 'long' else 'sell'
+                    order_side = 'buy' if entry_signal == 'long' else 'sell'
                     try:
-                        market_order(exchange, SYMBOL, order_side, amount)
-                        print(f"Entered {signal} with {amount} contracts at ~{price}")
+                        order = market_order(exchange, SYMBOL, order_side, amount)
+                        metrics.observe('signal_to_order', SYMBOL, time.perf_counter() - signal_at)
+                        botlog.info(f"Entered {entry_signal} with {amount} contracts at ~{price}", symbol=SYMBOL, stage='entry', order_id=order.get('id'))
                     except Exception as e:
-                        print(f"Entry order failed: {e}")
+                        botlog.error(f"Entry order failed: {e}", symbol=SYMBOL, stage='entry')
 
         except ccxt.NetworkError as e:
-            print(f"Network error: {e}")
+            botlog.warning(f"Network error: {e}", symbol=SYMBOL, stage=event)
+            if event == 'bar':
+                sched.retry_bar()
         except ccxt.ExchangeError as e:
-            print(f"Exchange error: {e}")
+            botlog.warning(f"Exchange error: {e}", symbol=SYMBOL, stage=event)
+            if event == 'bar':
+                sched.retry_bar()
         except Exception as e:
-            print(f"Unhandled error: {e}")
-
-        time.sleep(POLL_SECONDS)
-
+            botlog.error(f"Unhandled error: {e}", symbol=SYMBOL, stage=event)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,162 @@
+import json
+import math
+import os
+import time
+import ccxt
+import botlog
+from candle_store import DATA_DIR
+
+# Market metadata in integer-step form, plus an on-disk copy of the exchange's market list.
+#
+# Bitget reports precision in ccxt TICK_SIZE mode (amount precision 0.1 means a 0.1 lot step),
+# other exchanges/ccxt versions in DECIMAL_PLACES mode (1 means 0.1). MarketSpec resolves both
+# once per symbol into a power-of-ten scale and an integer step, so quantizing an amount or price
+# is one multiply, one integer floor division and one divide, exact for any step the exchange uses.
+
+MARKETS_CACHE_FILE = os.path.join(DATA_DIR, 'markets_{exchange}.json')
+MARKETS_CACHE_TTL = 6 * 3600
+
+
+def _decimals(step: float) -> int:
+    # Decimal places needed to write step exactly (0.001 -> 3, 0.5 -> 1, 5 -> 0)
+    text = repr(float(step))
+    if 'e-' in text:
+        mantissa, exp = text.split('e-')
+        return int(exp) + (len(mantissa.split('.')[1]) if '.' in mantissa else 0)
+    frac = text.split('.')[1].rstrip('0') if '.' in text else ''
+    return len(frac)
+
+
+def precision_step(precision, precision_mode) -> float:
+    if precision is None:
+        return None
+    if precision_mode == ccxt.DECIMAL_PLACES:
+        return 10.0 ** -int(precision)
+    return float(precision)
+
+
+class MarketSpec:
+    __slots__ = ('symbol', 'amount_step', 'min_amount', 'price_tick', 'contract_size',
+                 'amount_scale', 'amount_units', 'price_scale', 'price_units')
+
+    def __init__(self, symbol: str, amount_step=None, min_amount=None, price_tick=None, contract_size=None):
+        self.symbol = symbol
+        self.amount_step = amount_step
+        self.min_amount = min_amount or 0.0
+        self.price_tick = price_tick
+        self.contract_size = contract_size or 1.0
+        self.amount_scale, self.amount_units = self._integer_step(amount_step)
+        self.price_scale, self.price_units = self._integer_step(price_tick)
+
+    @staticmethod
+    def _integer_step(step):
+        # step == units / scale with integer units; (1, 0) means "no step"
+        if not step:
+            return 1, 0
+        scale = 10 ** _decimals(step)
+        return scale, max(1, round(step * scale))
+
+    @classmethod
+    def from_market(cls, market, precision_mode=ccxt.TICK_SIZE):
+        precision = market.get('precision') or {}
+        limits = (market.get('limits') or {}).get('amount') or {}
+        return cls(
+            market['symbol'],
+            precision_step(precision.get('amount'), precision_mode),
+            limits.get('min'),
+            precision_step(precision.get('price'), precision_mode),
+            market.get('contractSize'),
+        )
+
+    def floor_amount(self, amount: float) -> float:
+        if not self.amount_units:
+            return amount
+        # The 1e-9 nudge keeps values like 0.3 (0.29999999999999999 in binary) on their step
+        units = int(math.floor(amount * self.amount_scale + 1e-9)) // self.amount_units * self.amount_units
+        return units / self.amount_scale
+
+    def round_amount(self, amount: float) -> float:
+        # Same contract as the old round_amount: floor to the lot step, then lift to the minimum lot
+        amount = self.floor_amount(amount)
+        if self.min_amount and amount < self.min_amount:
+            amount = self.min_amount
+        return max(0.0, amount)
+
+    def round_price(self, price: float) -> float:
+        if not self.price_units:
+            return price
+        units = round(price * self.price_scale / self.price_units) * self.price_units
+        return units / self.price_scale
+
+    def contracts_for(self, quote_usdt: float, price: float) -> float:
+        # Linear perps: one contract is contract_size units of base
+        return self.round_amount(quote_usdt / price / self.contract_size)
+
+
+_specs = {}
+
+
+def market_spec(exchange, market) -> MarketSpec:
+    # Cached per symbol; markets do not change precision while the bot runs
+    spec = _specs.get(market['symbol'])
+    if spec is None:
+        mode = getattr(exchange, 'precisionMode', ccxt.TICK_SIZE)
+        spec = _specs[market['symbol']] = MarketSpec.from_market(market, mode)
+    return spec
+
+
+def cache_path(exchange, path: str = None) -> str:
+    return path or MARKETS_CACHE_FILE.format(exchange=getattr(exchange, 'id', 'exchange'))
+
+
+def read_markets_cache(path: str, ttl: float):
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path) as f:
+            markets = json.load(f)
+        return markets or None
+    except (OSError, ValueError):
+        return None
+
+
+def write_markets_cache(path: str, markets):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(list(markets.values()), f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def load_markets_cached(exchange, ttl: float = MARKETS_CACHE_TTL, path: str = None):
+    # Markets from the cache file when younger than ttl seconds, else from the API (and re-cached)
+    if exchange.markets:
+        return exchange.markets
+    path = cache_path(exchange, path)
+    cached = read_markets_cache(path, ttl) if ttl > 0 else None
+    if cached is not None:
+        return exchange.set_markets(cached)
+    markets = exchange.load_markets()
+    if ttl > 0:
+        try:
+            write_markets_cache(path, markets)
+        except OSError as e:
+            botlog.warning(f"Could not write markets cache {path}: {e}")
+    return markets
+
+
+async def load_markets_cached_async(exchange, ttl: float = MARKETS_CACHE_TTL, path: str = None):
+    # load_markets_cached for ccxt.async_support exchanges
+    if exchange.markets:
+        return exchange.markets
+    path = cache_path(exchange, path)
+    cached = read_markets_cache(path, ttl) if ttl > 0 else None
+    if cached is not None:
+        return exchange.set_markets(cached)
+    markets = await exchange.load_markets()
+    if ttl > 0:
+        try:
+            write_markets_cache(path, markets)
+        except OSError as e:
+            botlog.warning(f"Could not write markets cache {path}: {e}")
+    return markets
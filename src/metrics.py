@@ -0,0 +1,201 @@
+import bisect
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import ccxt
+import botlog
+
+# Per-stage, per-symbol latency histograms plus request/error counters, exported in the
+# Prometheus text format and as a periodic console summary. Everything is a no-op until
+# start() is called: timed() then hands out a shared do-nothing context manager.
+
+# Histogram upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Recent samples kept per series for the rolling percentiles in the summary
+WINDOW = 512
+
+ENABLED = False
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count', 'recent')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        data = sorted(self.recent)
+        if not data:
+            return 0.0
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+
+def observe(stage: str, symbol: str, seconds: float):
+    if not ENABLED:
+        return
+    with _lock:
+        h = _histograms.get((stage, symbol))
+        if h is None:
+            h = _histograms[(stage, symbol)] = Histogram()
+        h.observe(seconds)
+
+
+def inc(name: str, n: int = 1, **labels):
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def gauge(name: str, value: float, **labels):
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _gauges[key] = value
+
+
+def error(stage: str, symbol: str, exc: BaseException):
+    # Counted by concrete ccxt type (RequestTimeout, InsufficientFunds, ...) under its family
+    if isinstance(exc, ccxt.NetworkError):
+        family = 'NetworkError'
+    elif isinstance(exc, ccxt.ExchangeError):
+        family = 'ExchangeError'
+    else:
+        family = 'Other'
+    inc('errors_total', stage=stage, symbol=symbol, family=family, type=type(exc).__name__)
+
+
+class _Timer:
+    __slots__ = ('stage', 'symbol', 'start')
+
+    def __init__(self, stage, symbol):
+        self.stage = stage
+        self.symbol = symbol
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, self.symbol, time.perf_counter() - self.start)
+        if exc is not None and not isinstance(exc, (GeneratorExit, KeyboardInterrupt)):
+            error(self.stage, self.symbol, exc)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def timed(stage: str, symbol: str = ''):
+    # with metrics.timed('fetch_ohlcv', 'SOL/USDT:USDT'): ...  (also fine around awaits)
+    return _Timer(stage, symbol) if ENABLED else _NOOP
+
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render() -> str:
+    # Prometheus text exposition format
+    with _lock:
+        hists = [(k, list(h.counts), h.sum, h.count) for k, h in _histograms.items()]
+        counters = list(_counters.items())
+        gauges = list(_gauges.items())
+    lines = ['# TYPE bot_stage_seconds histogram']
+    for (stage, symbol), counts, total, count in sorted(hists):
+        labels = f'stage="{_label(stage)}",symbol="{_label(symbol)}"'
+        cumulative = 0
+        for bound, c in zip(BUCKETS, counts):
+            cumulative += c
+            lines.append(f'bot_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'bot_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f'bot_stage_seconds_sum{{{labels}}} {total:.6f}')
+        lines.append(f'bot_stage_seconds_count{{{labels}}} {count}')
+    names = sorted({name for (name, _), _ in counters})
+    for name in names:
+        lines.append(f'# TYPE bot_{name} counter')
+        for (n, labels), value in sorted(counters):
+            if n == name:
+                text = ','.join(f'{k}="{_label(v)}"' for k, v in labels)
+                lines.append(f'bot_{name}{{{text}}} {value}')
+    for name in sorted({name for (name, _), _ in gauges}):
+        lines.append(f'# TYPE bot_{name} gauge')
+        for (n, labels), value in sorted(gauges):
+            if n == name:
+                text = ','.join(f'{k}="{_label(v)}"' for k, v in labels)
+                lines.append(f'bot_{name}{{{text}}} {value}' if text else f'bot_{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def summary() -> str:
+    with _lock:
+        rows = [(k, h.count, h.percentile(0.5), h.percentile(0.9), h.percentile(0.99), max(h.recent, default=0.0))
+                for k, h in _histograms.items()]
+        errors = sum(v for (name, _), v in _counters.items() if name == 'errors_total')
+        gauges = sorted(_gauges.items())
+    lines = [f"[METRICS] {len(rows)} series, {errors} errors (last {WINDOW} samples, ms: p50 / p90 / p99 / max)"]
+    if gauges:
+        lines.append('[METRICS] ' + ' '.join(f"{name}{dict(labels) if labels else ''}={value:g}" for (name, labels), value in gauges))
+    for (stage, symbol), count, p50, p90, p99, worst in sorted(rows):
+        lines.append(f"[METRICS] {symbol or '-'} {stage}: n={count} {p50 * 1000:.1f} / {p90 * 1000:.1f} / {p99 * 1000:.1f} / {worst * 1000:.1f}")
+    return '\n'.join(lines)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port: int = 0, summary_seconds: float = 0, host: str = '127.0.0.1'):
+    # Turns collection on; port > 0 serves /metrics, summary_seconds > 0 logs a periodic summary
+    global ENABLED
+    ENABLED = True
+    server = None
+    if port:
+        server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        botlog.info(f"Metrics at http://{host}:{server.server_port}/metrics", stage='metrics')
+    if summary_seconds:
+        def loop():
+            while True:
+                time.sleep(summary_seconds)
+                botlog.info(summary(), stage='metrics')
+        threading.Thread(target=loop, name='metrics-summary', daemon=True).start()
+    return server
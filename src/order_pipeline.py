@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import threading
+import time
+import ccxt
+import botlog
+import metrics
+
+# Order execution: every order carries a deterministic client order id (Bitget clientOid) built from
+# what it is for (strategy, symbol, signal bar / position), so a retry of the same intent can never
+# open a second position: after an ambiguous failure (timeout, lost response) the order is looked up
+# by that id and, if it is not there, sent again with the same id, which Bitget rejects as a
+# duplicate if the first one did land. Fills are confirmed off the strategy loop (a thread, or a task
+# in the async runner) by polling the order until it is filled; the confirmation logs the real
+# average price, slippage against the decision price and signal-to-fill latency, and hands the Fill
+# to an optional callback.
+
+# Seconds between order status polls while waiting for a fill
+CONFIRM_DELAYS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0)
+CONFIRM_TIMEOUT = 30.0
+# Exchange fill timestamps further than this from the local clock are not trusted for latency
+CLOCK_SKEW_LIMIT = 60.0
+# An order found by client id is only taken as this attempt's if created no earlier than this
+# before the attempt started (exchange vs local clock)
+RECOVER_SKEW_MS = 5000
+
+
+def client_order_id(*parts) -> str:
+    # Same parts, same id; Bitget allows up to 50 characters
+    return 'ema' + hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()[:32]
+
+
+def position_opened(pos):
+    # Exchange open time (ms) of a ccxt position: Bitget's cTime, parsed by ccxt as timestamp
+    if not pos:
+        return None
+    opened = pos.get('timestamp') or pos.get('info', {}).get('cTime')
+    return int(opened) if opened else None
+
+
+def exit_client_id(slot, symbol: str, pos) -> str:
+    # Keyed by the order that opened the slot or, for a position the bot adopted, by the position's
+    # open time: a later position with the same entry and size must not reuse the id
+    opened = slot.order_id or position_opened(pos) or slot.entry
+    return client_order_id(slot.strategy.name, symbol, 'exit', opened, slot.side, slot.contracts)
+
+
+def recovered_order(order, started_ms: int):
+    # An order carrying our client id that predates this attempt belongs to an earlier one
+    created = order.get('timestamp')
+    return created is None or created >= started_ms - RECOVER_SKEW_MS
+
+
+def fetch_order_by_client_id(exchange, symbol: str, client_id: str):
+    # ccxt's fetch_order always sends orderId, but Bitget's order detail also takes clientOid alone
+    lookup = getattr(exchange, 'fetch_order_by_client_id', None)
+    if lookup is not None:
+        return lookup(symbol, client_id)
+    market = exchange.market(symbol)
+    product_type, _ = exchange.handle_product_type_and_params(market, {})
+    try:
+        response = exchange.privateMixGetV2MixOrderDetail({'symbol': market['id'], 'productType': product_type, 'clientOid': client_id})
+    except ccxt.OrderNotFound:
+        return None
+    data = response.get('data')
+    return exchange.parse_order(data, market) if data else None
+
+
+async def fetch_order_by_client_id_async(exchange, symbol: str, client_id: str):
+    lookup = getattr(exchange, 'fetch_order_by_client_id', None)
+    if lookup is not None:
+        return await lookup(symbol, client_id)
+    market = exchange.market(symbol)
+    product_type, _ = exchange.handle_product_type_and_params(market, {})
+    try:
+        response = await exchange.privateMixGetV2MixOrderDetail({'symbol': market['id'], 'productType': product_type, 'clientOid': client_id})
+    except ccxt.OrderNotFound:
+        return None
+    data = response.get('data')
+    return exchange.parse_order(data, market) if data else None
+
+
+class Fill:
+    __slots__ = ('order_id', 'client_id', 'symbol', 'side', 'amount', 'filled', 'average', 'ref_price',
+                 'slippage_bps', 'signal_to_fill', 'order_to_fill')
+
+    def __init__(self, order_id, client_id, symbol, side, amount, filled, average, ref_price,
+                 slippage_bps, signal_to_fill, order_to_fill):
+        self.order_id = order_id
+        self.client_id = client_id
+        self.symbol = symbol
+        self.side = side
+        self.amount = amount
+        self.filled = filled
+        self.average = average
+        self.ref_price = ref_price
+        # Positive = filled worse than the decision price
+        self.slippage_bps = slippage_bps
+        self.signal_to_fill = signal_to_fill
+        self.order_to_fill = order_to_fill
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def order_filled(order, amount: float) -> bool:
+    if order is None:
+        return False
+    filled = float(order.get('filled') or 0)
+    return order.get('status') == 'closed' or (amount > 0 and filled >= amount * (1 - 1e-9))
+
+
+def make_fill(order, symbol: str, side: str, amount: float, client_id, ref_price, signal_time, placed_at: float) -> Fill:
+    now = time.time()
+    average = float(order.get('average') or order.get('price') or 0) or None
+    slippage = None
+    if average and ref_price:
+        slippage = (average - ref_price) / ref_price * 1e4 * (1 if side == 'buy' else -1)
+    fill_ts = order.get('lastTradeTimestamp') or order.get('timestamp')
+    fill_time = fill_ts / 1000 if fill_ts and abs(fill_ts / 1000 - now) < CLOCK_SKEW_LIMIT else now
+    signal_to_fill = fill_time - signal_time if signal_time else None
+    return Fill(order.get('id'), client_id, symbol, side, amount, float(order.get('filled') or amount), average, ref_price,
+                slippage, signal_to_fill, max(0.0, fill_time - placed_at))
+
+
+def report_fill(fill: Fill, strategy=None):
+    if fill.signal_to_fill is not None:
+        metrics.observe('signal_to_fill', fill.symbol, fill.signal_to_fill)
+    metrics.observe('order_to_fill', fill.symbol, fill.order_to_fill)
+    if fill.slippage_bps is not None:
+        metrics.gauge('last_slippage_bps', fill.slippage_bps, symbol=fill.symbol)
+    slip = f"{fill.slippage_bps:+.1f} bps" if fill.slippage_bps is not None else 'n/a'
+    latency = f" | signal-to-fill {fill.signal_to_fill * 1000:.0f} ms" if fill.signal_to_fill is not None else ''
+    botlog.info(f"[FILL] {fill.symbol} {fill.side.upper()} {fill.filled} @ {fill.average} (decision {fill.ref_price}, slippage {slip}){latency} | order_id: {fill.order_id}",
+                symbol=fill.symbol, stage='fill', order_id=fill.order_id, client_id=fill.client_id, strategy=strategy,
+                slippage_bps=fill.slippage_bps, signal_to_fill=fill.signal_to_fill)
+
+
+class OrderPipeline:
+    # Thread-safe; one per exchange client (see get_pipeline)
+    def __init__(self, exchange, retries: int = 2, retry_delay: float = 0.5, confirm_timeout: float = CONFIRM_TIMEOUT):
+        self.exchange = exchange
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.confirm_timeout = confirm_timeout
+
+    def _recover(self, symbol: str, client_id: str, error, started_ms: int):
+        try:
+            order = fetch_order_by_client_id(self.exchange, symbol, client_id)
+        except Exception as e:
+            botlog.warning(f"[ORDER] lookup of {client_id} after '{error}' failed: {e}", symbol=symbol, stage='order')
+            return None
+        if order is not None and not recovered_order(order, started_ms):
+            botlog.warning(f"[ORDER] {symbol} order {order.get('id')} with client id {client_id} predates this attempt; not using it",
+                           symbol=symbol, stage='order', order_id=order.get('id'), client_id=client_id)
+            raise error
+        if order is not None:
+            metrics.inc('orders_recovered_total', symbol=symbol)
+            botlog.warning(f"[ORDER] {symbol} order {client_id} was placed despite '{error}'; using order {order.get('id')}",
+                           symbol=symbol, stage='order', order_id=order.get('id'), client_id=client_id)
+        return order
+
+    def place(self, symbol: str, side: str, amount: float, params=None, client_id=None):
+        # create_order with at-most-once semantics per client_id; returns the exchange order
+        params = dict(params or {})
+        if client_id is not None:
+            params['clientOrderId'] = client_id
+        started_ms = self.exchange.milliseconds()
+        for attempt in range(self.retries + 1):
+            try:
+                return self.exchange.create_order(symbol, 'market', side, amount, None, params)
+            except (ccxt.NetworkError, ccxt.ExchangeError) as e:
+                if client_id is None:
+                    raise
+                order = self._recover(symbol, client_id, e, started_ms)
+                if order is not None:
+                    return order
+                if not isinstance(e, ccxt.NetworkError) or attempt == self.retries:
+                    raise
+                metrics.inc('order_retries_total', symbol=symbol)
+                time.sleep(self.retry_delay * (attempt + 1))
+
+    def submit(self, symbol: str, side: str, amount: float, params=None, client_id=None, ref_price=None,
+               signal_time=None, on_fill=None, strategy=None, on_placed=None):
+        # Places the order and returns it at once; the fill is confirmed on a background thread.
+        # on_placed(order) runs before that thread starts, so the caller can register the order id
+        # before on_fill can report against it.
+        placed_at = time.time()
+        order = self.place(symbol, side, amount, params, client_id)
+        if on_placed is not None:
+            on_placed(order)
+        threading.Thread(target=self._confirm, args=(order, symbol, side, amount, client_id, ref_price, signal_time, placed_at, on_fill, strategy),
+                         name=f'fill-{symbol}', daemon=True).start()
+        return order
+
+    def _confirm(self, order, symbol, side, amount, client_id, ref_price, signal_time, placed_at, on_fill, strategy):
+        deadline = time.monotonic() + self.confirm_timeout
+        current, k = order, 0
+        while not order_filled(current, amount):
+            if time.monotonic() >= deadline:
+                metrics.inc('fills_unconfirmed_total', symbol=symbol)
+                botlog.warning(f"[FILL] {symbol} order {order.get('id')} not confirmed filled within {self.confirm_timeout:.0f}s",
+                               symbol=symbol, stage='fill', order_id=order.get('id'), client_id=client_id)
+                return
+            time.sleep(CONFIRM_DELAYS[min(k, len(CONFIRM_DELAYS) - 1)])
+            k += 1
+            try:
+                current = self.exchange.fetch_order(order.get('id'), symbol)
+            except (ccxt.NetworkError, ccxt.OrderNotFound):
+                continue
+            except Exception as e:
+                botlog.warning(f"[FILL] {symbol} order {order.get('id')} status check failed: {e}", symbol=symbol, stage='fill')
+                continue
+        fill = make_fill(current, symbol, side, amount, client_id, ref_price, signal_time, placed_at)
+        report_fill(fill, strategy)
+        if on_fill is not None:
+            try:
+                on_fill(fill)
+            except Exception as e:
+                botlog.error(f"[FILL] {symbol} fill callback failed: {e}", symbol=symbol, stage='fill')
+
+
+class AsyncOrderPipeline(OrderPipeline):
+    # Same flow for ccxt.async_support clients; confirmations run as tasks on the event loop
+    def __init__(self, exchange, retries: int = 2, retry_delay: float = 0.5, confirm_timeout: float = CONFIRM_TIMEOUT):
+        super().__init__(exchange, retries, retry_delay, confirm_timeout)
+        self.tasks = set()
+
+    async def _recover(self, symbol: str, client_id: str, error, started_ms: int):
+        try:
+            order = await fetch_order_by_client_id_async(self.exchange, symbol, client_id)
+        except Exception as e:
+            botlog.warning(f"[ORDER] lookup of {client_id} after '{error}' failed: {e}", symbol=symbol, stage='order')
+            return None
+        if order is not None and not recovered_order(order, started_ms):
+            botlog.warning(f"[ORDER] {symbol} order {order.get('id')} with client id {client_id} predates this attempt; not using it",
+                           symbol=symbol, stage='order', order_id=order.get('id'), client_id=client_id)
+            raise error
+        if order is not None:
+            metrics.inc('orders_recovered_total', symbol=symbol)
+            botlog.warning(f"[ORDER] {symbol} order {client_id} was placed despite '{error}'; using order {order.get('id')}",
+                           symbol=symbol, stage='order', order_id=order.get('id'), client_id=client_id)
+        return order
+
+    async def place(self, symbol: str, side: str, amount: float, params=None, client_id=None):
+        params = dict(params or {})
+        if client_id is not None:
+            params['clientOrderId'] = client_id
+        started_ms = self.exchange.milliseconds()
+        for attempt in range(self.retries + 1):
+            try:
+                return await self.exchange.create_order(symbol, 'market', side, amount, None, params)
+            except (ccxt.NetworkError, ccxt.ExchangeError) as e:
+                if client_id is None:
+                    raise
+                order = await self._recover(symbol, client_id, e, started_ms)
+                if order is not None:
+                    return order
+                if not isinstance(e, ccxt.NetworkError) or attempt == self.retries:
+                    raise
+                metrics.inc('order_retries_total', symbol=symbol)
+                await asyncio.sleep(self.retry_delay * (attempt + 1))
+
+    async def submit(self, symbol: str, side: str, amount: float, params=None, client_id=None, ref_price=None,
+                     signal_time=None, on_fill=None, strategy=None, on_placed=None):
+        placed_at = time.time()
+        order = await self.place(symbol, side, amount, params, client_id)
+        if on_placed is not None:
+            on_placed(order)
+        task = asyncio.create_task(self._confirm(order, symbol, side, amount, client_id, ref_price, signal_time, placed_at, on_fill, strategy))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return order
+
+    async def _confirm(self, order, symbol, side, amount, client_id, ref_price, signal_time, placed_at, on_fill, strategy):
+        deadline = time.monotonic() + self.confirm_timeout
+        current, k = order, 0
+        while not order_filled(current, amount):
+            if time.monotonic() >= deadline:
+                metrics.inc('fills_unconfirmed_total', symbol=symbol)
+                botlog.warning(f"[FILL] {symbol} order {order.get('id')} not confirmed filled within {self.confirm_timeout:.0f}s",
+                               symbol=symbol, stage='fill', order_id=order.get('id'), client_id=client_id)
+                return
+            await asyncio.sleep(CONFIRM_DELAYS[min(k, len(CONFIRM_DELAYS) - 1)])
+            k += 1
+            try:
+                current = await self.exchange.fetch_order(order.get('id'), symbol)
+            except (ccxt.NetworkError, ccxt.OrderNotFound):
+                continue
+            except Exception as e:
+                botlog.warning(f"[FILL] {symbol} order {order.get('id')} status check failed: {e}", symbol=symbol, stage='fill')
+                continue
+        fill = make_fill(current, symbol, side, amount, client_id, ref_price, signal_time, placed_at)
+        report_fill(fill, strategy)
+        if on_fill is not None:
+            try:
+                on_fill(fill)
+            except Exception as e:
+                botlog.error(f"[FILL] {symbol} fill callback failed: {e}", symbol=symbol, stage='fill')
+
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(exchange, cls=OrderPipeline):
+    # One pipeline per exchange client, created on first use
+    with _pipelines_lock:
+        entry = _pipelines.get(id(exchange))
+        if entry is None or entry[0] is not exchange:
+            entry = _pipelines[id(exchange)] = (exchange, cls(exchange))
+        return entry[1]
+
+
+def get_async_pipeline(exchange):
+    return get_pipeline(exchange, AsyncOrderPipeline)
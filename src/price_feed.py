@@ -0,0 +1,122 @@
+import asyncio
+import json
+import time
+
+# A price feed is anything with the ccxt.pro watch interface used by the streaming runner:
+#   await feed.watch_ticker(symbol)          -> ticker dict with 'last'
+#   await feed.watch_ohlcv(symbol, timeframe) -> list of [ts, o, h, l, c, v], newest last
+#   await feed.close()
+# ccxt.pro exchanges satisfy it directly; ReplayFeed is the local stand-in.
+
+
+def make_stream_feed(params=None):
+    # ccxt.pro push feed for Bitget, or None if this ccxt build has no pro module
+    try:
+        import ccxt.pro as ccxtpro
+    except ImportError:
+        return None
+    return ccxtpro.bitget(dict(params or {}))
+
+
+class FeedExhausted(Exception):
+    # Raised by ReplayFeed once the recording has been fully played back
+    pass
+
+
+class ReplayFeed:
+    # Replays recorded ticks as ticker pushes and builds the kline stream from them,
+    # so TP/SL and candle-close handling can be exercised and timed without the exchange.
+    # ticks: {symbol: [(ts_ms, price[, amount]), ...]}; speed=None plays as fast as consumers keep up.
+    def __init__(self, ticks, timeframe: str = '1m', speed=None):
+        from ccxt import Exchange
+        self.ticks = ticks
+        self.timeframe = timeframe
+        self.tf_ms = Exchange.parse_timeframe(timeframe) * 1000
+        self.speed = speed
+        self.ticker_queues = {s: asyncio.Queue() for s in ticks}
+        self.ohlcv_queues = {s: asyncio.Queue() for s in ticks}
+        self.player = None
+        self.emitted = 0
+        # perf_counter() at the moment each symbol's latest tick was pushed, for latency checks
+        self.last_emit = {}
+
+    @classmethod
+    def from_jsonl(cls, path: str, timeframe: str = '1m', speed=None):
+        # One {"symbol": ..., "ts": ..., "price": ..., "amount": ...} object per line
+        ticks = {}
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                t = json.loads(line)
+                ticks.setdefault(t['symbol'], []).append((int(t['ts']), float(t['price']), float(t.get('amount', 0))))
+        return cls(ticks, timeframe, speed)
+
+    def _ensure_started(self):
+        if self.player is None:
+            self.player = asyncio.create_task(self._play())
+
+    async def _play(self):
+        events = sorted((t[0], symbol, t) for symbol, rows in self.ticks.items() for t in rows)
+        bars = {}
+        prev_ts = None
+        for ts, symbol, tick in events:
+            if self.speed and prev_ts is not None and ts > prev_ts:
+                await asyncio.sleep((ts - prev_ts) / 1000.0 / self.speed)
+            prev_ts = ts
+            price = tick[1]
+            amount = tick[2] if len(tick) > 2 else 0.0
+            bar_ts = ts - ts % self.tf_ms
+            bar = bars.get(symbol)
+            if bar is None or bar[0] != bar_ts:
+                bar = [bar_ts, price, price, price, price, amount]
+                bars[symbol] = bar
+            else:
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[4] = price
+                bar[5] += amount
+            self.ticker_queues[symbol].put_nowait({'symbol': symbol, 'timestamp': ts, 'last': price, 'bid': price, 'ask': price})
+            self.ohlcv_queues[symbol].put_nowait([list(bar)])
+            self.last_emit[symbol] = time.perf_counter()
+            self.emitted += 1
+            # Let consumers react to this tick before the next one lands
+            await asyncio.sleep(0)
+        for q in list(self.ticker_queues.values()) + list(self.ohlcv_queues.values()):
+            q.put_nowait(None)
+
+    async def _next(self, queue):
+        self._ensure_started()
+        item = await queue.get()
+        if item is None:
+            queue.put_nowait(None)
+            raise FeedExhausted('replay finished')
+        return item
+
+    async def watch_ticker(self, symbol: str, params={}):
+        return await self._next(self.ticker_queues[symbol])
+
+    async def watch_ohlcv(self, symbol: str, timeframe='1m', since=None, limit=None, params={}):
+        if timeframe != self.timeframe:
+            raise ValueError(f"ReplayFeed builds {self.timeframe} candles, not {timeframe}")
+        return await self._next(self.ohlcv_queues[symbol])
+
+    async def close(self):
+        if self.player is not None:
+            self.player.cancel()
+
+
+async def record_ticks(feed, symbols, path: str, seconds: float):
+    # Append live ticker pushes to a JSONL file that ReplayFeed.from_jsonl can play back
+    deadline = time.time() + seconds
+    with open(path, 'a') as f:
+        async def record(symbol):
+            while time.time() < deadline:
+                ticker = await feed.watch_ticker(symbol)
+                f.write(json.dumps({'symbol': symbol, 'ts': ticker.get('timestamp') or int(time.time() * 1000), 'price': ticker['last']}) + '\n')
+        tasks = [asyncio.create_task(record(s)) for s in symbols]
+        try:
+            await asyncio.wait(tasks, timeout=seconds)
+        finally:
+            for t in tasks:
+                t.cancel()
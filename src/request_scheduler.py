@@ -0,0 +1,136 @@
+import heapq
+import itertools
+import threading
+import time
+import metrics
+
+# Process-wide request budget for the shared exchange client. A token bucket holds the account's
+# rate limit in ccxt cost units (Bitget: rateLimit 50 ms = 20 units/s; candles and tickers cost 1,
+# orders 2, all-position 4). Requests wait in one queue ordered by lane priority, then arrival, so
+# exit orders and position checks overtake queued candle refreshes. A 429 (RateLimitExceeded or
+# DDoSProtection) halves the refill rate and pauses the queue; each success wins a little of it back.
+
+# (path fragment, lane) in match order; lanes earlier in LANES are served first
+LANE_RULES = (
+    ('/order/', 'order'),
+    ('/position/', 'position'),
+    ('/account/', 'position'),
+    ('candles', 'candles'),
+)
+LANES = ('order', 'position', 'market', 'candles')
+PRIORITY = {lane: i for i, lane in enumerate(LANES)}
+
+
+def request_lane(path: str) -> str:
+    for fragment, lane in LANE_RULES:
+        if fragment in path:
+            return lane
+    return 'market'
+
+
+class RequestScheduler:
+    def __init__(self, rate: float, burst: float = 5.0, min_factor: float = 0.1, recover_step: float = 0.02,
+                 backoff: float = 1.0, max_backoff: float = 30.0):
+        # rate: cost units per second at full speed; burst: bucket capacity
+        self.rate = rate
+        self.burst = burst
+        self.min_factor = min_factor
+        self.recover_step = recover_step
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.tokens = burst
+        # Fraction of rate currently allowed (lowered on 429, recovered on success)
+        self.factor = 1.0
+        self.paused_until = 0.0
+        self.strikes = 0
+        self.updated = time.monotonic()
+        self.cond = threading.Condition()
+        self.queue = []
+        self.seq = itertools.count()
+        self.max_depth = 0
+        self.penalties = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate * self.factor)
+        self.updated = now
+
+    def acquire(self, cost: float = 1.0, lane: str = 'market') -> float:
+        # Blocks until this request may go out; returns the seconds spent waiting
+        cost = 1.0 if cost is None else cost
+        entry = (PRIORITY.get(lane, len(LANES)), next(self.seq))
+        start = time.monotonic()
+        with self.cond:
+            heapq.heappush(self.queue, entry)
+            self.max_depth = max(self.max_depth, len(self.queue))
+            metrics.gauge('request_queue_depth', len(self.queue))
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self.queue[0] is not entry:
+                        # Only the head watches the clock; the rest wake when it leaves
+                        self.cond.wait()
+                        continue
+                    # A request costlier than the bucket goes once it is full and leaves a debt
+                    need = min(cost, self.burst)
+                    if now >= self.paused_until and self.tokens >= need:
+                        self.tokens -= cost
+                        break
+                    self.cond.wait(max(self.paused_until - now, (need - self.tokens) / (self.rate * self.factor), 0.0005))
+            finally:
+                if self.queue[0] is entry:
+                    heapq.heappop(self.queue)
+                else:
+                    self.queue.remove(entry)
+                    heapq.heapify(self.queue)
+                metrics.gauge('request_queue_depth', len(self.queue))
+                self.cond.notify_all()
+        waited = time.monotonic() - start
+        metrics.observe('queue_wait', lane, waited)
+        return waited
+
+    def penalize(self, lane: str = ''):
+        # Rate limited by the exchange: halve the refill rate and hold every lane for a growing pause
+        with self.cond:
+            self.penalties += 1
+            self.strikes += 1
+            self.factor = max(self.min_factor, self.factor / 2)
+            pause = min(self.max_backoff, self.backoff * 2 ** (self.strikes - 1))
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.tokens = min(self.tokens, 0.0)
+            metrics.gauge('request_rate_factor', self.factor)
+            self.cond.notify_all()
+        metrics.inc('rate_limited_total', lane=lane)
+        return pause
+
+    def reward(self):
+        if self.factor >= 1.0 and not self.strikes:
+            return
+        with self.cond:
+            self.strikes = 0
+            self.factor = min(1.0, self.factor + self.recover_step)
+            metrics.gauge('request_rate_factor', self.factor)
+
+    def depth(self) -> int:
+        return len(self.queue)
+
+    def stats(self):
+        with self.cond:
+            return {'depth': len(self.queue), 'max_depth': self.max_depth, 'factor': self.factor,
+                    'penalties': self.penalties, 'tokens': self.tokens}
+
+
+class InflightCall:
+    # One GET in flight; identical GETs from other threads wait for its response instead of sending their own
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
@@ -0,0 +1,388 @@
+import asyncio
+import signal
+import time
+import ccxt
+import ccxt.async_support as ccxt_async
+from ema_state import EmaBank
+from candle_cache import TimeframeSet
+from candle_store import store_path, tail_rows
+from account_snapshot import AsyncAccountSnapshot
+from price_feed import make_stream_feed
+import metrics
+import botlog
+from tpsl_orders import AsyncTpslGuard, entry_params
+from market_meta import load_markets_cached_async
+from strategies import StrategyBook
+from order_pipeline import get_async_pipeline, client_order_id, exit_client_id
+from run_strat1 import (
+    exchange_params, BASE_TIMEFRAME, STRATEGIES,
+    POLL_SECONDS, LEVERAGE, SNAPSHOT_MAX_AGE,
+    METRICS_PORT, METRICS_SUMMARY_SECONDS, EXIT_MODE, EXIT_FALLBACK_SLACK, MARKETS_CACHE_TTL,
+    get_conf, dprint, round_amount, usd_to_contracts, check_exit, side_from_position, symbol_to_ccxt,
+    evaluate_slot, ema_pairs, sync_positions, persist_candles, open_journal, setup_logging, STATE_DB, WARM_START,
+)
+
+# Upper bound on symbol cycles talking to the exchange at the same time
+MAX_CONCURRENCY = get_conf('MAX_CONCURRENCY', int, 'MAX_CONCURRENCY', 20)
+# Push mode: TP/SL on every ticker update, signal on every closed kline; REST polling as fallback
+STREAMING = get_conf('STREAMING', str, 'STREAMING', 'false').lower() == 'true'
+# A stream that is silent this long is treated as dead and the symbol falls back to polling
+STREAM_STALE_SECONDS = get_conf('STREAM_STALE_SECONDS', float, 'STREAM_STALE_SECONDS', 60)
+
+
+def make_async_exchange():
+    dprint('Creating async Bitget exchange instance...')
+    return ccxt_async.bitget(exchange_params())
+
+
+class SymbolContext:
+    # Per-symbol state carried between cycles (the locals of run_strategy_for_symbol)
+    def __init__(self, symbol, market, book):
+        self.symbol = symbol
+        self.ccxt_symbol = market['symbol']
+        self.market = market
+        self.book = book
+        # One StrategySlot per strategy trading this symbol
+        self.slots = book.for_symbol(symbol)
+        self.timeframes = book.timeframes(symbol)
+        # TimeframeSet: one BASE_TIMEFRAME feed, the other timeframes resampled from it
+        self.candles = None
+        # One EmaBank per timeframe shared by all strategies, and each strategy's (fast, slow) view of it
+        self.banks = {tf: EmaBank() for tf in self.timeframes}
+        self.pairs = ema_pairs(self.slots, self.banks)
+        self.last_price = None
+        # Resting exchange TP/SL triggers (EXIT_MODE = exchange), else None
+        self.tpsl = None
+        # Seconds from the price update that triggered the last exit to the exit order returning
+        self.exit_latency = None
+        # Last (book net, exchange net) mismatch reported
+        self.warned = None
+
+
+async def market_order(exchange, symbol: str, side: str, amount: float, params=None, client_id=None,
+                       ref_price=None, signal_time=None, on_fill=None, strategy=None, on_placed=None):
+    # Fill confirmation runs as a task on the loop (order_pipeline.AsyncOrderPipeline)
+    botlog.info(f"[TRADE] Placing market {side.upper()} {amount} {symbol}", symbol=symbol, stage='order', client_id=client_id)
+    try:
+        with metrics.timed('order', symbol):
+            order = await get_async_pipeline(exchange).submit(symbol, side, amount, params, client_id, ref_price, signal_time, on_fill, strategy, on_placed)
+        metrics.inc('orders_total', symbol=symbol, side=side)
+        botlog.info(f"[TRADE] SUCCESS: {side.upper()} {amount} {symbol} | order_id: {order.get('id', 'N/A')} | client_id: {client_id} | avg: {order.get('average') or 'pending'}",
+                    symbol=symbol, stage='order', order_id=order.get('id'), client_id=client_id, side=side, amount=amount)
+        dprint('Order result:', order, symbol=symbol, stage='order', order_id=order.get('id'))
+        return order
+    except Exception as e:
+        botlog.error(f"[TRADE] ERROR placing {side.upper()} {amount} {symbol}: {e}", symbol=symbol, stage='order')
+        raise
+
+
+async def set_leverage(exchange, symbol: str, leverage: int):
+    try:
+        await exchange.set_leverage(leverage, symbol)
+        botlog.info(f"Leverage set to {leverage}x for {symbol}", symbol=symbol, stage='setup')
+    except Exception as e:
+        botlog.warning(f"Failed to set leverage for {symbol}: {e}", symbol=symbol, stage='setup')
+
+
+async def close_position(exchange, market, symbol: str, pos, price_now: float, tp_pct: float, sl_pct: float, params=None, strategy=None,
+                         client_id=None, on_fill=None):
+    # Returns the exit order when TP/SL fired and the close went through, else None
+    exit_check = check_exit(pos, price_now, tp_pct, sl_pct)
+    if exit_check is None:
+        return None
+    side, contracts, pnl_pct, hit_tp, hit_sl = exit_check
+    if hit_tp or hit_sl:
+        exit_side = 'sell' if side == 'long' else 'buy'
+        amt = round_amount(exchange, market, contracts)
+        try:
+            order = await market_order(exchange, symbol, exit_side, amt, params, client_id, price_now, on_fill=on_fill, strategy=strategy)
+            botlog.info(f"[EXIT] {symbol} {side.upper()} position closed: TP={hit_tp} SL={hit_sl} pnl_pct={pnl_pct:.4f} | order_id: {order.get('id', 'N/A')}",
+                        symbol=symbol, stage='exit', order_id=order.get('id'), strategy=strategy)
+            return order
+        except Exception as e:
+            botlog.error(f"[EXIT] ERROR closing {symbol} {side.upper()} position: {e}", symbol=symbol, stage='exit')
+    return None
+
+
+def sync_timeframes(ctx):
+    # Feed newly closed candles to each timeframe's EMA bank; returns the timeframes that advanced
+    return [tf for tf in ctx.timeframes if ctx.banks[tf].sync(ctx.candles[tf].timestamps, ctx.candles[tf].closes)]
+
+
+def update_signals(ctx, timeframes):
+    # Status lines and slot.signal for every strategy on the symbol; True if any has an entry signal
+    for slot in ctx.slots:
+        evaluate_slot(slot, ctx.pairs, timeframes, ctx.symbol, ctx.book)
+    return any(slot.signal in ('long', 'short') for slot in ctx.slots)
+
+
+async def try_exit(ctx, exchange, snapshot, pos, price, positions_ok=True):
+    side = side_from_position(pos)
+    ctx.warned = sync_positions(ctx.book, ctx.symbol, ctx.slots, pos, side, exchange, ctx.market, ctx.warned, positions_ok)
+    exited = False
+    for slot in ctx.slots:
+        strategy = slot.strategy
+        tp_pct, sl_pct, params = strategy.tp_pct, strategy.sl_pct, None
+        if ctx.tpsl is not None:
+            # An unknown position must not look flat: that would cancel live TP/SL orders
+            if positions_ok:
+                with metrics.timed('tpsl', ctx.ccxt_symbol):
+                    await ctx.tpsl.reconcile(pos, side, strategy.tp_pct, strategy.sl_pct)
+            tp_pct, sl_pct = ctx.tpsl.fallback_thresholds(strategy.tp_pct, strategy.sl_pct)
+            params = {'reduceOnly': True}
+        exit_id = exit_client_id(slot, ctx.ccxt_symbol, pos)
+        order = await close_position(exchange, ctx.market, ctx.ccxt_symbol, slot.position(), price, tp_pct, sl_pct, params, strategy.name,
+                                     exit_id, lambda fill, slot=slot: ctx.book.fill(slot, fill))
+        if order is not None:
+            slot.close()
+            ctx.book.record(slot, 'exit', order.get('id'), price=price, average=order.get('average'))
+            exited = True
+    if exited:
+        await snapshot.invalidate()
+    return exited
+
+
+async def try_entry(ctx, exchange, snapshot, slot, signal_now, price):
+    strategy = slot.strategy
+    amount = usd_to_contracts(exchange, ctx.market, strategy.size_usdt, price)
+    if amount <= 0:
+        botlog.info(f"[{ctx.symbol}] Amount rounded to 0; increase POSITION_SIZE_USDT", symbol=ctx.symbol)
+        return
+    if not ctx.book.reserve(slot, amount * price):
+        botlog.info(f"[ENTRY] {ctx.ccxt_symbol} {signal_now} skipped: strategy {strategy.name} is at RISK_BUDGET_USDT={strategy.budget_usdt}",
+                    symbol=ctx.symbol, stage='entry', strategy=strategy.name)
+        return
+    order_side = 'buy' if signal_now == 'long' else 'sell'
+    try:
+        params = entry_params(signal_now, price, strategy.tp_pct, strategy.sl_pct) if ctx.tpsl is not None else None
+        entry_id = client_order_id(strategy.name, ctx.ccxt_symbol, 'entry', slot.last_signal_bar, signal_now)
+        # The slot takes the order id before its fill can be confirmed
+        order = await market_order(exchange, ctx.ccxt_symbol, order_side, amount, params, entry_id, price, slot.last_signal_time,
+                                   lambda fill: ctx.book.fill(slot, fill), strategy.name,
+                                   lambda order: ctx.book.open(slot, signal_now, amount, float(order.get('average') or price), order.get('id')))
+        if slot.signal_at is not None:
+            metrics.observe('signal_to_order', ctx.ccxt_symbol, time.perf_counter() - slot.signal_at)
+        ctx.book.record(slot, 'entry', order.get('id'), price=price, average=order.get('average'), filled=order.get('filled'))
+        await snapshot.invalidate()
+        botlog.info(f"[ENTRY] {ctx.ccxt_symbol} {order_side.upper()} {amount} contracts at ~{price} | order_id: {order.get('id', 'N/A')}",
+                    symbol=ctx.symbol, stage='entry', order_id=order.get('id'), strategy=strategy.name)
+    except Exception as e:
+        botlog.error(f"[ENTRY] ERROR placing entry order for {ctx.ccxt_symbol}: {e}", symbol=ctx.symbol, stage='entry')
+    finally:
+        ctx.book.settle(slot)
+
+
+async def try_entries(ctx, exchange, snapshot, price):
+    for slot in ctx.slots:
+        # The pending cross is settled here: entered, or ruled out by an open position
+        signal = ctx.book.take_signal(slot)
+        if slot.side == 'flat' and signal in ('long', 'short'):
+            await try_entry(ctx, exchange, snapshot, slot, signal, price)
+
+
+async def symbol_cycle(ctx, exchange, snapshot):
+    # One fetch -> signal -> TP/SL -> entry pass; the body of run_strategy_for_symbol's loop
+    with metrics.timed('fetch_ohlcv', ctx.ccxt_symbol):
+        closed = await ctx.candles.refresh_async()
+    with metrics.timed('signal', ctx.ccxt_symbol):
+        sync_timeframes(ctx)
+    dprint(lambda: f'[{ctx.symbol}] Candle cache: bars closed on {closed}', symbol=ctx.symbol)
+    if closed:
+        await asyncio.to_thread(persist_candles, ctx.book.journal, ctx.ccxt_symbol, ctx.candles.base)
+    update_signals(ctx, ctx.timeframes)
+    with metrics.timed('position', ctx.ccxt_symbol):
+        pos, positions_ok = await snapshot.position_state(ctx.ccxt_symbol)
+    side = side_from_position(pos)
+    with metrics.timed('last_price', ctx.ccxt_symbol):
+        price = await snapshot.last_price(ctx.ccxt_symbol)
+    dprint(lambda: f'[{ctx.symbol}] signals={[slot.signal for slot in ctx.slots]}, side={side}, price={price}', symbol=ctx.symbol)
+    if await try_exit(ctx, exchange, snapshot, pos, price, positions_ok):
+        # No entry in the cycle that closed a position: its cross is ruled out
+        for slot in ctx.slots:
+            ctx.book.take_signal(slot)
+        return
+    await try_entries(ctx, exchange, snapshot, price)
+
+
+async def poll_once(ctx, exchange, snapshot, limiter):
+    try:
+        async with limiter:
+            await symbol_cycle(ctx, exchange, snapshot)
+    except ccxt.NetworkError as e:
+        botlog.warning(f"[{ctx.symbol}] Network error: {e}", symbol=ctx.symbol)
+    except ccxt.ExchangeError as e:
+        botlog.warning(f"[{ctx.symbol}] Exchange error: {e}", symbol=ctx.symbol)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        botlog.error(f"[{ctx.symbol}] Unhandled error: {e}", symbol=ctx.symbol)
+
+
+async def setup_symbol(symbol, exchange, limiter, book):
+    ccxt_symbol = symbol_to_ccxt(symbol)
+    market = exchange.market(ccxt_symbol)
+    if not market.get('linear'):
+        raise RuntimeError(f"Expected linear USDT perpetual for {ccxt_symbol}")
+    async with limiter:
+        await set_leverage(exchange, ccxt_symbol, LEVERAGE)
+    ctx = SymbolContext(symbol, market, book)
+    for slot in ctx.slots:
+        strategy = slot.strategy
+        name = f' [{strategy.name}]' if book.multi else ''
+        botlog.info(f"[{symbol}] Running EMA cross bot{name} on {ccxt_symbol} {','.join(strategy.timeframes)} | fast={strategy.fast} slow={strategy.slow} | leverage={LEVERAGE}x", symbol=symbol)
+    if EXIT_MODE == 'exchange':
+        # Position TP/SL covers the whole net position, so it needs the symbol to have one strategy
+        if len(ctx.slots) == 1:
+            ctx.tpsl = AsyncTpslGuard(exchange, ccxt_symbol, EXIT_FALLBACK_SLACK)
+        else:
+            botlog.warning(f"[{symbol}] EXIT_MODE=exchange needs a single strategy per symbol; using polled exits", symbol=symbol, stage='setup')
+    size = max([200] + [slot.strategy.slow + 50 for slot in ctx.slots])
+    ctx.candles = TimeframeSet(exchange, ccxt_symbol, ctx.timeframes, BASE_TIMEFRAME, size=size)
+    # Seeded from the local store (live bars persisted with a journal, or history.py), as in run_strat1
+    if WARM_START:
+        warmed = ctx.candles.warm_start(tail_rows(store_path(ccxt_symbol, ctx.candles.base_timeframe), ctx.candles.warm_rows))
+        if warmed:
+            botlog.info(f"[{symbol}] Warm start: {warmed} bars from local store", symbol=symbol)
+    return ctx
+
+
+async def run_symbol(symbol, exchange, snapshot, limiter, book, poll_seconds=POLL_SECONDS, cycles=None):
+    ctx = await setup_symbol(symbol, exchange, limiter, book)
+    done = 0
+    while cycles is None or done < cycles:
+        await poll_once(ctx, exchange, snapshot, limiter)
+        done += 1
+        if cycles is None or done < cycles:
+            await asyncio.sleep(poll_seconds)
+
+
+async def watch_prices(ctx, exchange, feed, snapshot):
+    # TP/SL on every pushed price instead of once per poll
+    while True:
+        ticker = await asyncio.wait_for(feed.watch_ticker(ctx.ccxt_symbol), STREAM_STALE_SECONDS)
+        received = time.perf_counter()
+        ctx.last_price = float(ticker['last'])
+        pos, positions_ok = await snapshot.position_state(ctx.ccxt_symbol)
+        if await try_exit(ctx, exchange, snapshot, pos, ctx.last_price, positions_ok):
+            ctx.exit_latency = time.perf_counter() - received
+            metrics.observe('tick_to_exit', ctx.ccxt_symbol, ctx.exit_latency)
+            dprint(lambda: f'[{ctx.symbol}] tick-to-exit {ctx.exit_latency * 1000:.2f} ms', symbol=ctx.symbol)
+
+
+async def watch_candles(ctx, exchange, feed, snapshot, limiter):
+    # Signal evaluation only when a kline closes
+    if len(ctx.candles) == 0:
+        async with limiter:
+            await ctx.candles.refresh_async()
+    sync_timeframes(ctx)
+    while True:
+        ohlcv = await asyncio.wait_for(feed.watch_ohlcv(ctx.ccxt_symbol, ctx.candles.base_timeframe), STREAM_STALE_SECONDS)
+        if ctx.candles.push(ohlcv) is None:
+            dprint(f'[{ctx.symbol}] Kline gap, repairing over REST', symbol=ctx.symbol)
+            async with limiter:
+                await ctx.candles.refresh_async()
+        advanced = sync_timeframes(ctx)
+        if not advanced:
+            continue
+        await asyncio.to_thread(persist_candles, ctx.book.journal, ctx.ccxt_symbol, ctx.candles.base)
+        if not update_signals(ctx, advanced):
+            continue
+        pos, positions_ok = await snapshot.position_state(ctx.ccxt_symbol)
+        ctx.warned = sync_positions(ctx.book, ctx.symbol, ctx.slots, pos, side_from_position(pos), exchange, ctx.market, ctx.warned, positions_ok)
+        price = ctx.last_price if ctx.last_price is not None else await snapshot.last_price(ctx.ccxt_symbol)
+        await try_entries(ctx, exchange, snapshot, price)
+
+
+async def stream_symbol(symbol, exchange, feed, snapshot, limiter, book, poll_seconds=POLL_SECONDS):
+    ctx = await setup_symbol(symbol, exchange, limiter, book)
+    while True:
+        tasks = [
+            asyncio.create_task(watch_prices(ctx, exchange, feed, snapshot)),
+            asyncio.create_task(watch_candles(ctx, exchange, feed, snapshot, limiter)),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            error = next((t.exception() for t in done if t.exception() is not None), None)
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        botlog.warning(f"[{symbol}] Stream error: {error!r}; falling back to REST polling", symbol=symbol, stage='stream')
+        await poll_once(ctx, exchange, snapshot, limiter)
+        await asyncio.sleep(poll_seconds)
+
+
+async def run(symbols, exchange=None, poll_seconds=POLL_SECONDS, max_concurrency=MAX_CONCURRENCY, cycles=None, stop=None, feed=None, book=None):
+    # exchange may be any object with the ccxt async_support interface (e.g. a local fake in tests);
+    # feed switches symbols to push mode (see price_feed.py), cycles only applies to polling.
+    # symbols (when given) runs every configured strategy on those symbols instead of their own lists.
+    book = book or StrategyBook(STRATEGIES, symbols)
+    symbols = book.symbols
+    own_exchange = exchange is None
+    if own_exchange:
+        exchange = make_async_exchange()
+    stop = stop or asyncio.Event()
+    try:
+        await load_markets_cached_async(exchange, MARKETS_CACHE_TTL)
+        limiter = asyncio.Semaphore(max_concurrency)
+        snapshot = AsyncAccountSnapshot(exchange, [symbol_to_ccxt(s) for s in symbols], max_age=min(SNAPSHOT_MAX_AGE, poll_seconds / 2))
+        if feed is not None:
+            tasks = [asyncio.create_task(stream_symbol(s, exchange, feed, snapshot, limiter, book, poll_seconds), name=f'symbol-{s}') for s in symbols]
+        else:
+            tasks = [asyncio.create_task(run_symbol(s, exchange, snapshot, limiter, book, poll_seconds, cycles), name=f'symbol-{s}') for s in symbols]
+        stopper = asyncio.create_task(stop.wait())
+        # Run until asked to stop or every symbol task has finished (cycles limit / fatal error)
+        pending = set(tasks)
+        while pending and not stop.is_set():
+            done, _ = await asyncio.wait(pending | {stopper}, return_when=asyncio.FIRST_COMPLETED)
+            pending -= done
+        for t in tasks + [stopper]:
+            t.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for s, r in zip(symbols, results):
+            if isinstance(r, Exception):
+                botlog.error(f"[{s}] Task failed: {r}", symbol=s)
+    finally:
+        if own_exchange:
+            await exchange.close()
+
+
+def main():
+    setup_logging()
+    book = StrategyBook(STRATEGIES, journal=open_journal())
+    botlog.info(f"Starting async multi-symbol bot for: {', '.join(book.symbols)} (max concurrency {MAX_CONCURRENCY})")
+    if book.multi:
+        for strategy in STRATEGIES:
+            botlog.info(f"Strategy {strategy}")
+    if book.journal is not None:
+        botlog.info(f"State journal {STATE_DB}: restored {book.restore()} strategy slots")
+    if METRICS_PORT or METRICS_SUMMARY_SECONDS:
+        metrics.start(METRICS_PORT, METRICS_SUMMARY_SECONDS)
+
+    async def runner():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows: fall back to KeyboardInterrupt from asyncio.run
+                pass
+        feed = make_stream_feed(exchange_params()) if STREAMING else None
+        if STREAMING and feed is None:
+            botlog.warning('STREAMING=true but ccxt.pro is not available; using REST polling')
+        try:
+            await run(None, stop=stop, feed=feed, book=book)
+        finally:
+            if feed is not None:
+                await feed.close()
+
+    try:
+        asyncio.run(runner())
+    except KeyboardInterrupt:
+        pass
+    botlog.info('Stopped.')
+
+
+if __name__ == '__main__':
+    main()
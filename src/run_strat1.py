@@ -1,12 +1,22 @@
 import os
 import time
-from decimal import Decimal
 import sys
 import configparser
 import threading
 import ccxt
-import pandas as pd
 from dotenv import load_dotenv
+from ema_state import EmaBank, ema_cross, cross_signal
+from candle_cache import TimeframeSet, candle_closes
+from candle_store import store_path, tail_rows, append_rows, last_stored_ts, DATA_DIR
+from exchange_gateway import ExchangeGateway
+from account_snapshot import AccountSnapshot
+from scheduler import CandleScheduler
+import metrics
+import botlog
+from tpsl_orders import TpslGuard, entry_params
+from market_meta import market_spec, load_markets_cached
+from strategies import StrategyBook, load_strategies, net_mismatch
+from order_pipeline import get_pipeline, client_order_id, exit_client_id
 
 # --- Config loading ---
 load_dotenv()
@@ -35,21 +45,65 @@ SYMBOLS_RAW = get_conf('SYMBOLS', str, 'SYMBOLS', 'SOL')
 SYMBOLS = [s.strip().upper() for s in SYMBOLS_RAW.split(',') if s.strip()]
 MARKET_TYPE = 'swap'
 TIMEFRAME = get_conf('TIMEFRAME', str, 'TIMEFRAME', '5m')
+# Timeframes the strategy runs on (comma list). Only BASE_TIMEFRAME (default: the finest) is fetched;
+# the others are resampled from it locally, so extra timeframes cost no extra candle requests
+TIMEFRAMES = [tf.strip() for tf in get_conf('TIMEFRAMES', str, 'TIMEFRAMES', TIMEFRAME).split(',') if tf.strip()]
+BASE_TIMEFRAME = get_conf('BASE_TIMEFRAME', str, 'BASE_TIMEFRAME', None)
 FAST_EMA = get_conf('FAST_EMA', int, 'FAST_EMA', 21)
 SLOW_EMA = get_conf('SLOW_EMA', int, 'SLOW_EMA', 55)
 POSITION_SIZE_USDT = get_conf('POSITION_SIZE_USDT', float, 'POSITION_SIZE_USDT', 50)
 TP_PCT = get_conf('TP_PCT', float, 'TP_PCT', 0.01)
 SL_PCT = get_conf('SL_PCT', float, 'SL_PCT', 0.005)
 POLL_SECONDS = get_conf('POLL_SECONDS', int, 'POLL_SECONDS', 10)
+# Seed candle buffers from the local history store (see history.py) instead of a full API backfill
+WARM_START = get_conf('WARM_START', str, 'WARM_START', 'true').lower() == 'true'
 LEVERAGE = get_conf('LEVERAGE', int, 'LEVERAGE', 1)
+# TP/SL check cadence between bar closes (signals are evaluated once per closed bar)
+EXIT_CHECK_SECONDS = get_conf('EXIT_CHECK_SECONDS', float, 'EXIT_CHECK_SECONDS', POLL_SECONDS)
+# Spread of per-symbol wake-ups after a bar close
+BAR_JITTER_SECONDS = get_conf('BAR_JITTER_SECONDS', float, 'BAR_JITTER_SECONDS', 3.0)
+MAX_BAR_RETRIES = 3
+# Positions/tickers for all symbols are fetched at most once per this many seconds
+SNAPSHOT_MAX_AGE = get_conf('SNAPSHOT_MAX_AGE', float, 'SNAPSHOT_MAX_AGE', EXIT_CHECK_SECONDS / 2)
+# Bitget market list is cached on disk (data/markets_bitget.json) for this many seconds; 0 = always download
+MARKETS_CACHE_TTL = get_conf('MARKETS_CACHE_TTL', float, 'MARKETS_CACHE_TTL', 6 * 3600)
+# Bot state journal (SQLite, see state_journal.py) for warm restarts; empty = off
+STATE_DB = get_conf('STATE_DB', str, 'STATE_DB', os.path.join(DATA_DIR, 'state.db'))
+# Requests (in Bitget cost units) the shared client may send back to back before the rate limit spaces them
+REQUEST_BURST = get_conf('REQUEST_BURST', float, 'REQUEST_BURST', 5)
+# Exits: 'poll' = the bot market-closes when a check sees TP/SL crossed; 'exchange' = resting Bitget
+# TP/SL triggers on every entry, with the polled exit kept as a fallback EXIT_FALLBACK_SLACK past the level
+EXIT_MODE = get_conf('EXIT_MODE', str, 'EXIT_MODE', 'poll').lower()
+EXIT_FALLBACK_SLACK = get_conf('EXIT_FALLBACK_SLACK', float, 'EXIT_FALLBACK_SLACK', 0.002)
+# Stage latency metrics: Prometheus endpoint on 127.0.0.1:METRICS_PORT and/or a console summary (0 = off)
+METRICS_PORT = get_conf('METRICS_PORT', int, 'METRICS_PORT', 0)
+METRICS_SUMMARY_SECONDS = get_conf('METRICS_SUMMARY_SECONDS', float, 'METRICS_SUMMARY_SECONDS', 0)
+# Most notional one strategy may hold across its symbols (0 = no limit); see strategies.py
+RISK_BUDGET_USDT = get_conf('RISK_BUDGET_USDT', float, 'RISK_BUDGET_USDT', 0)
+# Named [strategy.<name>] sections each run their own EMA cross on their own SYMBOLS, inheriting
+# unset keys from [strategy]; without them the [strategy] values above are the one strategy
+STRATEGIES = load_strategies(config, {
+    'SYMBOLS': SYMBOLS_RAW, 'TIMEFRAME': TIMEFRAME, 'TIMEFRAMES': ','.join(TIMEFRAMES),
+    'FAST_EMA': FAST_EMA, 'SLOW_EMA': SLOW_EMA, 'TP_PCT': TP_PCT, 'SL_PCT': SL_PCT,
+    'POSITION_SIZE_USDT': POSITION_SIZE_USDT, 'RISK_BUDGET_USDT': RISK_BUDGET_USDT,
+})
 
 DEBUG = os.getenv('DEBUG', 'false').lower() == 'true' or '--debug' in sys.argv or 'debug=true' in [a.lower() for a in sys.argv]
+# Log output (see botlog.py): text or json lines, stdout or LOG_FILE, per-symbol levels like "SOL=debug,ETH=warning"
+LOG_FORMAT = get_conf('LOG_FORMAT', str, 'LOG_FORMAT', 'text')
+LOG_FILE = get_conf('LOG_FILE', str, 'LOG_FILE', None)
+LOG_LEVELS = get_conf('LOG_LEVELS', str, 'LOG_LEVELS', '')
+
+def setup_logging():
+    # Called by the runners' main(), never at import, so tools importing this module keep their own logger
+    botlog.configure('debug' if DEBUG else 'info', botlog.parse_symbol_levels(LOG_LEVELS), LOG_FORMAT, LOG_FILE)
+
 def dprint(*args, **kwargs):
-    if DEBUG:
-        print('[DEBUG]', *args, **kwargs)
+    # Callable args are only evaluated when debug output is on for this symbol
+    botlog.debug(*args, **kwargs)
 
-def make_exchange():
-    dprint('Creating Bitget exchange instance...')
+def exchange_params():
+    # ccxt constructor params for Bitget swaps, shared by the sync gateway and the async clients
     params = {
         'enableRateLimit': True,
         'options': {
@@ -58,63 +112,54 @@ def make_exchange():
     }
     if API_KEY and API_SECRET and API_PASSWORD:
         params.update({'apiKey': API_KEY, 'secret': API_SECRET, 'password': API_PASSWORD})
-    dprint('Exchange params:', params)
-    return ccxt.bitget(params)
+    return params
+
+def make_gateway(pool_size, rate_share=1.0):
+    # Single client shared by all symbol threads (one market load, one session, one rate limit)
+    dprint('Creating shared Bitget gateway...')
+    return ExchangeGateway(exchange_params(), pool_size=pool_size, burst=REQUEST_BURST, rate_share=rate_share)
 
 def round_amount(exchange: ccxt.bitget, market, amount: float) -> float:
-    precision = market.get('precision', {}).get('amount')
-    min_lot = market.get('limits', {}).get('amount', {}).get('min')
-    if precision is not None:
-        precision = int(precision)
-        q = Decimal(10) ** int(-precision)
-        amount = float((Decimal(amount) // q) * q)
-    if min_lot and amount < min_lot:
-        amount = min_lot
-    return max(0.0, amount)
+    # Floor to the lot step (precomputed integer step, see market_meta), lifted to the minimum lot
+    return market_spec(exchange, market).round_amount(amount)
 
 def get_market(exchange: ccxt.bitget, symbol: str):
     dprint('Loading markets...')
-    exchange.load_markets()
+    load_markets_cached(exchange, MARKETS_CACHE_TTL)
     market = exchange.market(symbol)
     dprint('Market info:', market)
     if not market.get('linear'):
         raise RuntimeError(f"Expected linear USDT perpetual for {symbol}")
     return market
 
-def fetch_ohlcv_df(exchange: ccxt.Exchange, symbol: str, timeframe: str, limit: int = 200) -> pd.DataFrame:
+def fetch_ohlcv_df(exchange: ccxt.Exchange, symbol: str, timeframe: str, limit: int = 200) -> 'pd.DataFrame':
+    # Analytics/debugging only; the trading loop works on CandleCache, so pandas is imported on demand
+    import pandas as pd
     dprint(f'Fetching OHLCV for {symbol} {timeframe}...')
     ohlcv = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
     df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
-    dprint('OHLCV head:', df.head())
+    dprint('OHLCV head:', df.head)
     return df
 
-def ema(series: pd.Series, length: int) -> pd.Series:
+def ema(series: 'pd.Series', length: int) -> 'pd.Series':
     return series.ewm(span=length, adjust=False).mean()
 
-def get_signal(df: pd.DataFrame) -> str:
-    if len(df) < max(FAST_EMA, SLOW_EMA) + 2:
+def get_signal(candles) -> str:
+    # candles: CandleCache, OHLCV rows or a DataFrame; the last entry is the still-forming candle
+    closes = candle_closes(candles)
+    if len(closes) < max(FAST_EMA, SLOW_EMA) + 2:
         dprint('Not enough data for signal')
         return 'none'
-    df = df.copy()
-    df['ema_fast'] = ema(df['close'], FAST_EMA)
-    df['ema_slow'] = ema(df['close'], SLOW_EMA)
-    f_prev, f_last = df['ema_fast'].iloc[-3], df['ema_fast'].iloc[-2]
-    s_prev, s_last = df['ema_slow'].iloc[-3], df['ema_slow'].iloc[-2]
-    dprint(f'EMAs: f_prev={f_prev}, f_last={f_last}, s_prev={s_prev}, s_last={s_last}')
-    if f_prev <= s_prev and f_last > s_last:
-        dprint('Signal: long')
-        return 'long'
-    if f_prev >= s_prev and f_last < s_last:
-        dprint('Signal: short')
-        return 'short'
-    dprint('Signal: none')
-    return 'none'
+    f_prev, f_last, s_prev, s_last = ema_cross(closes, FAST_EMA, SLOW_EMA)
+    dprint(lambda: f'EMAs: f_prev={f_prev}, f_last={f_last}, s_prev={s_prev}, s_last={s_last}')
+    signal = cross_signal(f_prev, f_last, s_prev, s_last)
+    dprint('Signal:', signal)
+    return signal
 
 def get_position(exchange: ccxt.Exchange, symbol: str):
     try:
         dprint('Fetching positions...')
-        exchange.load_markets()
         positions = exchange.fetch_positions([symbol])
         dprint('Positions:', positions)
         for p in positions:
@@ -124,7 +169,8 @@ def get_position(exchange: ccxt.Exchange, symbol: str):
         dprint('No active position')
         return None
     except Exception as e:
-        print(f"fetch_positions error: {e}")
+        botlog.warning(f"fetch_positions error: {e}", symbol=symbol, stage='position')
+        metrics.error('position', symbol, e)
         return None
 
 def side_from_position(pos):
@@ -145,130 +191,341 @@ def get_last_price(exchange: ccxt.Exchange, symbol: str) -> float:
     return float(ticker['last'])
 
 def usd_to_contracts(exchange: ccxt.Exchange, market, quote_usdt: float, price: float) -> float:
-    base_amount = quote_usdt / price
-    return round_amount(exchange, market, base_amount)
+    return market_spec(exchange, market).contracts_for(quote_usdt, price)
 
-def market_order(exchange: ccxt.Exchange, symbol: str, side: str, amount: float):
-    print(f"[TRADE] Placing market {side.upper()} {amount} {symbol}")
-    dprint('Order params:', {'symbol': symbol, 'side': side, 'amount': amount})
+def market_order(exchange: ccxt.Exchange, symbol: str, side: str, amount: float, params=None, client_id=None,
+                 ref_price=None, signal_time=None, on_fill=None, strategy=None, on_placed=None):
+    # Placed through the order pipeline: retried under client_id, fill confirmed in the background
+    botlog.info(f"[TRADE] Placing market {side.upper()} {amount} {symbol}", symbol=symbol, stage='order', client_id=client_id)
+    dprint('Order params:', lambda: {'symbol': symbol, 'side': side, 'amount': amount, 'client_id': client_id}, symbol=symbol, stage='order')
     try:
-        order = exchange.create_order(symbol, 'market', side, amount)
+        with metrics.timed('order', symbol):
+            order = get_pipeline(exchange).submit(symbol, side, amount, params, client_id, ref_price, signal_time, on_fill, strategy, on_placed)
+        metrics.inc('orders_total', symbol=symbol, side=side)
         order_id = order.get('id', 'N/A')
-        price = order.get('price', 'N/A')
-        status = order.get('status', 'N/A')
-        print(f"[TRADE] SUCCESS: {side.upper()} {amount} {symbol} | order_id: {order_id} | price: {price} | status: {status}")
-        dprint('Order result:', order)
+        # Market orders are acknowledged before they fill; the average price comes with the [FILL] line
+        average = order.get('average') or 'pending'
+        botlog.info(f"[TRADE] SUCCESS: {side.upper()} {amount} {symbol} | order_id: {order_id} | client_id: {client_id} | avg: {average}",
+                    symbol=symbol, stage='order', order_id=order_id, client_id=client_id, side=side, amount=amount)
+        dprint('Order result:', order, symbol=symbol, stage='order', order_id=order_id)
         return order
     except Exception as e:
-        print(f"[TRADE] ERROR placing {side.upper()} {amount} {symbol}: {e}")
+        botlog.error(f"[TRADE] ERROR placing {side.upper()} {amount} {symbol}: {e}", symbol=symbol, stage='order')
         raise
 
-def close_position(exchange: ccxt.Exchange, market, symbol: str, pos, price_now: float, tp_pct: float, sl_pct: float):
+def check_exit(pos, price_now: float, tp_pct: float, sl_pct: float):
+    # TP/SL rule shared by every runner: (side, contracts, pnl_pct, hit_tp, hit_sl), or None when not applicable
     side = side_from_position(pos)
     if side == 'flat':
-        return False
+        return None
     entry = float(pos.get('entryPrice') or 0) or float(pos.get('info', {}).get('avgPrice', 0) or 0)
     contracts = float(pos.get('contracts') or 0)
     if contracts <= 0 or entry <= 0:
-        return False
+        return None
     pnl_pct = (price_now - entry) / entry if side == 'long' else (entry - price_now) / entry
-    hit_tp = pnl_pct >= tp_pct
-    hit_sl = pnl_pct <= -sl_pct
+    return side, contracts, pnl_pct, pnl_pct >= tp_pct, pnl_pct <= -sl_pct
+
+def close_position(exchange: ccxt.Exchange, market, symbol: str, pos, price_now: float, tp_pct: float, sl_pct: float, params=None, strategy=None,
+                   client_id=None, on_fill=None):
+    # Returns the exit order when TP/SL fired and the close went through, else None
+    exit_check = check_exit(pos, price_now, tp_pct, sl_pct)
+    if exit_check is None:
+        return None
+    side, contracts, pnl_pct, hit_tp, hit_sl = exit_check
     if hit_tp or hit_sl:
         exit_side = 'sell' if side == 'long' else 'buy'
         amt = round_amount(exchange, market, contracts)
         try:
-            order = market_order(exchange, symbol, exit_side, amt)
-            print(f"[EXIT] {symbol} {side.upper()} position closed: TP={hit_tp} SL={hit_sl} pnl_pct={pnl_pct:.4f} | order_id: {order.get('id', 'N/A')}")
-            return True
+            order = market_order(exchange, symbol, exit_side, amt, params, client_id, price_now, on_fill=on_fill, strategy=strategy)
+            botlog.info(f"[EXIT] {symbol} {side.upper()} position closed: TP={hit_tp} SL={hit_sl} pnl_pct={pnl_pct:.4f} | order_id: {order.get('id', 'N/A')}",
+                        symbol=symbol, stage='exit', order_id=order.get('id'), strategy=strategy)
+            return order
         except Exception as e:
-            print(f"[EXIT] ERROR closing {symbol} {side.upper()} position: {e}")
-    return False
+            botlog.error(f"[EXIT] ERROR closing {symbol} {side.upper()} position: {e}", symbol=symbol, stage='exit')
+    return None
 
 def set_leverage(exchange, symbol, leverage):
     try:
         market = exchange.market(symbol)
         if hasattr(exchange, 'set_leverage'):
-            dprint(f"Setting leverage {leverage}x for {symbol}")
+            dprint(f"Setting leverage {leverage}x for {symbol}", symbol=symbol)
             exchange.set_leverage(leverage, symbol)
-            print(f"Leverage set to {leverage}x for {symbol}")
+            botlog.info(f"Leverage set to {leverage}x for {symbol}", symbol=symbol, stage='setup')
         else:
-            print("Exchange does not support set_leverage method via ccxt.")
+            botlog.warning("Exchange does not support set_leverage method via ccxt.", symbol=symbol, stage='setup')
     except Exception as e:
-        print(f"Failed to set leverage: {e}")
+        botlog.warning(f"Failed to set leverage: {e}", symbol=symbol, stage='setup')
 
 
+def make_timeframes(exchange, ccxt_symbol, timeframes=None):
+    # Candles for every timeframe from one BASE_TIMEFRAME feed, warm-started from the local store
+    size = max([200] + [s.slow + 50 for s in STRATEGIES])
+    candles = TimeframeSet(exchange, ccxt_symbol, timeframes or TIMEFRAMES, BASE_TIMEFRAME, size=size)
+    if WARM_START:
+        candles.warm_start(tail_rows(store_path(ccxt_symbol, candles.base_timeframe), candles.warm_rows))
+    return candles
+
 def symbol_to_ccxt(symbol):
     # Map e.g. SOL -> SOL/USDT:USDT
     return f"{symbol}/USDT:USDT"
 
-def run_strategy_for_symbol(symbol):
+def slot_label(prefix: str, slot, tf: str, book) -> str:
+    # "Thread SOL", plus the strategy name / timeframe when there is more than one
+    label = f'{prefix} {slot.strategy.name}' if book.multi else prefix
+    return f'{label} {tf}' if len(slot.strategy.timeframes) > 1 else label
+
+def evaluate_slot(slot, pairs, advanced, prefix: str, book) -> str:
+    # Status line per timeframe with a new closed bar; the first of the strategy's timeframes
+    # (in TIMEFRAMES order) with a cross becomes slot.signal. It stays pending until the entry path
+    # takes it (book.take_signal), so a cycle that fails after this point acts on it at the retry.
+    strategy = slot.strategy
+    if slot.signal_tf in advanced:
+        # A newer bar on that timeframe supersedes a cross that is still pending
+        slot.signal = 'none'
+    for tf in strategy.timeframes:
+        if tf not in advanced:
+            continue
+        pair = pairs[(strategy.name, tf)]
+        label = slot_label(prefix, slot, tf, book)
+        if pair.ready:
+            if slot.last_signal_time is not None:
+                mins_ago = (time.time() - slot.last_signal_time) / 60
+                botlog.info(f"[{label}] data pooled | EMA diff = {pair.ema_diff:.5f} | last signal: {slot.last_signal_type} {mins_ago:.1f} min ago", symbol=slot.symbol)
+            else:
+                botlog.info(f"[{label}] data pooled | EMA diff = {pair.ema_diff:.5f} | last signal: NOTYET", symbol=slot.symbol)
+        else:
+            botlog.info(f"[{label}] data pooled | Not enough data for EMA diff yet | last signal: NOTYET", symbol=slot.symbol)
+        tf_signal = pair.signal()
+        dprint(lambda: f'[{label}] Signal: {tf_signal}', symbol=slot.symbol)
+        if tf_signal in ('long', 'short') and slot.signal == 'none':
+            # A cross on a bar that already signalled was acted on before a restart
+            bar_close = pair.bank.last_ts + ccxt.Exchange.parse_timeframe(tf) * 1000
+            if slot.last_signal_bar is not None and bar_close <= slot.last_signal_bar:
+                continue
+            slot.signal = tf_signal
+            slot.signal_bar = bar_close
+            slot.signal_tf = tf
+            slot.last_signal_time = time.time()
+            slot.last_signal_type = f'{tf_signal} {tf}' if len(strategy.timeframes) > 1 else tf_signal
+            slot.signal_at = time.perf_counter()
+    return slot.signal
+
+def ema_pairs(slots, banks):
+    # (strategy name, timeframe) -> EmaPair view on the symbol's shared EmaBank for that timeframe
+    return {(slot.strategy.name, tf): banks[tf].pair(slot.strategy.fast, slot.strategy.slow)
+            for slot in slots for tf in slot.strategy.timeframes}
+
+def sync_positions(book, symbol: str, slots, pos, side: str, exchange, market, warned, positions_ok=True):
+    # Sole strategy: it owns the exchange position. Several: they trade their own slots; if the
+    # exchange went flat (closed while the bot was down) the slots are closed, any other net that
+    # does not add up (manual trade) is reported once per distinct value.
+    # positions_ok False (fetch_positions failed): pos None is not "flat", so nothing is reconciled.
+    if not positions_ok:
+        return warned
+    if len(slots) == 1:
+        slot = slots[0]
+        before = (slot.side, slot.contracts)
+        slot.adopt(pos, side)
+        if (slot.side, slot.contracts) != before:
+            book.record(slot, 'reconcile', previous=before)
+        return None
+    mismatch = net_mismatch(book, symbol, pos, side, market_spec(exchange, market).amount_step)
+    if mismatch is not None and side == 'flat':
+        for slot in slots:
+            if slot.side != 'flat':
+                botlog.warning(f"[{symbol}] {slot.strategy.name}: {slot.side} {slot.contracts} closed on the exchange; clearing the slot",
+                               symbol=symbol, stage='position', strategy=slot.strategy.name)
+                previous = (slot.side, slot.contracts)
+                slot.close()
+                book.record(slot, 'reconcile', previous=previous)
+        return None
+    if mismatch is not None and mismatch != warned:
+        botlog.warning(f"[{symbol}] Strategy positions net to {mismatch[0]} contracts but the exchange position is {mismatch[1]}; "
+                       f"the difference is not managed by any strategy", symbol=symbol, stage='position')
+    return mismatch
+
+# (symbol, timeframe) -> stored last_ts already reported as followed by a hole
+_store_gaps = {}
+
+def persist_candles(journal, ccxt_symbol: str, cache) -> int:
+    # Closed base bars go to the local candle store, so the next start warm-starts and fetches only the delta
+    if journal is None or len(cache) < 2:
+        return 0
+    rows = cache.ring.rows()[:-1]
+    path = store_path(ccxt_symbol, cache.timeframe)
+    last_ts = last_stored_ts(path)
+    if last_ts is not None and rows[0][0] > last_ts + cache.tf_ms:
+        # The buffer no longer reaches back to the stored tail (downtime longer than the window);
+        # appending would leave a silent hole, so wait for history.py to fill it
+        if _store_gaps.get((ccxt_symbol, cache.timeframe)) != last_ts:
+            _store_gaps[(ccxt_symbol, cache.timeframe)] = last_ts
+            base = ccxt_symbol.split('/')[0]
+            botlog.warning(f"Candle store {base} {cache.timeframe} ends at {last_ts}, buffer starts at {int(rows[0][0])}; "
+                           f"not persisting until the gap is filled: python src/history.py --symbols {base} --timeframe {cache.timeframe}",
+                           symbol=ccxt_symbol, stage='candles')
+        return 0
+    written = append_rows(path, rows)
+    if written:
+        journal.set_candle_ts(ccxt_symbol, cache.timeframe, rows[-1][0])
+    return written
+
+def open_journal():
+    if not STATE_DB:
+        return None
+    from state_journal import StateJournal
+    return StateJournal(STATE_DB)
+
+def run_strategy_for_symbol(symbol, exchange, snapshot, book, heartbeat=None):
+    # heartbeat: called once per loop pass so a supervisor can spot a stalled thread
     ccxt_symbol = symbol_to_ccxt(symbol)
-    print(f"[Thread {symbol}] Starting bot with leverage control...")
-    dprint(f'[Thread {symbol}] Debug mode enabled')
-    exchange = make_exchange()
-    dprint(f'[Thread {symbol}] Exchange created')
-    exchange.set_sandbox_mode(False)
-    dprint(f'[Thread {symbol}] Sandbox mode set to False')
+    botlog.info(f"[Thread {symbol}] Starting bot with leverage control...", symbol=symbol)
+    dprint(f'[Thread {symbol}] Debug mode enabled', symbol=symbol)
     market = get_market(exchange, ccxt_symbol)
-    dprint(f'[Thread {symbol}] Market loaded')
+    dprint(f'[Thread {symbol}] Market loaded', symbol=symbol)
     set_leverage(exchange, ccxt_symbol, LEVERAGE)
-    print(f"[Thread {symbol}] Running EMA cross bot on {ccxt_symbol} {TIMEFRAME} | fast={FAST_EMA} slow={SLOW_EMA} | leverage={LEVERAGE}x")
-    last_signal_time = None
-    last_signal_type = None
+    slots = book.for_symbol(symbol)
+    timeframes = book.timeframes(symbol)
+    for slot in slots:
+        strategy = slot.strategy
+        name = f' [{strategy.name}]' if book.multi else ''
+        botlog.info(f"[Thread {symbol}] Running EMA cross bot{name} on {ccxt_symbol} {','.join(strategy.timeframes)} | fast={strategy.fast} slow={strategy.slow} | leverage={LEVERAGE}x", symbol=symbol)
+    # One candle feed and one EMA bank per timeframe, shared by every strategy on the symbol;
+    # one full backfill, then only bars since the last cached candle
+    candles = make_timeframes(exchange, ccxt_symbol, timeframes)
+    if len(candles):
+        botlog.info(f"[Thread {symbol}] Warm start: {len(candles)} bars from local store", symbol=symbol)
+    banks = {tf: EmaBank() for tf in timeframes}
+    pairs = ema_pairs(slots, banks)
+    # Signal work right after each bar closes (jittered per symbol), TP/SL every EXIT_CHECK_SECONDS
+    sched = CandleScheduler(candles.base_timeframe, EXIT_CHECK_SECONDS, jitter=BAR_JITTER_SECONDS, key=symbol)
+    # Exchange exit mode: resting TP/SL triggers, reconciled whenever the position changes.
+    # Position TP/SL covers the whole net position, so it needs the symbol to have one strategy.
+    guard = None
+    if EXIT_MODE == 'exchange':
+        if len(slots) == 1:
+            guard = TpslGuard(exchange, ccxt_symbol, EXIT_FALLBACK_SLACK)
+        else:
+            botlog.warning(f"[Thread {symbol}] EXIT_MODE=exchange needs a single strategy per symbol; using polled exits", symbol=symbol, stage='setup')
+    bar_retries = 0
+    warned = None
     while True:
+        if heartbeat is not None:
+            heartbeat()
+        event = sched.wait()
         try:
-            dprint(f'[Thread {symbol}] Top of main loop')
-            df = fetch_ohlcv_df(exchange, ccxt_symbol, TIMEFRAME, limit=max(200, SLOW_EMA + 50))
-            if len(df) >= max(FAST_EMA, SLOW_EMA) + 2:
-                ema_fast = df['close'].ewm(span=FAST_EMA, adjust=False).mean().iloc[-2]
-                ema_slow = df['close'].ewm(span=SLOW_EMA, adjust=False).mean().iloc[-2]
-                ema_diff = ema_fast - ema_slow
-                if last_signal_time is not None:
-                    mins_ago = (time.time() - last_signal_time) / 60
-                    print(f"[Thread {symbol}] data pooled | EMA diff = {ema_diff:.5f} | last signal: {last_signal_type} {mins_ago:.1f} min ago")
+            dprint(lambda: f'[Thread {symbol}] Top of main loop ({event})', symbol=symbol)
+            if event == 'bar':
+                with metrics.timed('fetch_ohlcv', ccxt_symbol):
+                    closed = candles.refresh()
+                dprint(lambda: f'[Thread {symbol}] Candle cache: bars closed on {closed}, last ts {candles.base.last_ts}', symbol=symbol)
+                if candles.base_timeframe not in closed and bar_retries < MAX_BAR_RETRIES:
+                    bar_retries += 1
+                    sched.retry_bar()
+                    continue
+                bar_retries = 0
+                if not closed:
+                    event = 'exit'
                 else:
-                    print(f"[Thread {symbol}] data pooled | EMA diff = {ema_diff:.5f} | last signal: NOTYET")
-            else:
-                print(f"[Thread {symbol}] data pooled | Not enough data for EMA diff yet | last signal: NOTYET")
-            signal = get_signal(df)
-            if signal in ("long", "short"):
-                last_signal_time = time.time()
-                last_signal_type = signal
-            pos = get_position(exchange, ccxt_symbol)
+                    persist_candles(book.journal, ccxt_symbol, candles.base)
+            if event == 'bar':
+                advanced = []
+                for tf in timeframes:
+                    with metrics.timed('signal', ccxt_symbol):
+                        added = banks[tf].sync(candles[tf].timestamps, candles[tf].closes)
+                    dprint(lambda: f'[Thread {symbol}] EMA bank {tf}: {added} new closed candles', symbol=symbol)
+                    if added:
+                        advanced.append(tf)
+                for slot in slots:
+                    evaluate_slot(slot, pairs, advanced, f'Thread {symbol}', book)
+            with metrics.timed('position', ccxt_symbol):
+                pos, positions_ok = snapshot.position_state(ccxt_symbol)
             side = side_from_position(pos)
-            price = get_last_price(exchange, ccxt_symbol)
-            dprint(f'[Thread {symbol}] signal={signal}, side={side}, price={price}')
-            closed = close_position(exchange, market, ccxt_symbol, pos, price, TP_PCT, SL_PCT)
-            if closed:
-                dprint(f'[Thread {symbol}] Position closed for TP/SL')
-                time.sleep(POLL_SECONDS)
-                continue
-            if side == 'flat' and signal in ('long', 'short'):
-                amount = usd_to_contracts(exchange, market, POSITION_SIZE_USDT, price)
-                dprint(f'[Thread {symbol}] Calculated amount: {amount}')
-                if amount <= 0:
-                    print(f"[Thread {symbol}] Amount rounded to 0; increase POSITION_SIZE_USDT")
-                else:
+            with metrics.timed('last_price', ccxt_symbol):
+                price = snapshot.last_price(ccxt_symbol)
+            warned = sync_positions(book, symbol, slots, pos, side, exchange, market, warned, positions_ok)
+            dprint(lambda: f'[Thread {symbol}] signals={[slot.signal for slot in slots]}, side={side}, price={price}', symbol=symbol)
+            for slot in slots:
+                strategy = slot.strategy
+                exit_tp, exit_sl, exit_params = strategy.tp_pct, strategy.sl_pct, None
+                if guard is not None:
+                    # An unknown position must not look flat: that would cancel live TP/SL orders
+                    if positions_ok:
+                        with metrics.timed('tpsl', ccxt_symbol):
+                            guard.reconcile(pos, side, strategy.tp_pct, strategy.sl_pct)
+                    exit_tp, exit_sl = guard.fallback_thresholds(strategy.tp_pct, strategy.sl_pct)
+                    exit_params = {'reduceOnly': True}
+                exit_id = exit_client_id(slot, ccxt_symbol, pos)
+                exit_order = close_position(exchange, market, ccxt_symbol, slot.position(), price, exit_tp, exit_sl, exit_params, strategy.name,
+                                            exit_id, lambda fill, slot=slot: book.fill(slot, fill))
+                # The pending cross is settled from here: entered below, or ruled out by a position or this exit
+                signal = book.take_signal(slot)
+                if exit_order is not None:
+                    dprint(f'[Thread {symbol}] Position closed for TP/SL', symbol=symbol)
+                    slot.close()
+                    book.record(slot, 'exit', exit_order.get('id'), price=price, average=exit_order.get('average'))
+                    snapshot.invalidate()
+                    continue
+                if slot.side == 'flat' and signal in ('long', 'short'):
+                    amount = usd_to_contracts(exchange, market, strategy.size_usdt, price)
+                    dprint(lambda: f'[Thread {symbol}] Calculated amount: {amount}', symbol=symbol)
+                    if amount <= 0:
+                        botlog.info(f"[Thread {symbol}] Amount rounded to 0; increase POSITION_SIZE_USDT", symbol=symbol)
+                        continue
+                    if not book.reserve(slot, amount * price):
+                        botlog.info(f"[ENTRY] {ccxt_symbol} {signal} skipped: strategy {strategy.name} is at RISK_BUDGET_USDT={strategy.budget_usdt}",
+                                    symbol=symbol, stage='entry', strategy=strategy.name)
+                        continue
                     order_side = 'buy' if signal == 'long' else 'sell'
                     try:
-                        order = market_order(exchange, ccxt_symbol, order_side, amount)
-                        print(f"[ENTRY] {ccxt_symbol} {order_side.upper()} {amount} contracts at ~{price} | order_id: {order.get('id', 'N/A')}")
+                        params = entry_params(signal, price, strategy.tp_pct, strategy.sl_pct) if guard is not None else None
+                        # One id per signal bar, so a retry or a restart can never double the entry
+                        entry_id = client_order_id(strategy.name, ccxt_symbol, 'entry', slot.last_signal_bar, signal)
+                        # The slot takes the order id before its fill can be confirmed
+                        order = market_order(exchange, ccxt_symbol, order_side, amount, params, entry_id, price, slot.last_signal_time,
+                                             lambda fill, slot=slot: book.fill(slot, fill), strategy.name,
+                                             lambda order, slot=slot: book.open(slot, signal, amount, float(order.get('average') or price), order.get('id')))
+                        metrics.observe('signal_to_order', ccxt_symbol, time.perf_counter() - slot.signal_at)
+                        book.record(slot, 'entry', order.get('id'), price=price, average=order.get('average'), filled=order.get('filled'))
+                        snapshot.invalidate()
+                        botlog.info(f"[ENTRY] {ccxt_symbol} {order_side.upper()} {amount} contracts at ~{price} | order_id: {order.get('id', 'N/A')}",
+                                    symbol=symbol, stage='entry', order_id=order.get('id'), strategy=strategy.name)
                     except Exception as e:
-                        print(f"[ENTRY] ERROR placing entry order for {ccxt_symbol}: {e}")
+                        botlog.error(f"[ENTRY] ERROR placing entry order for {ccxt_symbol}: {e}", symbol=symbol, stage='entry')
+                    finally:
+                        book.settle(slot)
         except ccxt.NetworkError as e:
-            print(f"[Thread {symbol}] Network error: {e}")
+            botlog.warning(f"[Thread {symbol}] Network error: {e}", symbol=symbol, stage=event)
+            if event == 'bar':
+                sched.retry_bar()
         except ccxt.ExchangeError as e:
-            print(f"[Thread {symbol}] Exchange error: {e}")
+            botlog.warning(f"[Thread {symbol}] Exchange error: {e}", symbol=symbol, stage=event)
+            if event == 'bar':
+                sched.retry_bar()
         except Exception as e:
-            print(f"[Thread {symbol}] Unhandled error: {e}")
-        time.sleep(POLL_SECONDS)
+            botlog.error(f"[Thread {symbol}] Unhandled error: {e}", symbol=symbol, stage=event)
 
 def main():
-    print(f"Starting multi-symbol bot for: {', '.join(SYMBOLS)}")
+    setup_logging()
+    book = StrategyBook(STRATEGIES, journal=open_journal())
+    symbols = book.symbols
+    botlog.info(f"Starting multi-symbol bot for: {', '.join(symbols)}")
+    if book.multi:
+        for strategy in STRATEGIES:
+            botlog.info(f"Strategy {strategy}")
+    if book.journal is not None:
+        botlog.info(f"State journal {STATE_DB}: restored {book.restore()} strategy slots")
+    if METRICS_PORT or METRICS_SUMMARY_SECONDS:
+        metrics.start(METRICS_PORT, METRICS_SUMMARY_SECONDS)
+    exchange = make_gateway(pool_size=len(symbols))
+    exchange.set_sandbox_mode(False)
+    dprint('Sandbox mode set to False')
+    load_markets_cached(exchange, MARKETS_CACHE_TTL)
+    botlog.info(f"Markets loaded once for {len(symbols)} symbol threads")
+    # One fetch_positions + one fetch_tickers per cycle for every symbol
+    snapshot = AccountSnapshot(exchange, [symbol_to_ccxt(s) for s in symbols], max_age=SNAPSHOT_MAX_AGE)
     threads = []
-    for symbol in SYMBOLS:
-        t = threading.Thread(target=run_strategy_for_symbol, args=(symbol,), daemon=True)
+    for symbol in symbols:
+        t = threading.Thread(target=run_strategy_for_symbol, args=(symbol, exchange, snapshot, book), daemon=True)
         t.start()
         threads.append(t)
     # Keep main thread alive
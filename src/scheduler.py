@@ -0,0 +1,50 @@
+import time
+import random
+from ccxt import Exchange
+
+# Seconds after a bar boundary before the closed bar is requested (exchange publish lag)
+BAR_CLOSE_DELAY = 1.5
+# If the closed bar is not there yet (or the fetch failed), ask again this much later
+BAR_RETRY_SECONDS = 2.0
+
+
+class CandleScheduler:
+    # Wakes a symbol loop just after each TIMEFRAME bar closes ('bar' events, signal work)
+    # and every exit_seconds in between ('exit' events, TP/SL only).
+    # Each key gets a fixed jitter so many symbols do not hit the API in the same instant.
+    def __init__(self, timeframe: str, exit_seconds: float, jitter: float = 3.0, key: str = '',
+                 delay: float = BAR_CLOSE_DELAY, clock=time.time, sleep=time.sleep):
+        self.tf_seconds = Exchange.parse_timeframe(timeframe)
+        self.exit_seconds = exit_seconds
+        self.offset = delay + random.Random(key).uniform(0, jitter)
+        self.clock = clock
+        self.sleep = sleep
+        now = clock()
+        # Evaluate the signal once right away so the candle window is seeded at startup
+        self.next_bar = now
+        self.next_exit = now + exit_seconds
+
+    def bar_after(self, now: float) -> float:
+        base = now - self.offset
+        return (base // self.tf_seconds + 1) * self.tf_seconds + self.offset
+
+    def next_event(self):
+        if self.next_bar <= self.next_exit:
+            return self.next_bar, 'bar'
+        return self.next_exit, 'exit'
+
+    def wait(self) -> str:
+        # Sleep until the next event and return its kind
+        at, kind = self.next_event()
+        delay = at - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+        now = self.clock()
+        if kind == 'bar':
+            self.next_bar = self.bar_after(now)
+        # A bar cycle also checks TP/SL, so either event restarts the exit timer
+        self.next_exit = now + self.exit_seconds
+        return kind
+
+    def retry_bar(self, seconds: float = BAR_RETRY_SECONDS):
+        self.next_bar = min(self.next_bar, self.clock() + seconds)
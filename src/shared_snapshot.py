@@ -0,0 +1,178 @@
+import time
+import threading
+from multiprocessing.sharedctypes import RawArray
+import numpy as np
+import ccxt
+import botlog
+from account_snapshot import AccountSnapshot
+from order_pipeline import position_opened
+
+# Positions and tickers for every symbol, fetched once by the supervisor and read by all worker
+# processes from shared memory (see supervisor.py). One row of float64 per symbol; a sequence
+# counter (odd while the publisher writes) lets readers retry instead of taking a lock.
+
+FIELDS = ('last', 'bid', 'ask', 'side', 'contracts', 'entry', 'opened', 'has_ticker')
+COL = {name: i for i, name in enumerate(FIELDS)}
+# header: seq, fetched_at, positions_ok, refreshes
+SEQ, FETCHED_AT, POSITIONS_OK, REFRESHES = range(4)
+SIDES = {'long': 1.0, 'short': -1.0}
+
+
+def _value(v) -> float:
+    return float(v) if v is not None else np.nan
+
+
+class SharedMarketData:
+    # The shared buffers; passed to worker processes when they are started
+    def __init__(self, symbols, workers: int):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.header_raw = RawArray('d', 4)
+        self.table_raw = RawArray('d', len(self.symbols) * len(FIELDS))
+        # Per worker: time of its last invalidate(), so the publisher refreshes early
+        self.requests_raw = RawArray('d', workers)
+        # Per symbol: time of the symbol loop's last pass
+        self.beats_raw = RawArray('d', len(self.symbols))
+        self._views()
+
+    def _views(self):
+        self.header = np.frombuffer(self.header_raw, dtype=np.float64)
+        self.table = np.frombuffer(self.table_raw, dtype=np.float64).reshape(len(self.symbols), len(FIELDS))
+        self.requests = np.frombuffer(self.requests_raw, dtype=np.float64)
+        self.beats = np.frombuffer(self.beats_raw, dtype=np.float64)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for name in ('header', 'table', 'requests', 'beats'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._views()
+
+    def write(self, snapshot: AccountSnapshot, fetched_at: float):
+        # Single writer (the supervisor's publisher thread). fetched_at is when the refresh started,
+        # so a refresh already in flight when a worker invalidates does not count as fresh.
+        rows = np.full((len(self.symbols), len(FIELDS)), np.nan)
+        rows[:, COL['side']] = 0.0
+        rows[:, COL['contracts']] = 0.0
+        rows[:, COL['has_ticker']] = 0.0
+        for symbol, i in self.index.items():
+            ticker = snapshot.tickers.get(symbol)
+            if ticker is not None:
+                rows[i, COL['last']] = _value(ticker.get('last'))
+                rows[i, COL['bid']] = _value(ticker.get('bid'))
+                rows[i, COL['ask']] = _value(ticker.get('ask'))
+                rows[i, COL['has_ticker']] = 1.0
+            pos = snapshot.positions.get(symbol)
+            if pos is not None:
+                contracts = float(pos.get('contracts') or 0)
+                side = pos.get('side') or ('long' if contracts > 0 else 'short')
+                rows[i, COL['side']] = SIDES.get(side, 0.0)
+                rows[i, COL['contracts']] = abs(contracts)
+                rows[i, COL['entry']] = float(pos.get('entryPrice') or 0) or float(pos.get('info', {}).get('avgPrice', 0) or 0)
+                rows[i, COL['opened']] = _value(position_opened(pos))
+        header = self.header
+        header[SEQ] += 1
+        self.table[:] = rows
+        header[FETCHED_AT] = fetched_at
+        header[POSITIONS_OK] = 1.0 if snapshot.positions_ok else 0.0
+        header[REFRESHES] += 1
+        header[SEQ] += 1
+
+    def read(self, symbol: str):
+        # (fetched_at, positions_ok, row) from one consistent publish
+        i = self.index[symbol]
+        while True:
+            seq = self.header[SEQ]
+            if seq % 2 == 0:
+                row = self.table[i].copy()
+                fetched_at = self.header[FETCHED_AT]
+                positions_ok = bool(self.header[POSITIONS_OK] == 1.0)
+                if self.header[SEQ] == seq:
+                    return fetched_at, positions_ok, row
+            time.sleep(0.0001)
+
+
+class SnapshotPublisher:
+    # Supervisor side: refreshes the account snapshot every max_age seconds, or sooner when a
+    # worker has invalidated it after an order, and publishes it to shared memory
+    def __init__(self, exchange, data: SharedMarketData, max_age: float):
+        self.snapshot = AccountSnapshot(exchange, data.symbols, max_age)
+        self.data = data
+        self.max_age = max_age
+        self.errors = 0
+        self.started = 0.0
+
+    def due(self) -> bool:
+        return time.time() - self.started >= self.max_age or float(self.data.requests.max(initial=0.0)) >= self.started
+
+    def run(self, stop: threading.Event, tick: float = 0.05):
+        while not stop.is_set():
+            if self.due():
+                started = time.time()
+                try:
+                    self.snapshot.refresh()
+                    self.data.write(self.snapshot, started)
+                    self.started = started
+                    self.errors = 0
+                except Exception as e:
+                    self.errors += 1
+                    botlog.warning(f"[SNAPSHOT] refresh failed: {e}", stage='snapshot')
+                    stop.wait(min(30.0, tick * 2 ** self.errors))
+                    continue
+            stop.wait(tick)
+
+
+class SharedSnapshot:
+    # Worker side, with the AccountSnapshot reader interface (position, ticker, last_price, invalidate)
+    def __init__(self, data: SharedMarketData, worker: int, wait_timeout: float = 10.0):
+        self.data = data
+        self.worker = worker
+        self.wait_timeout = wait_timeout
+        # Nothing is published before the supervisor's first refresh, so reads wait for that too
+        self.invalid_since = 1e-9
+
+    def invalidate(self):
+        # Ask the publisher for a refresh; reads block until one newer than now arrives
+        now = time.time()
+        self.invalid_since = now
+        self.data.requests[self.worker] = now
+
+    def _row(self, symbol: str):
+        fetched_at, positions_ok, row = self.data.read(symbol)
+        if fetched_at < self.invalid_since:
+            deadline = time.monotonic() + self.wait_timeout
+            while fetched_at < self.invalid_since and time.monotonic() < deadline:
+                time.sleep(0.01)
+                fetched_at, positions_ok, row = self.data.read(symbol)
+            if fetched_at == 0.0:
+                raise ccxt.NetworkError('No account snapshot published yet')
+            if fetched_at < self.invalid_since:
+                botlog.warning(f"[SNAPSHOT] no refresh within {self.wait_timeout}s of an order; using the previous snapshot",
+                               symbol=symbol, stage='snapshot')
+        return fetched_at, positions_ok, row
+
+    def position_state(self, symbol: str):
+        # (position, positions_ok) from the same publish; see AccountSnapshot.position_state
+        fetched_at, positions_ok, row = self._row(symbol)
+        side = row[COL['side']]
+        if side == 0.0:
+            return None, positions_ok
+        opened = row[COL['opened']]
+        return {'symbol': symbol, 'side': 'long' if side > 0 else 'short', 'contracts': float(row[COL['contracts']]),
+                'entryPrice': float(row[COL['entry']]), 'timestamp': None if np.isnan(opened) else int(opened), 'info': {}}, positions_ok
+
+    def position(self, symbol: str):
+        return self.position_state(symbol)[0]
+
+    def ticker(self, symbol: str):
+        fetched_at, positions_ok, row = self._row(symbol)
+        if fetched_at == 0.0 or row[COL['has_ticker']] == 0.0:
+            raise KeyError(f"No ticker for {symbol} in snapshot")
+        return {'symbol': symbol, 'last': float(row[COL['last']]), 'bid': float(row[COL['bid']]), 'ask': float(row[COL['ask']]),
+                'timestamp': int(fetched_at * 1000)}
+
+    def last_price(self, symbol: str) -> float:
+        return float(self.ticker(symbol)['last'])
@@ -0,0 +1,106 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Crash-safe bot state in one SQLite file (WAL mode), so a restart resumes instead of starting cold:
+#   events  append-only log: signals, orders, fills, entries, exits, reconciliations
+#   slots   latest state of every (strategy, symbol) slot: position share, entry order, signal history
+#   candles last closed bar persisted per symbol/timeframe (the bars themselves go to candle_store)
+# Each event and the slot state it changes are written in one transaction. WAL with synchronous=NORMAL
+# never corrupts the file on a crash; a power loss can drop only the last few commits.
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, symbol TEXT NOT NULL,
+        strategy TEXT NOT NULL, kind TEXT NOT NULL, data TEXT NOT NULL)''',
+    'CREATE INDEX IF NOT EXISTS events_symbol ON events (symbol, seq)',
+    '''CREATE TABLE IF NOT EXISTS slots (
+        strategy TEXT NOT NULL, symbol TEXT NOT NULL, side TEXT NOT NULL, contracts REAL NOT NULL,
+        entry REAL NOT NULL, order_id TEXT, last_signal_time REAL, last_signal_type TEXT, last_signal_bar INTEGER,
+        updated REAL NOT NULL,
+        PRIMARY KEY (strategy, symbol))''',
+    '''CREATE TABLE IF NOT EXISTS candles (
+        symbol TEXT NOT NULL, timeframe TEXT NOT NULL, last_ts INTEGER NOT NULL, updated REAL NOT NULL,
+        PRIMARY KEY (symbol, timeframe))''',
+)
+
+
+class StateJournal:
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        # One connection shared by the symbol threads, serialized by the lock
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.lock = threading.Lock()
+        with self.lock:
+            for statement in SCHEMA:
+                self.db.execute(statement)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _event(self, symbol: str, strategy: str, kind: str, data):
+        self.db.execute('INSERT INTO events (ts, symbol, strategy, kind, data) VALUES (?, ?, ?, ?, ?)',
+                        (time.time(), symbol, strategy, kind, json.dumps(data, default=str)))
+
+    def record(self, symbol: str, kind: str, strategy: str = '', **data):
+        with self.lock:
+            self._event(symbol, strategy, kind, data)
+
+    def save_slot(self, slot, kind: str, order_id=None, **data):
+        # Event plus the slot's new state, atomically; order_id is kept until the slot changes side
+        with self.lock:
+            self.db.execute('BEGIN')
+            try:
+                if kind:
+                    self._event(slot.symbol, slot.strategy.name, kind, dict(data, order_id=order_id, side=slot.side,
+                                                                            contracts=slot.contracts, entry=slot.entry))
+                self.db.execute(
+                    '''INSERT INTO slots (strategy, symbol, side, contracts, entry, order_id, last_signal_time, last_signal_type,
+                                         last_signal_bar, updated)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (strategy, symbol) DO UPDATE SET side = excluded.side, contracts = excluded.contracts,
+                           entry = excluded.entry, order_id = COALESCE(excluded.order_id, CASE WHEN excluded.side = 'flat' THEN NULL ELSE slots.order_id END),
+                           last_signal_time = excluded.last_signal_time, last_signal_type = excluded.last_signal_type,
+                           last_signal_bar = excluded.last_signal_bar, updated = excluded.updated''',
+                    (slot.strategy.name, slot.symbol, slot.side, slot.contracts, slot.entry, order_id,
+                     slot.last_signal_time, slot.last_signal_type, slot.last_signal_bar, time.time()))
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+
+    def slots(self):
+        # (strategy, symbol) -> saved state
+        with self.lock:
+            rows = self.db.execute('SELECT strategy, symbol, side, contracts, entry, order_id, last_signal_time, last_signal_type, '
+                                   'last_signal_bar FROM slots').fetchall()
+        return {(r[0], r[1]): {'side': r[2], 'contracts': r[3], 'entry': r[4], 'order_id': r[5],
+                               'last_signal_time': r[6], 'last_signal_type': r[7], 'last_signal_bar': r[8]} for r in rows}
+
+    def set_candle_ts(self, symbol: str, timeframe: str, last_ts: int):
+        with self.lock:
+            self.db.execute('''INSERT INTO candles (symbol, timeframe, last_ts, updated) VALUES (?, ?, ?, ?)
+                               ON CONFLICT (symbol, timeframe) DO UPDATE SET last_ts = excluded.last_ts, updated = excluded.updated''',
+                            (symbol, timeframe, int(last_ts), time.time()))
+
+    def candle_ts(self, symbol: str, timeframe: str):
+        with self.lock:
+            row = self.db.execute('SELECT last_ts FROM candles WHERE symbol = ? AND timeframe = ?', (symbol, timeframe)).fetchone()
+        return row[0] if row else None
+
+    def events(self, symbol: str = None, limit: int = 100):
+        # Newest last: (ts, symbol, strategy, kind, data)
+        with self.lock:
+            if symbol is None:
+                rows = self.db.execute('SELECT ts, symbol, strategy, kind, data FROM events ORDER BY seq DESC LIMIT ?', (limit,)).fetchall()
+            else:
+                rows = self.db.execute('SELECT ts, symbol, strategy, kind, data FROM events WHERE symbol = ? ORDER BY seq DESC LIMIT ?',
+                                       (symbol, limit)).fetchall()
+        return [(ts, sym, strategy, kind, json.loads(data)) for ts, sym, strategy, kind, data in reversed(rows)]
@@ -0,0 +1,250 @@
+import math
+import threading
+
+# Several EMA-cross strategies in one bot. Named sections in bot.conf:
+#
+#   [strategy]            defaults for every strategy (and the only strategy when no named ones exist)
+#   [strategy.fast]       SYMBOLS = SOL,ETH / FAST_EMA = 9 / SLOW_EMA = 21 / TP_PCT = 0.006 ...
+#   [strategy.slow]       FAST_EMA = 50 / SLOW_EMA = 200 / TIMEFRAMES = 15m / RISK_BUDGET_USDT = 300
+#
+# Strategies on the same symbol share its candle feed (TimeframeSet) and one EmaBank per timeframe,
+# so an ensemble costs about the API requests of a single strategy. Each strategy keeps its own
+# signal history and position slot. Bitget one-way mode nets all of them into one exchange position:
+# with one strategy on a symbol the slot simply mirrors the exchange position (as before); with
+# several, each slot tracks its own contracts and entry and trades only its own share.
+
+STRATEGY_KEYS = {
+    'SYMBOLS': str,
+    'TIMEFRAME': str,
+    'TIMEFRAMES': str,
+    'FAST_EMA': int,
+    'SLOW_EMA': int,
+    'TP_PCT': float,
+    'SL_PCT': float,
+    'POSITION_SIZE_USDT': float,
+    # Most notional (entry price x contracts) the strategy may hold across all its symbols; 0 = no limit
+    'RISK_BUDGET_USDT': float,
+}
+
+
+def split_list(text: str, upper: bool = False):
+    items = [s.strip() for s in (text or '').split(',') if s.strip()]
+    return [s.upper() for s in items] if upper else items
+
+
+class Strategy:
+    __slots__ = ('name', 'symbols', 'timeframes', 'fast', 'slow', 'tp_pct', 'sl_pct', 'size_usdt', 'budget_usdt')
+
+    def __init__(self, name: str, symbols, timeframes, fast: int, slow: int, tp_pct: float, sl_pct: float,
+                 size_usdt: float, budget_usdt: float = 0.0):
+        self.name = name
+        self.symbols = list(symbols)
+        self.timeframes = list(timeframes)
+        self.fast = fast
+        self.slow = slow
+        self.tp_pct = tp_pct
+        self.sl_pct = sl_pct
+        self.size_usdt = size_usdt
+        self.budget_usdt = budget_usdt
+
+    @classmethod
+    def from_values(cls, name: str, values):
+        return cls(name, split_list(values['SYMBOLS'], upper=True), split_list(values['TIMEFRAMES']),
+                   values['FAST_EMA'], values['SLOW_EMA'], values['TP_PCT'], values['SL_PCT'],
+                   values['POSITION_SIZE_USDT'], values.get('RISK_BUDGET_USDT') or 0.0)
+
+    def __repr__(self):
+        return (f"{self.name}: {','.join(self.symbols)} {','.join(self.timeframes)} fast={self.fast} slow={self.slow} "
+                f"tp={self.tp_pct} sl={self.sl_pct} size={self.size_usdt}")
+
+
+def load_strategies(config, defaults):
+    # defaults: the resolved [strategy] values (bot.conf > env > default) keyed like STRATEGY_KEYS
+    sections = [name for name in config.sections() if name.startswith('strategy.')]
+    if not sections:
+        return [Strategy.from_values('default', defaults)]
+    strategies = []
+    for name in sections:
+        section = config[name]
+        values = dict(defaults)
+        for key, typ in STRATEGY_KEYS.items():
+            if key in section:
+                values[key] = typ(section[key])
+        # A section that only names TIMEFRAME runs on that timeframe alone
+        if 'TIMEFRAME' in section and 'TIMEFRAMES' not in section:
+            values['TIMEFRAMES'] = values['TIMEFRAME']
+        strategies.append(Strategy.from_values(name.split('.', 1)[1], values))
+    return strategies
+
+
+class StrategySlot:
+    # One strategy on one symbol: its signal history and its share of the symbol's position
+    __slots__ = ('strategy', 'symbol', 'side', 'contracts', 'entry', 'order_id', 'signal', 'signal_bar', 'signal_tf',
+                 'last_signal_time', 'last_signal_type', 'last_signal_bar', 'signal_at')
+
+    def __init__(self, strategy: Strategy, symbol: str):
+        self.strategy = strategy
+        self.symbol = symbol
+        self.side = 'flat'
+        self.contracts = 0.0
+        self.entry = 0.0
+        # Exchange id of the order that opened the slot's position
+        self.order_id = None
+        # Cross waiting for the entry path (kept across retries), with its bar close time and timeframe
+        self.signal = 'none'
+        self.signal_bar = None
+        self.signal_tf = None
+        self.last_signal_time = None
+        self.last_signal_type = None
+        # Close time (ms) of the bar whose signal was last acted on or ruled out
+        self.last_signal_bar = None
+        # perf_counter() when the last long/short signal was seen (signal-to-order latency)
+        self.signal_at = None
+
+    @property
+    def notional(self) -> float:
+        return self.contracts * self.entry
+
+    def position(self):
+        # ccxt-shaped position for check_exit / close_position, or None when flat
+        if self.side == 'flat':
+            return None
+        return {'symbol': self.symbol, 'side': self.side, 'contracts': self.contracts, 'entryPrice': self.entry, 'info': {}}
+
+    def adopt(self, pos, side: str):
+        # Sole strategy on the symbol: the exchange position is its position
+        if side == 'flat' or not pos:
+            self.close()
+            return
+        self.side = side
+        self.contracts = float(pos.get('contracts') or 0)
+        self.entry = float(pos.get('entryPrice') or 0) or float(pos.get('info', {}).get('avgPrice', 0) or 0)
+
+    def open(self, side: str, contracts: float, entry: float, order_id=None):
+        self.side = side
+        self.contracts = contracts
+        self.entry = entry
+        self.order_id = order_id
+
+    def close(self):
+        self.side = 'flat'
+        self.contracts = 0.0
+        self.entry = 0.0
+        self.order_id = None
+
+
+class StrategyBook:
+    # Every (strategy, symbol) slot. Symbol loops run in parallel, so budget checks take a lock.
+    # symbols, when given, replaces each strategy's own list (replays run every strategy on them).
+    # journal (state_journal.StateJournal), when set, persists every slot change for restarts.
+    def __init__(self, strategies, symbols=None, journal=None):
+        self.strategies = list(strategies)
+        self.slots = {}
+        for strategy in self.strategies:
+            for symbol in (symbols or strategy.symbols):
+                self.slots[(strategy.name, symbol)] = StrategySlot(strategy, symbol)
+        self.lock = threading.Lock()
+        self.reserved = {}
+        self.journal = journal
+
+    def restore(self) -> int:
+        # Slots and signal history saved by the last run; returns how many slots were restored
+        if self.journal is None:
+            return 0
+        restored = 0
+        for key, saved in self.journal.slots().items():
+            slot = self.slots.get(key)
+            if slot is None:
+                continue
+            slot.last_signal_time = saved['last_signal_time']
+            slot.last_signal_type = saved['last_signal_type']
+            slot.last_signal_bar = saved['last_signal_bar']
+            if saved['side'] != 'flat':
+                slot.open(saved['side'], saved['contracts'], saved['entry'], saved['order_id'])
+            restored += 1
+        return restored
+
+    def open(self, slot: StrategySlot, side: str, contracts: float, entry: float, order_id=None):
+        # Called from the order pipeline before the fill confirmation starts (see fill)
+        with self.lock:
+            slot.open(side, contracts, entry, order_id)
+
+    def record(self, slot: StrategySlot, kind: str, order_id=None, **data):
+        if self.journal is not None:
+            self.journal.save_slot(slot, kind, order_id, **data)
+
+    def take_signal(self, slot: StrategySlot) -> str:
+        # The pending cross, now settled by the entry path (entered or ruled out); its bar never signals again
+        signal = slot.signal
+        if signal in ('long', 'short'):
+            slot.last_signal_bar = slot.signal_bar
+            self.record(slot, 'signal', timeframe=slot.signal_tf)
+        slot.signal = 'none'
+        return signal
+
+    def fill(self, slot: StrategySlot, fill):
+        # Confirmed fill (order_pipeline.Fill) of an order placed for slot; called off the symbol loop.
+        # An entry that is still open takes the real average price in place of the decision price.
+        data = {'client_id': fill.client_id, 'order_side': fill.side, 'filled': fill.filled, 'average': fill.average,
+                'ref_price': fill.ref_price, 'slippage_bps': fill.slippage_bps, 'signal_to_fill': fill.signal_to_fill}
+        with self.lock:
+            entry_fill = bool(fill.average) and slot.side != 'flat' and slot.order_id == fill.order_id
+            if entry_fill:
+                slot.entry = fill.average
+        if entry_fill:
+            self.record(slot, 'fill', fill.order_id, **data)
+        elif self.journal is not None:
+            self.journal.record(slot.symbol, 'fill', slot.strategy.name, order_id=fill.order_id, **data)
+
+    @property
+    def symbols(self):
+        # Union in declaration order
+        return list(dict.fromkeys(symbol for _, symbol in self.slots))
+
+    @property
+    def multi(self) -> bool:
+        return len(self.strategies) > 1
+
+    def for_symbol(self, symbol: str):
+        return [slot for (name, sym), slot in self.slots.items() if sym == symbol]
+
+    def timeframes(self, symbol: str):
+        return list(dict.fromkeys(tf for slot in self.for_symbol(symbol) for tf in slot.strategy.timeframes))
+
+    def open_notional(self, strategy: Strategy) -> float:
+        return sum(slot.notional for (name, _), slot in self.slots.items() if name == strategy.name)
+
+    def reserve(self, slot: StrategySlot, notional: float) -> bool:
+        # Claim budget for an entry (released by settle); False when it would exceed RISK_BUDGET_USDT
+        budget = slot.strategy.budget_usdt
+        with self.lock:
+            if budget > 0:
+                name = slot.strategy.name
+                pending = sum(v for (n, _), v in self.reserved.items() if n == name)
+                if self.open_notional(slot.strategy) + pending + notional > budget + 1e-9:
+                    return False
+            self.reserved[(slot.strategy.name, slot.symbol)] = notional
+            return True
+
+    def settle(self, slot: StrategySlot):
+        with self.lock:
+            self.reserved.pop((slot.strategy.name, slot.symbol), None)
+
+    def net_contracts(self, symbol: str) -> float:
+        # Signed sum of the slots (long positive), i.e. what the exchange position should be
+        return sum(slot.contracts if slot.side == 'long' else -slot.contracts
+                   for slot in self.for_symbol(symbol) if slot.side != 'flat')
+
+
+def signed_contracts(pos, side: str) -> float:
+    contracts = float((pos or {}).get('contracts') or 0)
+    return -contracts if side == 'short' else (0.0 if side == 'flat' else contracts)
+
+
+def net_mismatch(book: StrategyBook, symbol: str, pos, side: str, step: float):
+    # (book net, exchange net) when they differ by more than half a lot step, else None.
+    # After a restart or a manual trade the strategies do not own the exchange position.
+    book_net, exchange_net = book.net_contracts(symbol), signed_contracts(pos, side)
+    if math.fabs(book_net - exchange_net) > (step or 0) / 2 + 1e-9:
+        return book_net, exchange_net
+    return None
@@ -0,0 +1,202 @@
+import argparse
+import multiprocessing as mp
+import os
+import signal
+import sys
+import threading
+import time
+import botlog
+import metrics
+from shared_snapshot import SharedMarketData, SharedSnapshot, SnapshotPublisher
+from strategies import Strategy, StrategyBook
+from run_strat1 import (
+    STRATEGIES, SNAPSHOT_MAX_AGE, EXIT_CHECK_SECONDS, MARKETS_CACHE_TTL, METRICS_PORT, METRICS_SUMMARY_SECONDS,
+    get_conf, dprint, setup_logging, make_gateway, load_markets_cached, symbol_to_ccxt, run_strategy_for_symbol, open_journal,
+)
+
+# Multi-process run_strat1: symbols are sharded across WORKERS processes, each running the usual
+# symbol threads with its own exchange client, candles and EMA state. The supervisor fetches
+# positions and tickers once for everyone and publishes them through shared memory
+# (shared_snapshot.py), and restarts any worker that exits or whose symbol loops stop beating.
+#   python src/supervisor.py [--workers 4]
+
+# Worker processes; 0 = one per CPU core (never more than there are symbols)
+WORKERS = get_conf('WORKERS', int, 'WORKERS', 0)
+# A symbol loop passes at least every EXIT_CHECK_SECONDS; one silent this long marks its worker as stalled
+WORKER_STALL_SECONDS = get_conf('WORKER_STALL_SECONDS', float, 'WORKER_STALL_SECONDS', max(120.0, 4 * EXIT_CHECK_SECONDS))
+# Startup allowance (markets, leverage, candle backfill) before heartbeats are checked
+WORKER_START_SECONDS = 120.0
+# A worker that stayed up this long has its restart backoff reset
+WORKER_STABLE_SECONDS = 600.0
+
+
+def shard(symbols, workers: int):
+    # Round robin keeps each shard's share of the list (and of every strategy) even
+    return [symbols[i::workers] for i in range(workers)]
+
+
+def shard_strategies(strategies, symbols):
+    # Each strategy restricted to the shard's symbols. RISK_BUDGET_USDT is split in proportion to
+    # the strategy's symbols in the shard, so the workers together never exceed it.
+    shard_set = set(symbols)
+    result = []
+    for s in strategies:
+        mine = [sym for sym in s.symbols if sym in shard_set]
+        if not mine:
+            continue
+        budget = s.budget_usdt * len(mine) / len(s.symbols) if s.budget_usdt else 0.0
+        result.append(Strategy(s.name, mine, s.timeframes, s.fast, s.slow, s.tp_pct, s.sl_pct, s.size_usdt, budget))
+    return result
+
+
+def worker_main(index: int, workers: int, symbols, data: SharedMarketData):
+    # Runs in the child process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    setup_logging()
+    if METRICS_PORT or METRICS_SUMMARY_SECONDS:
+        metrics.start(METRICS_PORT + 1 + index if METRICS_PORT else 0, METRICS_SUMMARY_SECONDS)
+    book = StrategyBook(shard_strategies(STRATEGIES, symbols), journal=open_journal())
+    restored = book.restore()
+    botlog.info(f"[Worker {index}] pid {os.getpid()}: {', '.join(symbols)} | restored {restored} strategy slots")
+    # The supervisor publishes positions/tickers and gets a share of the rate limit too
+    exchange = make_gateway(pool_size=len(symbols), rate_share=1.0 / (workers + 1))
+    exchange.set_sandbox_mode(False)
+    load_markets_cached(exchange, MARKETS_CACHE_TTL)
+    snapshot = SharedSnapshot(data, index)
+    threads = {}
+    for symbol in symbols:
+        slot = data.index[symbol_to_ccxt(symbol)]
+
+        def beat(slot=slot):
+            data.beats[slot] = time.time()
+
+        t = threading.Thread(target=run_strategy_for_symbol, args=(symbol, exchange, snapshot, book, beat),
+                             name=f'symbol-{symbol}', daemon=True)
+        t.start()
+        threads[symbol] = t
+    # A symbol thread that died takes the worker down, so the supervisor restarts it
+    while True:
+        time.sleep(1.0)
+        dead = [s for s, t in threads.items() if not t.is_alive()]
+        if dead:
+            botlog.error(f"[Worker {index}] symbol threads exited: {', '.join(dead)}")
+            botlog.flush()
+            sys.exit(1)
+
+
+class WorkerHandle:
+    __slots__ = ('index', 'symbols', 'slots', 'process', 'started', 'restarts', 'restart_at')
+
+    def __init__(self, index: int, symbols, slots):
+        self.index = index
+        self.symbols = symbols
+        # Rows of this worker's symbols in the shared heartbeat array
+        self.slots = slots
+        self.process = None
+        self.started = 0.0
+        self.restarts = 0
+        self.restart_at = 0.0
+
+
+class Supervisor:
+    def __init__(self, symbols, workers: int, ctx=None):
+        self.symbols = list(symbols)
+        self.workers = workers
+        self.ctx = ctx or mp.get_context('spawn')
+        self.data = SharedMarketData([symbol_to_ccxt(s) for s in self.symbols], workers)
+        self.handles = []
+        for i, part in enumerate(shard(self.symbols, workers)):
+            self.handles.append(WorkerHandle(i, part, [self.data.index[symbol_to_ccxt(s)] for s in part]))
+        self.stop = threading.Event()
+
+    def start_worker(self, h: WorkerHandle):
+        now = time.time()
+        self.data.beats[h.slots] = now
+        h.process = self.ctx.Process(target=worker_main, args=(h.index, self.workers, h.symbols, self.data),
+                                     name=f'worker-{h.index}', daemon=True)
+        h.process.start()
+        h.started = now
+        botlog.info(f"[SUPERVISOR] worker {h.index} started (pid {h.process.pid}): {', '.join(h.symbols)}")
+
+    def stalled(self, h: WorkerHandle, now: float):
+        # Symbols whose loop has not passed for WORKER_STALL_SECONDS, after the startup allowance
+        if now - h.started < WORKER_START_SECONDS:
+            return []
+        return [h.symbols[k] for k, slot in enumerate(h.slots) if now - self.data.beats[slot] > WORKER_STALL_SECONDS]
+
+    def check(self, h: WorkerHandle, now: float):
+        if h.process is None:
+            if now >= h.restart_at:
+                self.start_worker(h)
+            return
+        reason = None
+        if not h.process.is_alive():
+            reason = f"exited with code {h.process.exitcode}"
+        else:
+            stalled = self.stalled(h, now)
+            if stalled:
+                reason = f"stalled ({', '.join(stalled)} silent for over {WORKER_STALL_SECONDS:.0f}s)"
+                h.process.kill()
+                h.process.join(5)
+        if reason is None:
+            return
+        metrics.inc('worker_restarts_total', worker=h.index)
+        # Back off on repeated failures; a worker that ran for a while starts over
+        h.restarts = 1 if now - h.started > WORKER_STABLE_SECONDS else h.restarts + 1
+        delay = min(60.0, 2.0 ** (h.restarts - 1))
+        botlog.warning(f"[SUPERVISOR] worker {h.index} {reason}; restarting in {delay:.0f}s")
+        h.process = None
+        h.restart_at = now + delay
+
+    def run(self, exchange, tick: float = 1.0):
+        publisher = SnapshotPublisher(exchange, self.data, SNAPSHOT_MAX_AGE)
+        threading.Thread(target=publisher.run, args=(self.stop,), name='snapshot-publisher', daemon=True).start()
+        for h in self.handles:
+            self.start_worker(h)
+        try:
+            while not self.stop.is_set():
+                now = time.time()
+                for h in self.handles:
+                    self.check(h, now)
+                if metrics.ENABLED:
+                    metrics.gauge('workers_alive', sum(1 for h in self.handles if h.process is not None and h.process.is_alive()))
+                self.stop.wait(tick)
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.stop.set()
+        for h in self.handles:
+            if h.process is not None and h.process.is_alive():
+                h.process.terminate()
+        for h in self.handles:
+            if h.process is not None:
+                h.process.join(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the multi-symbol bot as a supervisor over worker processes')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='worker processes (0 = CPU cores)')
+    args = parser.parse_args()
+    setup_logging()
+    symbols = StrategyBook(STRATEGIES).symbols
+    workers = min(len(symbols), args.workers or os.cpu_count() or 1)
+    botlog.info(f"[SUPERVISOR] {len(symbols)} symbols on {workers} worker processes")
+    if METRICS_PORT or METRICS_SUMMARY_SECONDS:
+        metrics.start(METRICS_PORT, METRICS_SUMMARY_SECONDS)
+    exchange = make_gateway(pool_size=2, rate_share=1.0 / (workers + 1))
+    exchange.set_sandbox_mode(False)
+    # Loaded (and cached on disk) once here, so the workers start from the cache
+    load_markets_cached(exchange, MARKETS_CACHE_TTL)
+    dprint('Markets loaded for workers')
+    supervisor = Supervisor(symbols, workers)
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.stop.set())
+    try:
+        supervisor.run(exchange)
+    except KeyboardInterrupt:
+        pass
+    botlog.info('[SUPERVISOR] Stopped.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import configparser
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import backtest as bt
+from candle_store import store_path, open_columns
+from run_strat1 import SYMBOLS, TIMEFRAME, FAST_EMA, SLOW_EMA, TP_PCT, SL_PCT, LEVERAGE, POSITION_SIZE_USDT, conf_path
+
+PARAMS = ('fast', 'slow', 'tp', 'sl', 'leverage')
+
+# Per-process cache of memory-mapped columns, so a worker maps each file once
+_maps = {}
+
+
+def _mapped(key, opener):
+    arr = _maps.get(key)
+    if arr is None:
+        arr = _maps[key] = opener()
+    return arr
+
+
+def ema_file(ema_dir: str, symbol: str, span: int) -> str:
+    return os.path.join(ema_dir, f"{symbol}_{span}.f64")
+
+
+def map_ema(path: str):
+    return _mapped(path, lambda: np.asarray(np.memmap(path, dtype='<f8', mode='r')))
+
+
+def ema_task(symbol: str, path: str, span: int, ema_dir: str):
+    # One EMA per (symbol, span), written once and then mapped by every combination using it
+    closes = _mapped(path, lambda: open_columns(path))['close']
+    bt.ema_array(closes, span).astype('<f8').tofile(ema_file(ema_dir, symbol, span))
+    return symbol, span
+
+
+def pair_task(symbol: str, path: str, fast: int, slow: int, exits, ema_dir: str, size: float, fee: float, same_bar: str):
+    # Signals for one (fast, slow) pair are built once and reused for every (tp, sl, leverage) in exits
+    ohlcv = _mapped(path, lambda: open_columns(path))
+    ema_fast = map_ema(ema_file(ema_dir, symbol, fast))
+    ema_slow = map_ema(ema_file(ema_dir, symbol, slow))
+    sig = bt.cross_signals_from_emas(ema_fast, ema_slow, max(fast, slow))
+    results = []
+    trades_by_exit = {}
+    for tp, sl, leverage in exits:
+        trades = trades_by_exit.get((tp, sl))
+        if trades is None:
+            trades = trades_by_exit[(tp, sl)] = bt.run_backtest(ohlcv, fast, slow, tp, sl, size, fee, same_bar, signals=sig)
+        row = {'symbol': symbol, 'fast': fast, 'slow': slow, 'tp': tp, 'sl': sl, 'leverage': leverage}
+        row.update(bt.summarize(trades, leverage))
+        results.append(row)
+    return results
+
+
+def parse_values(text: str, typ):
+    # "8,13,21" or an inclusive range "start:stop:step"
+    if ':' in text:
+        start, stop, step = (typ(x) for x in text.split(':'))
+        values = []
+        v = start
+        while v <= stop + (step * 1e-9 if typ is float else 0):
+            values.append(round(v, 10) if typ is float else v)
+            v += step
+        return values
+    return [typ(x) for x in text.split(',') if x.strip()]
+
+
+def valid(combo) -> bool:
+    return combo[0] < combo[1]
+
+
+def propose(space, history, n: int, rng: random.Random, seen, gamma: float = 0.25):
+    # Tree-structured Parzen style proposal over the discrete grid: per-dimension value frequencies
+    # among the best gamma fraction vs the rest, candidates ranked by the good/bad likelihood ratio.
+    ranked = sorted(history, key=lambda h: h[1], reverse=True)
+    k = max(1, int(len(ranked) * gamma))
+    good, bad = [h[0] for h in ranked[:k]], [h[0] for h in ranked[k:]]
+
+    def density(points, d):
+        counts = {v: 1.0 for v in space[d]}
+        for p in points:
+            counts[p[d]] += 1.0
+        total = sum(counts.values())
+        return {v: c / total for v, c in counts.items()}
+
+    good_d = [density(good, d) for d in range(len(space))]
+    bad_d = [density(bad, d) for d in range(len(space))]
+    candidates = set()
+    for _ in range(n * 50):
+        combo = tuple(rng.choices(space[d], weights=[good_d[d][v] for v in space[d]])[0] for d in range(len(space)))
+        if valid(combo) and combo not in seen:
+            candidates.add(combo)
+
+    def ratio(combo):
+        r = 1.0
+        for d, v in enumerate(combo):
+            r *= good_d[d][v] / bad_d[d][v]
+        return r
+
+    return sorted(candidates, key=ratio, reverse=True)[:n]
+
+
+class Sweep:
+    def __init__(self, symbols, timeframe, pool, ema_dir, size, fee, same_bar, root=None):
+        self.paths = {}
+        for s in symbols:
+            path = store_path(s, timeframe, root)
+            if len(open_columns(path)['close']) == 0:
+                print(f"[SKIP] {s}: no candles in {path}")
+                continue
+            self.paths[s] = path
+        self.pool = pool
+        self.ema_dir = ema_dir
+        self.size = size
+        self.fee = fee
+        self.same_bar = same_bar
+        self.spans_done = set()
+        self.results = []
+
+    def ensure_emas(self, spans):
+        todo = [(s, span) for s in self.paths for span in spans if (s, span) not in self.spans_done]
+        futures = [self.pool.submit(ema_task, s, self.paths[s], span, self.ema_dir) for s, span in todo]
+        for f in futures:
+            self.spans_done.add(f.result())
+
+    def evaluate(self, combos):
+        # combos: (fast, slow, tp, sl, leverage) tuples; grouped so each EMA pair is handled by one task
+        combos = [c for c in combos if valid(c)]
+        self.ensure_emas({c[0] for c in combos} | {c[1] for c in combos})
+        by_pair = {}
+        for fast, slow, tp, sl, leverage in combos:
+            by_pair.setdefault((fast, slow), []).append((tp, sl, leverage))
+        futures = [self.pool.submit(pair_task, s, path, fast, slow, exits, self.ema_dir, self.size, self.fee, self.same_bar)
+                   for s, path in self.paths.items() for (fast, slow), exits in by_pair.items()]
+        batch = []
+        for f in futures:
+            batch.extend(f.result())
+        self.results.extend(batch)
+        return batch
+
+
+def combo_scores(results, metric: str, n_symbols: int):
+    # Sum of the metric across symbols, only for combinations evaluated on every symbol
+    totals, counts = {}, {}
+    for r in results:
+        key = tuple(r[p] for p in PARAMS)
+        totals[key] = totals.get(key, 0.0) + r[metric]
+        counts[key] = counts.get(key, 0) + 1
+    return {k: v for k, v in totals.items() if counts[k] == n_symbols}
+
+
+def write_conf(path: str, best, symbols, timeframe: str):
+    # Existing [strategy] keys are kept; the tuned ones and the timeframe they were tuned on are overwritten
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    if os.path.exists(conf_path):
+        config.read(conf_path)
+    if 'strategy' not in config:
+        config['strategy'] = {}
+    section = config['strategy']
+    section['SYMBOLS'] = ','.join(symbols)
+    section['TIMEFRAME'] = timeframe
+    if 'TIMEFRAMES' in section:
+        # TIMEFRAMES wins over TIMEFRAME in the bot, so it must not keep other timeframes
+        section['TIMEFRAMES'] = timeframe
+    section['FAST_EMA'] = str(best[0])
+    section['SLOW_EMA'] = str(best[1])
+    section['TP_PCT'] = str(best[2])
+    section['SL_PCT'] = str(best[3])
+    section['LEVERAGE'] = str(best[4])
+    with open(path, 'w') as f:
+        config.write(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parameter sweep of the EMA cross strategy over stored candles')
+    parser.add_argument('--symbols', default=','.join(SYMBOLS))
+    parser.add_argument('--timeframe', default=TIMEFRAME)
+    parser.add_argument('--fast', default=str(FAST_EMA), help='values "8,13,21" or range "5:30:1"')
+    parser.add_argument('--slow', default=str(SLOW_EMA))
+    parser.add_argument('--tp', default=str(TP_PCT))
+    parser.add_argument('--sl', default=str(SL_PCT))
+    parser.add_argument('--leverage', default=str(LEVERAGE))
+    parser.add_argument('--mode', choices=('grid', 'random', 'bayes'), default='grid')
+    parser.add_argument('--samples', type=int, default=200, help='evaluations for random/bayes')
+    parser.add_argument('--batch', type=int, default=32, help='proposals per bayes round')
+    parser.add_argument('--metric', default='pnl_usdt', help='summary field to rank by')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--size', type=float, default=POSITION_SIZE_USDT)
+    parser.add_argument('--fee', type=float, default=bt.TAKER_FEE)
+    parser.add_argument('--same-bar', choices=('sl', 'tp'), default='sl')
+    parser.add_argument('--top', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write every result to this CSV')
+    parser.add_argument('--write-conf', help='write the best overall parameters as a bot.conf [strategy] section to this file')
+    args = parser.parse_args()
+
+    space = [parse_values(args.fast, int), parse_values(args.slow, int), parse_values(args.tp, float),
+             parse_values(args.sl, float), parse_values(args.leverage, int)]
+    grid = [c for c in itertools.product(*space) if valid(c)]
+    symbols = [s.strip().upper() for s in args.symbols.split(',') if s.strip()]
+    rng = random.Random(args.seed)
+    ema_dir = tempfile.mkdtemp(prefix='sweep_ema_')
+    started = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            sweep = Sweep(symbols, args.timeframe, pool, ema_dir, args.size, args.fee, args.same_bar)
+            if not sweep.paths:
+                print('No candle data; import or download history first (see candle_store.py)')
+                return
+            if args.mode == 'grid' or len(grid) <= args.samples:
+                sweep.evaluate(grid)
+            elif args.mode == 'random':
+                sweep.evaluate(rng.sample(grid, args.samples))
+            else:
+                seen = set(rng.sample(grid, min(args.batch, args.samples)))
+                sweep.evaluate(seen)
+                while len(seen) < args.samples:
+                    scores = combo_scores(sweep.results, args.metric, len(sweep.paths))
+                    proposals = propose(space, list(scores.items()), min(args.batch, args.samples - len(seen)), rng, seen)
+                    if not proposals:
+                        break
+                    seen.update(proposals)
+                    sweep.evaluate(proposals)
+    finally:
+        shutil.rmtree(ema_dir, ignore_errors=True)
+
+    results = sweep.results
+    print(f"Evaluated {len(results)} symbol/parameter runs in {time.time() - started:.1f}s ({args.mode})")
+    for s in sweep.paths:
+        ranked = sorted((r for r in results if r['symbol'] == s), key=lambda r: r[args.metric], reverse=True)
+        print(f"[{s}] top {args.top} by {args.metric}:")
+        for r in ranked[:args.top]:
+            print(f"  fast={r['fast']} slow={r['slow']} tp={r['tp']} sl={r['sl']} lev={r['leverage']} | "
+                  f"{args.metric}={r[args.metric]:.4f} trades={r['trades']} win_rate={r['win_rate']:.3f} dd={r['max_drawdown_usdt']:.2f}")
+    if args.out and results:
+        keys = list(results[0].keys())
+        with open(args.out, 'w') as f:
+            f.write(','.join(keys) + '\n')
+            for r in results:
+                f.write(','.join(str(r[k]) for k in keys) + '\n')
+        print(f"Wrote {len(results)} rows to {args.out}")
+    scores = combo_scores(results, args.metric, len(sweep.paths))
+    if scores:
+        best = max(scores, key=scores.get)
+        print(f"Best overall: {dict(zip(PARAMS, best))} | {args.metric} summed over {len(sweep.paths)} symbols = {scores[best]:.4f}")
+        if args.write_conf:
+            write_conf(args.write_conf, best, list(sweep.paths), args.timeframe)
+            print(f"Wrote [strategy] section to {args.write_conf}")
+
+
+if __name__ == '__main__':
+    main()
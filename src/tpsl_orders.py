@@ -0,0 +1,171 @@
+import ccxt
+import botlog
+
+# Exchange-side TP/SL (EXIT_MODE = exchange): every entry carries Bitget preset take-profit /
+# stop-loss triggers, so the exit fires at the exchange's matching latency instead of on the
+# next poll. TpslGuard reconciles the resting triggers whenever the position changes (entry
+# filled, partially closed, opened by hand, triggers cancelled) and widens the polled exit
+# thresholds so the bot's own market exit is only a fallback for triggers that did not fire.
+
+# Bitget plan types for position take-profit / stop-loss (preset on entry, or placed separately)
+TP_PLAN_TYPES = ('profit_plan', 'pos_profit')
+SL_PLAN_TYPES = ('loss_plan', 'pos_loss')
+
+# position_key before the first reconcile (or after invalidate): never equal to a real key or to
+# None (flat), so that reconcile always lists the triggers, e.g. leftovers from a previous run
+_UNSET = object()
+
+
+def tpsl_prices(side: str, entry: float, tp_pct: float, sl_pct: float):
+    # Same levels check_exit uses: pnl_pct >= tp_pct / <= -sl_pct
+    if side == 'long':
+        return entry * (1 + tp_pct), entry * (1 - sl_pct)
+    return entry * (1 - tp_pct), entry * (1 + sl_pct)
+
+
+def entry_params(signal: str, price: float, tp_pct: float, sl_pct: float):
+    # Preset TP/SL attached to the entry order itself (one request, active as soon as it fills)
+    tp, sl = tpsl_prices(signal, price, tp_pct, sl_pct)
+    return {'takeProfit': {'triggerPrice': tp}, 'stopLoss': {'triggerPrice': sl}}
+
+
+def plan_type(order) -> str:
+    return (order.get('info') or {}).get('planType') or ''
+
+
+class TpslGuard:
+    def __init__(self, exchange, symbol: str, fallback_slack: float):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.fallback_slack = fallback_slack
+        # (side, contracts, entry) the triggers were last reconciled against, None when flat
+        self.position_key = _UNSET
+        self.orders = []
+
+    @property
+    def active(self) -> bool:
+        return self.position_key not in (None, _UNSET) and len(self.orders) > 0
+
+    def invalidate(self):
+        self.position_key = _UNSET
+
+    def fetch_orders(self):
+        return self.exchange.fetch_open_orders(self.symbol, params={'planType': 'profit_loss'})
+
+    def place(self, side: str, contracts: float, tp: float, sl: float, have_tp: bool, have_sl: bool):
+        # Position TP/SL (pos_profit / pos_loss) covers the whole position, reduce-only by construction.
+        # One-way mode: holdSide is buy for a long position, sell for a short one.
+        order_side = 'buy' if side == 'long' else 'sell'
+        placed = []
+        if not have_tp:
+            placed.append(self.exchange.create_order(self.symbol, 'market', order_side, contracts, None,
+                                                     {'takeProfitPrice': tp, 'holdSide': order_side}))
+        if not have_sl:
+            placed.append(self.exchange.create_order(self.symbol, 'market', order_side, contracts, None,
+                                                     {'stopLossPrice': sl, 'holdSide': order_side}))
+        return placed
+
+    def cancel(self, orders):
+        for o in orders:
+            try:
+                self.exchange.cancel_order(o['id'], self.symbol, {'stop': True, 'planType': plan_type(o)})
+            except ccxt.OrderNotFound:
+                pass
+
+    def _position_key(self, pos, side: str):
+        if side == 'flat':
+            return None
+        entry = float(pos.get('entryPrice') or 0) or float(pos.get('info', {}).get('avgPrice', 0) or 0)
+        contracts = float(pos.get('contracts') or 0)
+        if entry <= 0 or contracts <= 0:
+            return None
+        return side, contracts, entry
+
+    def _missing(self, key, orders, tp_pct: float, sl_pct: float):
+        # place() arguments for whichever of TP / SL has no resting trigger, or None
+        side, contracts, entry = key
+        have_tp = any(plan_type(o) in TP_PLAN_TYPES for o in orders)
+        have_sl = any(plan_type(o) in SL_PLAN_TYPES for o in orders)
+        if have_tp and have_sl:
+            return None
+        tp, sl = tpsl_prices(side, entry, tp_pct, sl_pct)
+        return side, contracts, tp, sl, have_tp, have_sl
+
+    def _log_placed(self, key, missing, placed):
+        side, contracts, entry = key
+        tp, sl = missing[2], missing[3]
+        botlog.info(f"[TPSL] {self.symbol} {side.upper()} {contracts} @ {entry}: placed {len(placed)} trigger(s) TP={tp:.6g} SL={sl:.6g}",
+                    symbol=self.symbol, stage='tpsl', order_ids=[o.get('id') for o in placed])
+
+    def reconcile(self, pos, side: str, tp_pct: float, sl_pct: float):
+        # REST calls only when the position differs from the one last reconciled
+        key = self._position_key(pos, side)
+        if key == self.position_key and (key is None or self.orders):
+            return
+        orders = self.fetch_orders()
+        if key is None:
+            if orders:
+                botlog.info(f"[TPSL] {self.symbol} flat: cancelling {len(orders)} leftover trigger orders", symbol=self.symbol, stage='tpsl')
+                self.cancel(orders)
+            self.orders = []
+            self.position_key = None
+            return
+        missing = self._missing(key, orders, tp_pct, sl_pct)
+        if missing is not None:
+            # Listing can lag the placement; trust the responses rather than refetching
+            placed = self.place(*missing)
+            self._log_placed(key, missing, placed)
+            orders = orders + placed
+        self.orders = orders
+        self.position_key = key
+
+    def fallback_thresholds(self, tp_pct: float, sl_pct: float):
+        # While triggers rest on the exchange the polled exit only fires once the price is
+        # fallback_slack past the level, i.e. when a trigger evidently failed to execute
+        if self.active:
+            return tp_pct + self.fallback_slack, sl_pct + self.fallback_slack
+        return tp_pct, sl_pct
+
+
+class AsyncTpslGuard(TpslGuard):
+    # TpslGuard for ccxt.async_support exchanges (run_async)
+    async def fetch_orders(self):
+        return await self.exchange.fetch_open_orders(self.symbol, params={'planType': 'profit_loss'})
+
+    async def place(self, side: str, contracts: float, tp: float, sl: float, have_tp: bool, have_sl: bool):
+        order_side = 'buy' if side == 'long' else 'sell'
+        placed = []
+        if not have_tp:
+            placed.append(await self.exchange.create_order(self.symbol, 'market', order_side, contracts, None,
+                                                           {'takeProfitPrice': tp, 'holdSide': order_side}))
+        if not have_sl:
+            placed.append(await self.exchange.create_order(self.symbol, 'market', order_side, contracts, None,
+                                                           {'stopLossPrice': sl, 'holdSide': order_side}))
+        return placed
+
+    async def cancel(self, orders):
+        for o in orders:
+            try:
+                await self.exchange.cancel_order(o['id'], self.symbol, {'stop': True, 'planType': plan_type(o)})
+            except ccxt.OrderNotFound:
+                pass
+
+    async def reconcile(self, pos, side: str, tp_pct: float, sl_pct: float):
+        key = self._position_key(pos, side)
+        if key == self.position_key and (key is None or self.orders):
+            return
+        orders = await self.fetch_orders()
+        if key is None:
+            if orders:
+                botlog.info(f"[TPSL] {self.symbol} flat: cancelling {len(orders)} leftover trigger orders", symbol=self.symbol, stage='tpsl')
+                await self.cancel(orders)
+            self.orders = []
+            self.position_key = None
+            return
+        missing = self._missing(key, orders, tp_pct, sl_pct)
+        if missing is not None:
+            placed = await self.place(*missing)
+            self._log_placed(key, missing, placed)
+            orders = orders + placed
+        self.orders = orders
+        self.position_key = key